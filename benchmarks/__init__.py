@@ -0,0 +1 @@
+"""离线基准测试：本地的ImgBB替身服务器和吞吐量测试"""
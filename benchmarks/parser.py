@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+from imgbb_downloader.viewer import ViewerPageScanner, extract_download_url
+
+from .server import FakeImgBB
+
+IMAGE_URL = "https://i.ibb.co/AbC123d/photo.jpg"
+
+
+def bs4_extract(page):
+    """原来的解析方式：构建完整的BeautifulSoup树查找下载按钮，再退回到正则"""
+    soup = BeautifulSoup(page, 'html.parser')
+    download_link = soup.find('a', {'class': 'btn btn-download default'})
+    if download_link and 'href' in download_link.attrs:
+        return download_link['href']
+    matches = re.findall(r'https://i\.ibb\.co/[A-Za-z0-9]+/[^"\'\s<>]+', page)
+    return matches[0] if matches else None
+
+
+def stream_extract(page, chunk_size=16 * 1024):
+    """按块送入扫描器，模拟流式读取"""
+    scanner = ViewerPageScanner()
+    for start in range(0, len(page), chunk_size):
+        if scanner.feed(page[start:start + chunk_size]):
+            break
+    return scanner.result()
+
+
+def sample_pages():
+    """几种典型的viewer页：按钮在页面中部、按钮在大页面末尾、只有og:image、只有脚本中的JSON"""
+    site = FakeImgBB()
+    head = (f'<html><head><meta property="og:image" content="{IMAGE_URL}">'
+            '<link rel="stylesheet" href="/style.css"></head><body>')
+    scripts = '<div class="list-item"><script>CHV.obj.config = {"a": 1, "b": [1, 2, 3]};</script></div>' * 1500
+    anchor = f'<a class="btn btn-download default" href="{IMAGE_URL}" download="photo.jpg">下载</a>'
+    return {
+        'standin': site.render_viewer_page('AbC123d', base_url='https://ibb.co'),
+        'anchor_at_end': head + scripts + anchor + '</body></html>',
+        'og_image_only': head + scripts + '</body></html>',
+        'json_only': ('<html><body>' + scripts +
+                      '<script>CHV.obj.image_viewer.image = {"url":"https:\\/\\/i.ibb.co\\/AbC123d\\/photo.jpg"};'
+                      '</script></body></html>'),
+    }
+
+
+def time_per_call(function, page, iterations):
+    """返回每次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(page)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run_parser_benchmark(iterations=50):
+    """对比BeautifulSoup与正则扫描器，返回每种页面的耗时和结果"""
+    results = {}
+    for name, page in sample_pages().items():
+        expected = bs4_extract(page)
+        fast = extract_download_url(page)
+        streamed = stream_extract(page)
+        bs4_us = time_per_call(bs4_extract, page, max(iterations // 10, 1))
+        fast_us = time_per_call(extract_download_url, page, iterations)
+        stream_us = time_per_call(stream_extract, page, iterations)
+        results[name] = {
+            'page_kb': round(len(page) / 1024, 1),
+            'bs4_us': round(bs4_us, 1),
+            'scanner_us': round(fast_us, 1),
+            'stream_us': round(stream_us, 1),
+            'speedup': round(bs4_us / fast_us, 1),
+            'bs4_result': expected,
+            'scanner_result': fast,
+            'stream_result': streamed,
+        }
+    return results
+
+
+def main(argv=None):
+    from .run import RESULTS_DIR
+
+    parser = argparse.ArgumentParser(description='viewer页解析器的微基准测试')
+    parser.add_argument('--iterations', type=int, default=200, help='每种页面的扫描次数（默认: 200）')
+    parser.add_argument('--output-dir', default=RESULTS_DIR, help='结果保存目录（默认: benchmarks/results）')
+    args = parser.parse_args(argv)
+
+    results = run_parser_benchmark(args.iterations)
+    for name, result in results.items():
+        print(f"{name} ({result['page_kb']} KB): BeautifulSoup {result['bs4_us']}us，"
+              f"扫描器 {result['scanner_us']}us，流式 {result['stream_us']}us，快 {result['speedup']} 倍")
+        print(f"  结果: {result['bs4_result']} / {result['scanner_result']} / {result['stream_result']}")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"parser-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}, f,
+                  ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,269 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from imgbb_downloader import ImgBBDownloader, NullSink
+
+from .server import FakeImgBB
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+class MemorySampler:
+    """后台采样进程的常驻内存，记录峰值和增长量"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.start_rss = None
+        self.peak_rss = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start_rss = self.peak_rss = current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        rss = current_rss()
+        if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+
+    def result(self):
+        if self.peak_rss is None:
+            return {}
+        return {'peak_rss_mb': round(self.peak_rss / 2 ** 20, 1),
+                'rss_growth_mb': round((self.peak_rss - self.start_rss) / 2 ** 20, 1)}
+
+
+def current_rss():
+    """当前进程的常驻内存字节数，无法获取时返回None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # 非Linux系统只能拿到历史峰值
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == 'darwin' else usage * 1024
+    except ImportError:
+        return None
+
+
+def percentile(values, fraction):
+    """按最近秩计算分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def bench_resolve(site, args):
+    """解析路径：并发请求viewer页并提取直链，不使用缓存"""
+    engine = ImgBBDownloader(events=NullSink(), output_dir=tempfile.mkdtemp(), cache_path=':memory:')
+    viewer_urls = [url for i in range(site.albums) for url in site.viewer_urls(i)]
+    latencies = []
+    lock = threading.Lock()
+
+    def resolve(viewer_url):
+        start = time.perf_counter()
+        download_url = engine._get_download_link(viewer_url)
+        with lock:
+            latencies.append(time.perf_counter() - start)
+        return download_url
+
+    try:
+        with MemorySampler() as memory:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.resolve_workers) as executor:
+                resolved = sum(1 for url in executor.map(resolve, viewer_urls) if url)
+            elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(engine.output_dir, ignore_errors=True)
+        engine.close()
+
+    return dict({
+        'pages': len(viewer_urls),
+        'resolved': resolved,
+        'elapsed': round(elapsed, 3),
+        'pages_per_sec': round(len(viewer_urls) / elapsed, 1),
+        'latency_mean_ms': round(statistics.mean(latencies) * 1000, 2),
+        'latency_p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'latency_p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'latency_p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }, **memory.result())
+
+
+def bench_download(site, args):
+    """完整下载路径：HTTP抓取相册、解析viewer页并下载所有图片"""
+    output_dir = tempfile.mkdtemp()
+    engine = ImgBBDownloader(events=NullSink(), output_dir=output_dir, cache_path=':memory:',
+                             crawler_backend='http', download_workers=args.workers,
+                             resolve_workers=args.resolve_workers, per_host_limit=args.per_host,
+                             parallel_albums=args.parallel_albums, global_connections=args.connections,
+                             http2=args.http2, download_backend=args.engine, initial_rate=args.initial_rate,
+                             max_rate=args.max_rate)
+    albums = [{'name': f"基准相册 {i}", 'url': url} for i, url in enumerate(site.album_urls())]
+    server_before = site.stats()
+
+    try:
+        with MemorySampler() as memory:
+            start = time.perf_counter()
+            success, failed = engine.download_albums(albums)
+            elapsed = time.perf_counter() - start
+        stage_summary = engine.metrics.summary()
+    finally:
+        engine.close()
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    server_after = site.stats()
+    downloaded_bytes = success * site.image_size
+    return dict({
+        'images': site.albums * site.images_per_album,
+        'success': success,
+        'failed': failed,
+        'elapsed': round(elapsed, 3),
+        'images_per_sec': round(success / elapsed, 1),
+        'mb_per_sec': round(downloaded_bytes / elapsed / 2 ** 20, 2),
+        'server_requests': server_after['requests'] - server_before['requests'],
+        'server_errors': server_after['errors'] - server_before['errors'],
+        'stages': stage_summary,
+    }, **memory.result())
+
+
+SCENARIOS = {
+    'resolve': bench_resolve,
+    'download': bench_download,
+}
+
+
+def summarize(runs):
+    """多次运行时数值字段取中位数"""
+    summary = {}
+    for key, value in runs[0].items():
+        if isinstance(value, (int, float)):
+            summary[key] = statistics.median(run[key] for run in runs)
+        else:
+            summary[key] = value
+    return summary
+
+
+def git_commit():
+    """当前代码的提交号，不在git仓库中时返回None"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path):
+    """与之前保存的结果逐项对比"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    print(f"\n对比 {baseline_path}（{baseline.get('git_commit')}）:")
+    for scenario, result in current['results'].items():
+        previous = baseline.get('results', {}).get(scenario)
+        if not previous:
+            continue
+        for key, value in result.items():
+            old = previous.get(key)
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                print(f"  {scenario}.{key}: {old} -> {value} ({(value - old) / old * 100:+.1f}%)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='ImgBB下载器离线基准测试')
+    parser.add_argument('scenarios', nargs='*', help='要运行的场景（默认全部）: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--albums', type=int, default=4, help='相册数量（默认: 4）')
+    parser.add_argument('--images', type=int, default=50, help='每个相册的图片数（默认: 50）')
+    parser.add_argument('--image-size', type=int, default=200 * 1024, help='每张图片的字节数（默认: 200KB）')
+    parser.add_argument('--latency', type=float, default=0.02, help='服务器每个请求的延迟秒数（默认: 0.02）')
+    parser.add_argument('--bandwidth', type=int, default=0, help='每个响应的带宽上限，字节/秒（默认: 不限）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='服务器随机返回503的概率（默认: 0）')
+    parser.add_argument('-j', '--workers', type=int, default=8, help='同时下载的图片数（默认: 8）')
+    parser.add_argument('--resolve-workers', type=int, default=16, help='同时解析的viewer链接数（默认: 16）')
+    parser.add_argument('--per-host', type=int, default=8, help='单个主机的并发请求上限（默认: 8）')
+    parser.add_argument('--parallel-albums', type=int, default=3, help='同时下载的相册数（默认: 3）')
+    parser.add_argument('--connections', type=int, default=32, help='所有相册共享的并发连接上限（默认: 32）')
+    parser.add_argument('--initial-rate', type=float, default=8.0, help='下载请求的初始速率，每秒（默认: 8）')
+    parser.add_argument('--max-rate', type=float, default=64.0, help='下载请求的最高速率，每秒（默认: 64）')
+    parser.add_argument('--http2', action='store_true', help='客户端使用HTTP/2（替身服务器只支持HTTP/1.1）')
+    parser.add_argument('--engine', choices=['threads', 'asyncio'], default='threads',
+                        help='download场景的解析和下载方式（默认: threads）')
+    parser.add_argument('--repeat', type=int, default=1, help='每个场景重复次数，结果取中位数（默认: 1）')
+    parser.add_argument('--output-dir', default=RESULTS_DIR, help='结果保存目录（默认: benchmarks/results）')
+    parser.add_argument('--compare', metavar='FILE', help='与之前保存的结果文件对比')
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)}")
+
+    site = FakeImgBB(albums=args.albums, images_per_album=args.images, image_size=args.image_size,
+                     latency=args.latency, bandwidth=args.bandwidth, error_rate=args.error_rate)
+    site.start()
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output_dir', 'compare')},
+        'results': {},
+    }
+
+    try:
+        for name in args.scenarios or list(SCENARIOS):
+            runs = [SCENARIOS[name](site, args) for _ in range(max(args.repeat, 1))]
+            result = summarize(runs)
+            report['results'][name] = result
+            print(f"[{name}]")
+            for key, value in result.items():
+                if key == 'stages':
+                    for line in value:
+                        print(f"  {line}")
+                else:
+                    print(f"  {key}: {value}")
+    finally:
+        site.stop()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {path}")
+
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
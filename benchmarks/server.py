@@ -0,0 +1,232 @@
+import argparse
+import hashlib
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # asyncio后端会同时发起上千个连接
+
+
+class FakeImgBB:
+    """模拟ImgBB的本地HTTP服务器：相册列表页、相册页、viewer页和图片直链
+
+    页面结构与真实站点中下载器依赖的部分一致：列表页的a.list-item-desc-title-link、
+    相册页中同域名的/<图片ID>链接、“加载更多”的data-pagination="next"分页链接，
+    以及viewer页中的a.btn.btn-download.default下载按钮。
+    """
+
+    def __init__(self, albums=4, images_per_album=50, page_size=24, image_size=200 * 1024, latency=0.0,
+                 bandwidth=0, error_rate=0.0, seed=0, user="benchuser"):
+        self.albums = albums  # 相册数量
+        self.images_per_album = images_per_album  # 每个相册的图片数
+        self.page_size = page_size  # 每页显示的相册或图片数
+        self.image_size = image_size  # 每张图片的字节数
+        self.latency = latency  # 每个请求在响应前的延迟（秒）
+        self.bandwidth = bandwidth  # 每个响应的带宽上限（字节/秒），0表示不限
+        self.error_rate = error_rate  # 随机返回503的概率
+        self.user = user
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def profile_url(self):
+        return f"{self.base_url}/{self.user}"
+
+    def album_urls(self):
+        """所有相册的链接"""
+        return [f"{self.base_url}/album/{self.album_id(i)}" for i in range(self.albums)]
+
+    def viewer_urls(self, album_index):
+        """相册中所有viewer页的链接"""
+        return [f"{self.base_url}/{self.image_id(album_index, i)}" for i in range(self.images_per_album)]
+
+    @staticmethod
+    def album_id(album_index):
+        return f"al{album_index}"
+
+    @staticmethod
+    def image_id(album_index, image_index):
+        return f"im{album_index}x{image_index}"
+
+    def start(self, host="127.0.0.1", port=0):
+        """在后台线程中启动服务器，返回base_url"""
+        self._server = _Server((host, port), self._handler_class())
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        """停止服务器"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def stats(self):
+        """服务器端统计：请求数、注入的错误数、发送的字节数"""
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors, 'bytes_sent': self.bytes_sent}
+
+    def image_bytes(self, image_id):
+        """图片内容由ID决定，每次请求都相同，便于校验和续传"""
+        seed = hashlib.sha256(image_id.encode()).digest()
+        return (seed * (self.image_size // len(seed) + 1))[:self.image_size]
+
+    def _should_fail(self):
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return True
+        return False
+
+    def _page(self, items, page):
+        """返回当前页的条目和是否还有下一页"""
+        start = (page - 1) * self.page_size
+        return items[start:start + self.page_size], start + self.page_size < len(items)
+
+    def render_albums_page(self, page):
+        albums, has_next = self._page(list(range(self.albums)), page)
+        links = "".join(f'<div class="list-item"><a class="list-item-desc-title-link" '
+                        f'href="/album/{self.album_id(i)}">基准相册 {i}</a></div>' for i in albums)
+        pagination = (f'<a data-pagination="next" href="/{self.user}/albums?page={page + 1}">加载更多</a>'
+                      if has_next else "")
+        return f"<html><head><title>{self.user}</title></head><body>{links}{pagination}</body></html>"
+
+    def render_album_page(self, album_index, page):
+        images, has_next = self._page(list(range(self.images_per_album)), page)
+        links = "".join(f'<div class="list-item"><a href="/{self.image_id(album_index, i)}">'
+                        f'<img src="/i/{self.image_id(album_index, i)}/thumb.jpg"></a></div>' for i in images)
+        pagination = (f'<a data-pagination="next" href="/album/{self.album_id(album_index)}?page={page + 1}">'
+                      f'加载更多</a>' if has_next else "")
+        return (f'<html><head><meta property="og:title" content="基准相册 {album_index}"></head>'
+                f'<body><h1>基准相册 {album_index}</h1>{links}{pagination}</body></html>')
+
+    def render_viewer_page(self, image_id, base_url=None):
+        image_url = f"{base_url or self.base_url}/i/{image_id}/{image_id}.jpg"
+        # 真实viewer页有大量脚本和样式，这里用填充内容模拟页面大小
+        filler = '<div class="ad-slot"><script>var x = 1;</script></div>' * 200
+        return (f'<html><head><meta property="og:image" content="{image_url}">'
+                f'<title>{image_id}</title></head><body>{filler}'
+                f'<div class="header-content-right"><a class="btn btn-download default" href="{image_url}" '
+                f'download="{image_id}.jpg">下载</a></div>{filler}</body></html>')
+
+    def _handler_class(self):
+        site = self
+        viewer_pattern = re.compile(r'^/([A-Za-z0-9]+)$')
+        image_pattern = re.compile(r'^/i/([A-Za-z0-9]+)/[^/]+$')
+        album_pattern = re.compile(r'^/album/al(\d+)$')
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                self._dispatch(head=True)
+
+            def do_GET(self):
+                self._dispatch(head=False)
+
+            def _dispatch(self, head):
+                if site.latency:
+                    time.sleep(site.latency)
+                if site._should_fail():
+                    self._send(503, b"busy", 'text/plain', head)
+                    return
+
+                parsed = urlparse(self.path)
+                page = int(parse_qs(parsed.query).get('page', ['1'])[0])
+                path = parsed.path.rstrip('/')
+
+                if path == f"/{site.user}/albums":
+                    self._send_html(site.render_albums_page(page), head)
+                elif album_pattern.match(path) and int(album_pattern.match(path).group(1)) < site.albums:
+                    self._send_html(site.render_album_page(int(album_pattern.match(path).group(1)), page), head)
+                elif image_pattern.match(path):
+                    self._send_image(image_pattern.match(path).group(1), head)
+                elif viewer_pattern.match(path):
+                    self._send_html(site.render_viewer_page(viewer_pattern.match(path).group(1)), head)
+                else:
+                    self._send(404, b"not found", 'text/plain', head)
+
+            def _send_html(self, html, head):
+                self._send(200, html.encode('utf-8'), 'text/html; charset=utf-8', head)
+
+            def _send_image(self, image_id, head):
+                body = site.image_bytes(image_id)
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                match = re.match(r'bytes=(\d+)-$', self.headers.get('Range', ''))
+                if match and int(match.group(1)) < len(body):
+                    start = int(match.group(1))
+                    self._send(206, body[start:], 'image/jpeg', head, {
+                        'Content-Range': f"bytes {start}-{len(body) - 1}/{len(body)}", 'ETag': etag})
+                else:
+                    self._send(200, body, 'image/jpeg', head, {'ETag': etag, 'Accept-Ranges': 'bytes'})
+
+            def _send(self, status, body, content_type, head, headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if head:
+                    return
+
+                # 按带宽上限分块发送
+                chunk_size = max(site.bandwidth // 20, 16 * 1024) if site.bandwidth else len(body) or 1
+                try:
+                    for start in range(0, len(body), chunk_size):
+                        chunk = body[start:start + chunk_size]
+                        self.wfile.write(chunk)
+                        if site.bandwidth:
+                            time.sleep(len(chunk) / site.bandwidth)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                with site._lock:
+                    site.bytes_sent += len(body)
+
+        return Handler
+
+
+def main(argv=None):
+    """单独启动替身服务器，便于手动测试下载器"""
+    parser = argparse.ArgumentParser(description='本地的ImgBB替身服务器')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--albums', type=int, default=4)
+    parser.add_argument('--images', type=int, default=50, help='每个相册的图片数')
+    parser.add_argument('--image-size', type=int, default=200 * 1024, help='每张图片的字节数')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的延迟（秒）')
+    parser.add_argument('--bandwidth', type=int, default=0, help='每个响应的带宽上限（字节/秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='随机返回503的概率')
+    args = parser.parse_args(argv)
+
+    site = FakeImgBB(albums=args.albums, images_per_album=args.images, image_size=args.image_size,
+                     latency=args.latency, bandwidth=args.bandwidth, error_rate=args.error_rate)
+    site.start(port=args.port)
+    print(f"主页: {site.profile_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == '__main__':
+    main()
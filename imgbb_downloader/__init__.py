@@ -0,0 +1,29 @@
+"""ImgBB 批量下载引擎，可脱离Tkinter界面作为库或命令行使用"""
+
+from .cache import ResolveCache
+from .checkpoint import DiscoveryCheckpoint
+from .engine import ImgBBDownloader
+from .events import LogSink, NullSink
+from .jobs import JobQueue, JobRunner
+from .manifest import AlbumManifest
+from .metrics import Metrics
+from .progress import TransferProgress
+from .ratelimit import AdaptiveRateLimiter
+from .shard import ShardCoordinator
+from .transport import HttpTransport
+
+__all__ = [
+    'AdaptiveRateLimiter',
+    'AlbumManifest',
+    'DiscoveryCheckpoint',
+    'HttpTransport',
+    'ImgBBDownloader',
+    'JobQueue',
+    'JobRunner',
+    'LogSink',
+    'Metrics',
+    'NullSink',
+    'ResolveCache',
+    'ShardCoordinator',
+    'TransferProgress',
+]
@@ -0,0 +1,471 @@
+import asyncio
+import concurrent.futures
+import functools
+import os
+import threading
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from urllib.parse import urlparse
+
+import httpx
+
+from .cache import ResolveCache
+from .viewer import ViewerPageScanner
+
+
+class AsyncBackend:
+    """基于asyncio和httpx.AsyncClient的解析与下载后端
+
+    事件循环运行在单独的线程中，所有相册共享同一个客户端、全局连接名额和主机名额。
+    每个相册仍是解析与下载两段通过有界队列连接的流水线，只是工作者换成了协程，
+    同时进行的传输数只受连接名额限制。文件读写和哈希计算放到一个小线程池中，不阻塞事件循环。
+    """
+
+    # httpcore每次分配连接都要遍历整个连接池，开销随连接数平方增长，所以把连接分到多个小连接池
+    POOL_SHARD_SIZE = 16
+
+    def __init__(self, engine, http2=False, io_workers=4, chunk_size=64 * 1024, resolve_timeout=60.0):
+        self.engine = engine
+        self.io_workers = io_workers  # 执行文件读写的线程数
+        self.chunk_size = chunk_size  # 每个传输的读取分块，决定单个协程占用的缓冲
+        self.resolve_timeout = resolve_timeout  # 单个viewer页解析的总超时（秒）
+        self.http2 = False
+        self._request_count = 0
+        self._connect_count = 0
+        self._albums = set()
+        self._albums_lock = threading.Lock()
+        self._io = concurrent.futures.ThreadPoolExecutor(max_workers=io_workers)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup(http2), self._loop).result()
+
+    async def _setup(self, http2):
+        """在事件循环中创建客户端和信号量"""
+        engine = self.engine
+        connect_timeout, read_timeout = engine.http.timeout
+        shards = -(-engine.global_connections // self.POOL_SHARD_SIZE)
+        shard_size = -(-engine.global_connections // shards)
+        limits = httpx.Limits(max_connections=shard_size, max_keepalive_connections=shard_size)
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=None)
+        if http2:
+            try:
+                import h2  # noqa: F401
+                self.http2 = True
+            except ImportError:
+                # 未安装h2时使用HTTP/1.1
+                pass
+        self._clients = [httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(http2=self.http2, retries=3,
+                                                                             limits=limits),
+                                           headers=engine.http.DEFAULT_HEADERS, follow_redirects=True,
+                                           timeout=timeout)
+                         for _ in range(shards)]
+        self._shard_load = [0] * shards
+        self._budget = asyncio.Semaphore(engine.global_connections)
+        self._rate_turn = asyncio.Lock()
+        self._host_slots = {}
+        self._active_paths = set()
+        self._active_paths_cond = asyncio.Condition()
+        self._active_images = set()
+        self._active_images_cond = asyncio.Condition()
+
+    def run_album(self, pending, album_dir, manifest, album):
+        """在事件循环中运行一个相册的流水线，阻塞到完成，返回计数"""
+        future = asyncio.run_coroutine_threadsafe(self._run_album(pending, album_dir, manifest, album), self._loop)
+        with self._albums_lock:
+            self._albums.add(future)
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            raise RuntimeError("下载已取消")
+        except KeyboardInterrupt:
+            # 调用线程被中断时取消流水线
+            future.cancel()
+            raise
+        finally:
+            with self._albums_lock:
+                self._albums.discard(future)
+
+    def cancel(self):
+        """取消所有正在运行的相册流水线"""
+        with self._albums_lock:
+            futures = list(self._albums)
+        for future in futures:
+            future.cancel()
+
+    def close(self):
+        """取消未完成的任务，关闭客户端、事件循环和文件线程池"""
+        self.cancel()
+        if self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        self._loop.close()
+        self._io.shutdown(wait=True)
+
+    async def _shutdown(self):
+        """等被取消的协程清理完毕（关闭响应、释放文件），再关闭所有连接池"""
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for client in self._clients:
+            await client.aclose()
+
+    def stats(self):
+        """连接复用统计，格式与HttpTransport.stats()相同"""
+        return {
+            'requests': self._request_count,
+            'connections': self._connect_count,
+            'reused': max(0, self._request_count - self._connect_count),
+            'http2': self.http2,
+        }
+
+    async def _run_album(self, pending, album_dir, manifest, album):
+        """单个相册的流水线：resolve_workers个解析协程和download_workers个下载协程"""
+        engine = self.engine
+        link_queue = asyncio.Queue(maxsize=engine.pipeline_queue_size)
+        counts = {'resolved': 0, 'resolve_failed': 0, 'success': 0, 'failed': 0}
+        counts_lock = threading.Lock()
+        album_slot = asyncio.Semaphore(engine.per_album_connections)
+        work = iter(pending)
+
+        downloaders = [asyncio.ensure_future(self._download_worker(link_queue, album_dir, manifest, counts,
+                                                                   counts_lock, len(pending), album_slot, album))
+                       for _ in range(engine.download_workers)]
+        resolvers = [asyncio.ensure_future(self._resolve_worker(work, link_queue, counts, counts_lock,
+                                                                len(pending), album_slot, album))
+                     for _ in range(engine.resolve_workers)]
+        try:
+            await asyncio.gather(*resolvers)
+            for _ in downloaders:
+                await link_queue.put(None)
+            await asyncio.gather(*downloaders)
+        finally:
+            # 被取消或出错时停止其余协程，未完成的.part文件保留供续传
+            for task in resolvers + downloaders:
+                task.cancel()
+            await asyncio.gather(*resolvers, *downloaders, return_exceptions=True)
+        return counts
+
+    async def _resolve_worker(self, work, link_queue, counts, counts_lock, total, album_slot, album):
+        """解析协程：从共享的待解析列表中依次取出viewer链接"""
+        for index, viewer_url in work:
+            try:
+                async with self._connection_slot(album_slot):
+                    download_url = await asyncio.wait_for(self._resolve_link(viewer_url), self.resolve_timeout)
+            except asyncio.TimeoutError:
+                self.engine.metrics.inc('errors_total', stage='resolve', category='timeout')
+                download_url = None
+            except Exception:
+                download_url = None
+
+            self.engine._count_resolved(viewer_url, download_url, counts, counts_lock, total, album)
+            if download_url:
+                # 队列已满时等待，形成对解析阶段的背压
+                await link_queue.put((index, viewer_url, download_url))
+
+    async def _download_worker(self, link_queue, album_dir, manifest, counts, counts_lock, total, album_slot,
+                               album):
+        """下载协程：从队列中取出下载链接直到收到结束标记"""
+        engine = self.engine
+        while True:
+            item = await link_queue.get()
+            if item is None:
+                break
+
+            index, viewer_url, url = item
+            result = await self._download_one(url, index, album_dir, viewer_url, album['progress'], album_slot)
+            if result:
+                await self._run_io(engine._record_in_manifest, manifest, viewer_url, url, result)
+            engine._count_download(url, result, counts, counts_lock, total, album)
+
+    async def _wait_for_rate_limit(self):
+        """按自适应限速等待；协程按顺序轮流等待令牌，醒来时按最新速率重新计算"""
+        engine = self.engine
+        start = time.monotonic()
+        async with self._rate_turn:
+            while True:
+                delay = engine.rate_limiter.try_acquire()
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+        engine.metrics.observe('rate_limit_wait_seconds', time.monotonic() - start)
+
+    @asynccontextmanager
+    async def _connection_slot(self, album_slot):
+        """先占用相册名额再占用全局连接名额，与多线程版本顺序一致"""
+        start = time.monotonic()
+        async with album_slot:
+            async with self._budget:
+                self.engine.metrics.observe('slot_wait_seconds', time.monotonic() - start)
+                yield
+
+    def _host_slot(self, url):
+        """获取主机对应的并发信号量"""
+        host = urlparse(url).netloc
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.engine.per_host_limit)
+        return slot
+
+    @asynccontextmanager
+    async def _claim_path(self, file_path):
+        """同一目标文件同一时间只允许一个协程写入"""
+        async with self._active_paths_cond:
+            await self._active_paths_cond.wait_for(lambda: file_path not in self._active_paths)
+            self._active_paths.add(file_path)
+        try:
+            yield
+        finally:
+            async with self._active_paths_cond:
+                self._active_paths.discard(file_path)
+                self._active_paths_cond.notify_all()
+
+    @asynccontextmanager
+    async def _claim_image(self, url, viewer_url):
+        """开启去重时同一张图片同一时间只由一个协程下载，其他协程等它结束后从去重存储链接"""
+        if self.engine.blob_store is None:
+            yield
+            return
+        keys = self.engine._image_keys(url, viewer_url)
+        async with self._active_images_cond:
+            await self._active_images_cond.wait_for(lambda: not any(key in self._active_images for key in keys))
+            self._active_images.update(keys)
+        try:
+            yield
+        finally:
+            async with self._active_images_cond:
+                self._active_images.difference_update(keys)
+                self._active_images_cond.notify_all()
+
+    async def _run_io(self, function, *args):
+        """在文件线程池中执行阻塞的磁盘操作"""
+        return await asyncio.get_running_loop().run_in_executor(self._io, functools.partial(function, *args))
+
+    @asynccontextmanager
+    async def _request(self, url, headers=None):
+        """在最空闲的连接池上发送流式GET请求，退出时关闭响应"""
+        shard = min(range(len(self._clients)), key=self._shard_load.__getitem__)
+        client = self._clients[shard]
+        self._shard_load[shard] += 1
+        self._request_count += 1
+        try:
+            start = time.monotonic()
+            request = client.build_request('GET', url, headers=headers, extensions={'trace': self._trace})
+            response = await client.send(request, stream=True)
+            self.engine.metrics.observe('http_seconds', time.monotonic() - start, method='GET')
+            self.engine.metrics.inc('http_responses_total', status=str(response.status_code))
+            try:
+                yield response
+            finally:
+                await response.aclose()
+        finally:
+            self._shard_load[shard] -= 1
+
+    async def _trace(self, event_name, info):
+        """httpcore的trace回调，新建连接时计数"""
+        if event_name == 'connection.connect_tcp.complete':
+            self._connect_count += 1
+
+    async def _resolve_link(self, viewer_url):
+        """解析viewer链接，优先使用持久化缓存"""
+        engine = self.engine
+        viewer_id = ResolveCache.viewer_id(viewer_url)
+        # 缓存的SQLite查询和提交在文件线程池中执行，不阻塞事件循环中的传输
+        download_url = await self._run_io(engine.resolve_cache.get, viewer_id)
+        if download_url:
+            engine.metrics.inc('resolve_cache_total', result='hit')
+            return download_url
+        engine.metrics.inc('resolve_cache_total', result='miss')
+
+        start = time.monotonic()
+        async with self._host_slot(viewer_url):
+            engine.metrics.observe('host_wait_seconds', time.monotonic() - start)
+            download_url = await self._get_download_link(viewer_url)
+        if download_url:
+            await self._run_io(engine.resolve_cache.put, viewer_id, download_url)
+        return download_url
+
+    async def _get_download_link(self, viewer_url):
+        """流式读取viewer页，找到下载按钮后不再读取剩余内容；遇到429/503时降速，等待后重试"""
+        engine = self.engine
+        for attempt in range(engine.download_retries + 1):
+            if attempt:
+                await self._wait_for_rate_limit()
+            try:
+                async with AsyncExitStack() as stack:
+                    # viewer_fetch只计到收到响应头，读取和扫描正文计入viewer_parse
+                    with engine.metrics.span('viewer_fetch', url=viewer_url):
+                        response = await stack.enter_async_context(self._request(viewer_url))
+
+                    if engine._resolve_throttled(response, attempt):
+                        continue
+                    if response.status_code != 200:
+                        engine.metrics.inc('errors_total', stage='resolve', category=f'http_{response.status_code}')
+                        return None
+
+                    with engine.metrics.span('viewer_parse', url=viewer_url) as span:
+                        download_url, span['bytes'] = await self._scan_viewer_page(response)
+                        if download_url:
+                            return download_url
+
+                        span['ok'] = False
+                        span['error'] = 'no_link'
+                        engine.metrics.inc('errors_total', stage='resolve', category='no_link')
+                        return None
+
+            except Exception:
+                # 异常已由所在阶段的span记录
+                return None
+
+    async def _scan_viewer_page(self, response):
+        """边读边扫描viewer页，返回(下载链接, 读取的字节数)"""
+        engine = self.engine
+        decoder = engine._viewer_decoder(response)
+        scanner = ViewerPageScanner(stop_at_og_image=engine.stop_at_og_image)
+        received = 0
+        chunks = response.aiter_bytes(engine.viewer_chunk_size)
+        async for chunk in chunks:
+            received += len(chunk)
+            if scanner.feed(decoder.decode(chunk)):
+                await self._finish_early(response, chunks)
+                break
+        else:
+            scanner.feed(decoder.decode(b'', final=True))
+            engine.metrics.inc('viewer_reads_total', result='complete')
+
+        engine.metrics.inc('viewer_bytes_total', received)
+        return scanner.result(), received
+
+    async def _finish_early(self, response, chunks):
+        """提前停止读取：剩余内容不多时读完以便复用连接，否则直接关闭连接"""
+        metrics = self.engine.metrics
+        if response.http_version == 'HTTP/2':
+            # HTTP/2关闭的只是这一个流，连接仍可复用
+            metrics.inc('viewer_reads_total', result='stopped')
+            return
+
+        length = response.headers.get('Content-Length', '')
+        if length.isdigit() and not response.headers.get('Content-Encoding'):
+            if int(length) - response.num_bytes_downloaded > self.engine.viewer_drain_limit:
+                metrics.inc('viewer_reads_total', result='closed')
+                return
+
+        drained = 0
+        async for chunk in chunks:
+            drained += len(chunk)
+            if drained > self.engine.viewer_drain_limit:
+                metrics.inc('viewer_reads_total', result='closed')
+                return
+        metrics.inc('viewer_reads_total', result='drained')
+
+    async def _download_one(self, url, index, album_dir, viewer_url, progress, album_slot):
+        """下载单张图片（支持断点续传），成功时返回{'path', 'sha256'}，失败返回None
+
+        每次请求期间才占用连接名额；限速等待发生在占用名额之前，也不计入download阶段。
+        """
+        engine = self.engine
+        try:
+            file_path = engine._target_path(url, index, album_dir)
+            part_path = file_path + '.part'
+
+            async with self._claim_path(file_path), self._claim_image(url, viewer_url):
+                # 只有完整下载的文件才会被重命名到最终路径
+                size = await self._run_io(self._existing_size, file_path)
+                if size is not None:
+                    progress.set_size(url, size)
+                    progress.set_position(url, size)
+                    return {'path': file_path, 'sha256': None}
+
+                linked = await self._run_io(engine._link_from_store, url, viewer_url, file_path, progress)
+                if linked:
+                    return linked
+
+                for attempt in range(engine.download_retries + 1):
+                    offset, meta = await self._run_io(engine._load_partial, part_path, url)
+                    if offset and offset == meta['length']:
+                        # 上次已下载完整但未来得及重命名
+                        progress.set_size(url, offset)
+                        progress.set_position(url, offset)
+                        await self._run_io(engine._finish_partial, part_path, file_path)
+                        return {'path': file_path, 'sha256': None}
+
+                    headers = engine._request_headers(offset, meta)
+                    await self._wait_for_rate_limit()
+
+                    async with self._connection_slot(album_slot):
+                        with engine.metrics.span('download', url=url) as span:
+                            async with self._request(url, headers) as response:
+                                action, offset, meta = await self._run_io(engine._check_response, response, url,
+                                                                          part_path, offset, meta, viewer_url)
+                                if action != 'write':
+                                    span['ok'] = False
+                                if action == 'retry':
+                                    continue
+                                if action == 'fail':
+                                    return None
+
+                                progress.set_size(url, meta.get('length'))
+                                progress.set_position(url, offset)
+                                digest = await self._run_io(engine._partial_digest, part_path, offset)
+                                if await self._stream_to_file(response, part_path, offset, meta.get('length'), digest,
+                                                              lambda count: progress.advance(url, count)):
+                                    await self._run_io(engine._finish_partial, part_path, file_path)
+                                    engine.rate_limiter.on_success()
+                                    await self._run_io(engine._add_to_store, url, viewer_url, file_path,
+                                                       digest.hexdigest())
+                                    return {'path': file_path, 'sha256': digest.hexdigest()}
+                                # 传输中断时保留.part，下次尝试从断点继续
+                                span['ok'] = False
+                                engine.metrics.inc('download_retries_total', reason='interrupted')
+
+                # 无法校验的残留数据不予保留
+                if not await self._run_io(os.path.exists, part_path + '.json'):
+                    await self._run_io(engine._discard_partial, part_path)
+                return None
+
+        except Exception as e:
+            engine.metrics.error('download', e, url=url)
+            return None
+
+    async def _stream_to_file(self, response, part_path, offset, total_length, digest, on_chunk):
+        """从offset开始分块写入.part文件并更新哈希，返回是否已完整接收"""
+        engine = self.engine
+        received = offset
+        try:
+            f = await self._run_io(open, part_path, 'ab' if offset else 'wb')
+            try:
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    if chunk:
+                        await self._run_io(self._write_chunk, f, digest, chunk)
+                        received += len(chunk)
+                        engine.metrics.inc('downloaded_bytes_total', len(chunk))
+                        on_chunk(len(chunk))
+                if engine.fsync_downloads:
+                    await self._run_io(self._fsync, f)
+            finally:
+                await self._run_io(f.close)
+        except Exception as e:
+            engine.metrics.error('stream', e)
+            return False
+
+        return await self._run_io(engine._check_received, part_path, received, total_length)
+
+    @staticmethod
+    def _existing_size(file_path):
+        """已存在的文件大小，文件不存在时返回None"""
+        try:
+            return os.path.getsize(file_path)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_chunk(f, digest, chunk):
+        """写入一块数据并更新哈希"""
+        f.write(chunk)
+        digest.update(chunk)
+
+    @staticmethod
+    def _fsync(f):
+        """把文件内容刷到磁盘"""
+        f.flush()
+        os.fsync(f.fileno())
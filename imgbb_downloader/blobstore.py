@@ -0,0 +1,163 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from .manifest import AlbumManifest
+
+
+class BlobStore:
+    """按内容寻址的图片存储，位于下载目录的.blobs子目录
+
+    每份内容按SHA-256只保存一次（.blobs/ab/abcd….jpg），相册目录中的文件是指向它的硬链接，
+    不支持硬链接时退回到符号链接，再不行才复制。索引记录图片ID（viewer ID和直链）到哈希的映射，
+    下载前查到同一张图片就直接链接，不再请求。
+    """
+
+    DIRNAME = '.blobs'
+    INDEX = 'index.sqlite3'
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.root = os.path.join(output_dir, self.DIRNAME)
+        self._lock = threading.Lock()
+
+        os.makedirs(self.root, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.root, self.INDEX), check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS images (
+                    image_key TEXT PRIMARY KEY,
+                    sha256 TEXT NOT NULL,
+                    blob TEXT NOT NULL,
+                    added_at REAL NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def image_keys(url, viewer_id=None):
+        """一张图片的索引键：viewer ID和直链"""
+        keys = [f"url:{url}"]
+        if viewer_id:
+            keys.insert(0, f"viewer:{viewer_id}")
+        return keys
+
+    def blob_path(self, sha256, ext=''):
+        """内容对应的存储路径"""
+        return os.path.join(self.root, sha256[:2], sha256 + ext)
+
+    def find(self, keys):
+        """按索引键查找已保存的图片，返回(sha256, 存储路径)，找不到或文件已丢失时返回None"""
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute("SELECT sha256, blob FROM images WHERE image_key = ?", (key,)).fetchone()
+                if row:
+                    blob = os.path.join(self.root, row[1])
+                    if os.path.exists(blob):
+                        return row[0], blob
+        return None
+
+    def add(self, file_path, sha256, keys):
+        """把刚下载的文件放入存储并记录索引，返回True表示内容已存在、相册中的文件换成了链接"""
+        blob = self.blob_path(sha256, os.path.splitext(file_path)[1].lower())
+        with self._lock:
+            duplicate = os.path.exists(blob)
+            if duplicate:
+                # 其他图片ID下载过相同内容：删掉这份副本，换成链接
+                self._link_file(blob, file_path)
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                try:
+                    os.link(file_path, blob)
+                except FileExistsError:
+                    # 其他进程刚刚存入了相同内容
+                    duplicate = True
+                    self._link_file(blob, file_path)
+                except OSError:
+                    # 不支持硬链接：把文件移入存储，相册中换成符号链接或副本
+                    shutil.move(file_path, blob)
+                    self._link_file(blob, file_path)
+
+            relative = os.path.relpath(blob, self.root)
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?)",
+                                       [(key, sha256, relative, time.time()) for key in keys])
+        return duplicate
+
+    def link(self, blob, target):
+        """在相册目录中创建指向存储文件的链接，返回是否成功"""
+        try:
+            self._link_file(blob, target)
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _link_file(blob, target):
+        """原子地把target换成blob的硬链接，依次退回到符号链接和复制"""
+        tmp_path = target + '.link'
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(blob, tmp_path)
+        except OSError:
+            try:
+                os.symlink(os.path.relpath(blob, os.path.dirname(os.path.abspath(target))), tmp_path)
+            except (OSError, NotImplementedError):
+                shutil.copyfile(blob, tmp_path)
+        os.replace(tmp_path, target)
+
+    def gc(self, dry_run=False):
+        """删除没有任何相册引用的内容，返回(删除的文件数, 释放的字节数)
+
+        清单中记录且文件仍存在的哈希视为被引用；仍有其他硬链接的内容也保留，
+        以免误删没有清单的相册中的图片。
+        """
+        referenced = self._referenced_hashes()
+        removed = 0
+        freed = 0
+        with self._lock:
+            for prefix in os.listdir(self.root):
+                directory = os.path.join(self.root, prefix)
+                if not os.path.isdir(directory):
+                    continue
+                for name in os.listdir(directory):
+                    blob = os.path.join(directory, name)
+                    sha256 = os.path.splitext(name)[0]
+                    if sha256 in referenced:
+                        continue
+                    stat = os.stat(blob)
+                    if stat.st_nlink > 1:
+                        continue
+                    removed += 1
+                    freed += stat.st_size
+                    if not dry_run:
+                        os.remove(blob)
+                        with self._conn:
+                            self._conn.execute("DELETE FROM images WHERE sha256 = ?", (sha256,))
+        return removed, freed
+
+    def _referenced_hashes(self):
+        """所有相册清单中仍有本地文件的图片哈希"""
+        referenced = set()
+        for name in os.listdir(self.output_dir):
+            album_dir = os.path.join(self.output_dir, name)
+            manifest_path = os.path.join(album_dir, AlbumManifest.FILENAME)
+            if name.startswith('.') or not os.path.isfile(manifest_path):
+                continue
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    images = json.load(f).get('images', {})
+            except (OSError, ValueError):
+                continue
+            for entry in images.values():
+                if entry.get('sha256') and os.path.exists(os.path.join(album_dir, entry['filename'])):
+                    referenced.add(entry['sha256'])
+        return referenced
+
+    def close(self):
+        """关闭索引数据库"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,676 @@
+import json
+import re
+import threading
+
+import pyperclip
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+
+from .events import format_bytes
+from .metrics import Metrics
+from .waits import (INSTALL_MUTATION_OBSERVER, LISTING_STATE, WaitStats, document_ready, poll_until,
+                    wait_for)
+
+
+_clipboard_lock = threading.Lock()
+
+# 轻量模式下拦截的资源：抓取只需要HTML和站点自身的脚本
+_BLOCKED_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp', 'svg', 'ico', 'avif',
+                       'mp4', 'webm', 'mp3', 'm4a', 'woff', 'woff2', 'ttf', 'otf', 'eot', 'css']
+BLOCKED_URL_PATTERNS = [pattern for ext in _BLOCKED_EXTENSIONS for pattern in (f'*.{ext}', f'*.{ext}?*')] + [
+    '*googletagmanager.com*', '*google-analytics.com*', '*doubleclick.net*', '*googlesyndication.com*',
+    '*adservice.google.com*', '*facebook.net*', '*cloudflareinsights.com*', '*hotjar.com*',
+]
+
+
+def setup_driver(light=False):
+    """设置Chrome浏览器，light为True时拦截图片、媒体、字体、样式表和第三方脚本"""
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless')  # 无头模式
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    if light:
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.managed_default_content_settings.media_stream': 2,
+            'profile.default_content_setting_values.notifications': 2,
+        })
+        # 性能日志用于统计每个页面的传输量和被拦截的请求
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+    driver = webdriver.Chrome(options=options)
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    if light:
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+        except Exception:
+            pass  # 不支持CDP时只靠浏览器设置屏蔽图片
+    return driver
+
+
+class DriverPool:
+    """预热的无头Chrome池：借出前做健康检查，加载页面达到上限后回收重建"""
+
+    def __init__(self, factory=setup_driver, size=2, max_pages=50):
+        self.factory = factory
+        self.size = size  # 同时存在的浏览器上限
+        self.max_pages = max_pages  # 每个浏览器加载多少个页面后重建
+        self._idle = []
+        self._pages = {}
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def warm(self, count=None):
+        """预先启动浏览器，避免第一次使用时的冷启动"""
+        drivers = [self.acquire() for _ in range(min(count or self.size, self.size))]
+        for driver in drivers:
+            self.release(driver, pages=0)
+
+    def acquire(self):
+        """借出一个健康的浏览器，池已满时等待归还"""
+        while True:
+            with self._cond:
+                while not self._idle and self._created >= self.size and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    raise RuntimeError("浏览器池已关闭")
+                if self._idle:
+                    driver = self._idle.pop()
+                else:
+                    driver = None
+                    self._created += 1
+
+            if driver is None:
+                try:
+                    driver = self.factory()
+                except Exception:
+                    with self._cond:
+                        self._created -= 1
+                        self._cond.notify()
+                    raise
+                self._pages[id(driver)] = 0
+                return driver
+
+            if self._is_healthy(driver):
+                return driver
+            self._destroy(driver)
+
+    def release(self, driver, pages=1, broken=False):
+        """归还浏览器，达到页面上限或已损坏时直接销毁"""
+        with self._cond:
+            self._pages[id(driver)] = self._pages.get(id(driver), 0) + pages
+            recycle = broken or self._closed or self._pages[id(driver)] >= self.max_pages
+            if not recycle:
+                self._idle.append(driver)
+                self._cond.notify()
+
+        if recycle:
+            self._destroy(driver)
+
+    def close(self):
+        """关闭池中所有空闲浏览器，借出的浏览器在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for driver in idle:
+            self._destroy(driver)
+
+    def _is_healthy(self, driver):
+        """浏览器会话是否仍然可用"""
+        try:
+            return driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _destroy(self, driver):
+        """关闭浏览器并释放名额"""
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._cond:
+            self._pages.pop(id(driver), None)
+            self._created -= 1
+            self._cond.notify()
+
+
+class SeleniumCrawler:
+    """基于Selenium的相册抓取：滚动加载相册列表，通过嵌入代码提取viewer链接"""
+
+    EMBED_SELECTORS = [
+        "a[data-tab='tab-embeds']",
+        "a#tab-embeds-link",
+        "a[href*='/embeds']"
+    ]
+
+    TEXTAREA_SELECTORS = [
+        'textarea[name="viewer-links"]',
+        'textarea[data-size="viewer"]',
+        'textarea[id*="album-embed-code"]',
+        'textarea[data-focus="select-all"]'
+    ]
+
+    def __init__(self, events, pool, wait_stats=None, page_timeout=15, scroll_timeout=8, quiet_ms=600,
+                 traffic_report=False, size_probe=None, max_probes=8, metrics=None):
+        self.events = events
+        self.pool = pool
+        self.wait_stats = wait_stats or WaitStats()
+        self.metrics = metrics or Metrics()
+        self.traffic_report = traffic_report  # 轻量模式下报告每个页面的传输量和节省量
+        self.size_probe = size_probe  # url -> 字节数，用于估计被拦截资源的大小
+        self.max_probes = max_probes  # 每个页面最多探测多少个被拦截资源
+        self.page_timeout = page_timeout  # 等待页面就绪的上限
+        self.scroll_timeout = scroll_timeout  # 每次滚动后等待新内容的上限
+        self.quiet_ms = quiet_ms  # DOM无变化且无请求多久后视为加载结束
+        self.driver = None
+        self.pages = 0
+
+    def start(self):
+        """从浏览器池借出一个浏览器"""
+        if self.driver is None:
+            self.driver = self.pool.acquire()
+            self.pages = 0
+
+    def quit(self):
+        """把浏览器归还给浏览器池"""
+        if self.driver:
+            self.pool.release(self.driver, pages=self.pages)
+            self.driver = None
+
+    def _open(self, url):
+        """加载页面并计入浏览器的页面数"""
+        self.pages += 1
+        if self.traffic_report:
+            self._collect_traffic()  # 丢弃上一个页面遗留的日志
+        self.driver.get(url)
+
+    def _collect_traffic(self):
+        """读取性能日志，返回(实际传输字节数, 被拦截的URL列表)"""
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception:
+            return None
+
+        urls = {}
+        transferred = 0
+        blocked = []
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            method = message.get('method')
+            params = message.get('params', {})
+            if method == 'Network.requestWillBeSent':
+                urls[params.get('requestId')] = params.get('request', {}).get('url')
+            elif method == 'Network.loadingFinished':
+                transferred += int(params.get('encodedDataLength') or 0)
+            elif method == 'Network.loadingFailed' and params.get('blockedReason'):
+                url = urls.get(params.get('requestId'))
+                if url and url.startswith('http'):
+                    blocked.append(url)
+        return transferred, blocked
+
+    def _estimate_saved(self, blocked):
+        """抽样探测被拦截资源的大小，按平均值估算整个页面节省的字节数"""
+        if not blocked or self.size_probe is None:
+            return None
+        sizes = [self.size_probe(url) for url in list(dict.fromkeys(blocked))[:self.max_probes]]
+        known = [size for size in sizes if size]
+        if not known:
+            return None
+        return sum(known) // len(known) * len(blocked)
+
+    def _report_traffic(self, label):
+        """上报当前页面的传输量、拦截请求数和估计节省的流量"""
+        if not self.traffic_report:
+            return
+        traffic = self._collect_traffic()
+        if traffic is None:
+            return
+        transferred, blocked = traffic
+        saved = self._estimate_saved(blocked)
+        saved_text = format_bytes(saved) if saved is not None else "未知"
+        self.events.put(("log", f"轻量模式 {label}: 传输 {format_bytes(transferred)}，"
+                                f"拦截 {len(blocked)} 个请求，估计节省 {saved_text}"))
+
+    def get_albums(self, base_url):
+        """从主页获取所有相册"""
+        try:
+            # 设置浏览器
+            self.start()
+            albums_url = base_url.rstrip('/') + "/albums"
+
+            self.events.put(("log", f"访问相册页面: {albums_url}"))
+            with self.metrics.span('page_load', url=albums_url):
+                self._open(albums_url)
+                wait_for(self.driver, document_ready, self.page_timeout, "相册列表页加载", self.wait_stats)
+
+            # 滚动加载所有相册
+            self.events.put(("log", "正在加载所有相册..."))
+            with self.metrics.span('scroll_load'):
+                self._load_all_content()
+
+            # 获取相册信息
+            albums = self._extract_album_info()
+            self._report_traffic(albums_url)
+            return albums
+
+        finally:
+            self.quit()
+
+    def _extract_album_info(self):
+        """提取相册信息"""
+        albums = []
+        try:
+            # 查找相册链接
+            album_links = self.driver.find_elements(By.CSS_SELECTOR, "a.list-item-desc-title-link")
+
+            for link in album_links:
+                try:
+                    album_name = link.text.strip()
+                    album_url = link.get_attribute('href')
+
+                    if album_name and album_url and 'ibb.co/album/' in album_url:
+                        albums.append({
+                            'name': album_name,
+                            'url': album_url
+                        })
+                        self.events.put(("log", f"找到相册: {album_name} - {album_url}"))
+                except Exception as e:
+                    continue
+
+        except Exception as e:
+            self.events.put(("error", f"提取相册信息失败: {str(e)}"))
+
+        return albums
+
+    def get_album_info(self, album_url):
+        """获取单个相册的信息"""
+        try:
+            # 页面就绪且出现嵌入代码按钮或标题
+            ready_script = ("return document.readyState === 'complete' && "
+                            "!!document.querySelector(arguments[0] + ', h1');")
+            with self.metrics.span('page_load', url=album_url):
+                self._open(album_url)
+                wait_for(self.driver, lambda d: d.execute_script(ready_script, ", ".join(self.EMBED_SELECTORS)),
+                         self.page_timeout, "相册页加载", self.wait_stats)
+
+            # 获取相册名称
+            album_name = "未知相册"
+            title_selectors = ["h1", ".title", ".album-title", ".content-title"]
+
+            for selector in title_selectors:
+                try:
+                    title_element = self.driver.find_element(By.CSS_SELECTOR, selector)
+                    title_text = title_element.text.strip()
+                    if title_text and len(title_text) < 100:
+                        album_name = title_text
+                        break
+                except:
+                    continue
+
+            if album_name == "未知相册":
+                album_id = album_url.split('/')[-1]
+                album_name = f"相册_{album_id}"
+
+            # 获取viewer链接
+            with self.metrics.span('embed_extract', url=album_url) as span:
+                viewer_links = self._extract_viewer_links_from_album()
+                span['links'] = len(viewer_links)
+            self._report_traffic(album_url)
+
+            return {
+                'name': album_name,
+                'url': album_url,
+                'viewer_links': viewer_links
+            }
+
+        except Exception as e:
+            self.events.put(("error", f"获取相册信息失败: {str(e)}"))
+            return None
+
+    def _extract_viewer_links_from_album(self):
+        """从相册页面提取viewer链接"""
+        try:
+            # 查找嵌入代码按钮
+            embed_button = None
+            for selector in self.EMBED_SELECTORS:
+                try:
+                    buttons = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                    if buttons:
+                        embed_button = buttons[0]
+                        break
+                except:
+                    continue
+
+            if embed_button:
+                self.events.put(("log", "点击嵌入代码按钮..."))
+                self.driver.execute_script("arguments[0].click();", embed_button)
+
+                # 等待嵌入代码textarea填充内容
+                filled_script = """
+                    return arguments[0].some(function (selector) {
+                        var element = document.querySelector(selector);
+                        return element && (element.value || element.textContent || '').trim().length > 0;
+                    });
+                """
+                wait_for(self.driver, lambda d: d.execute_script(filled_script, self.TEXTAREA_SELECTORS),
+                         self.page_timeout, "嵌入代码加载", self.wait_stats)
+
+                # 方法1：尝试从textarea复制链接
+                viewer_links = self._extract_links_from_textarea()
+
+                # 方法2：如果textarea方法失败，使用HTML解析作为备用
+                if not viewer_links:
+                    self.events.put(("log", "textarea方法未获取到链接，尝试HTML解析方法..."))
+                    viewer_links = self._extract_links_from_html()
+
+                self.events.put(("log", f"提取到 {len(viewer_links)} 个viewer链接"))
+                return viewer_links
+            else:
+                self.events.put(("error", "未找到嵌入代码按钮"))
+                return []
+
+        except Exception as e:
+            self.events.put(("error", f"提取viewer链接失败: {str(e)}"))
+            return []
+
+    def _extract_links_from_textarea(self):
+        """从textarea中提取viewer链接"""
+        try:
+            self.events.put(("log", "尝试从textarea获取链接..."))
+
+            # 查找包含viewer-links的textarea
+            textarea_element = None
+            for selector in self.TEXTAREA_SELECTORS:
+                try:
+                    textarea_elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                    if textarea_elements:
+                        textarea_element = textarea_elements[0]
+                        self.events.put(("log", f"找到textarea元素: {selector}"))
+                        break
+                except:
+                    continue
+
+            if not textarea_element:
+                self.events.put(("log", "未找到包含viewer-links的textarea"))
+
+                # 调试：显示所有textarea元素
+                all_textareas = self.driver.find_elements(By.TAG_NAME, "textarea")
+                self.events.put(("log", f"页面中共有 {len(all_textareas)} 个textarea元素"))
+
+                for i, ta in enumerate(all_textareas):
+                    ta_name = ta.get_attribute('name') or ''
+                    ta_id = ta.get_attribute('id') or ''
+                    ta_class = ta.get_attribute('class') or ''
+                    self.events.put(
+                        ("log", f"textarea {i + 1}: name='{ta_name}', id='{ta_id}', class='{ta_class}'"))
+
+                return []
+
+            # 方法1：直接获取textarea的内容
+            try:
+                self.events.put(("log", "方法1: 直接获取textarea的value属性..."))
+
+                # 使用多种方式获取textarea内容
+                textarea_content = None
+
+                # 尝试1: 获取value属性
+                textarea_content = textarea_element.get_attribute('value')
+                if not textarea_content:
+                    # 尝试2: 获取textContent
+                    textarea_content = textarea_element.get_attribute('textContent')
+                if not textarea_content:
+                    # 尝试3: 获取innerHTML
+                    textarea_content = textarea_element.get_attribute('innerHTML')
+                if not textarea_content:
+                    # 尝试4: 使用JavaScript获取value
+                    textarea_content = self.driver.execute_script("return arguments[0].value;", textarea_element)
+                if not textarea_content:
+                    # 尝试5: 使用JavaScript获取textContent
+                    textarea_content = self.driver.execute_script("return arguments[0].textContent;", textarea_element)
+
+                if textarea_content:
+                    self.events.put(("log", f"成功获取textarea内容，长度: {len(textarea_content)} 字符"))
+                    self.events.put(("log", "=" * 50))
+                    self.events.put(("log", "Textarea内容："))
+                    # 显示内容（限制长度）
+                    content_preview = textarea_content[:800] + "..." if len(
+                        textarea_content) > 800 else textarea_content
+                    self.events.put(("log", content_preview))
+                    self.events.put(("log", "=" * 50))
+
+                    # 解析链接
+                    viewer_links = self._parse_links_from_content(textarea_content)
+                    if viewer_links:
+                        return viewer_links
+                else:
+                    self.events.put(("log", "textarea内容为空，尝试其他方法..."))
+
+            except Exception as e:
+                self.events.put(("log", f"直接获取textarea内容失败: {e}"))
+
+            # 方法2：点击textarea并尝试复制
+            try:
+                # 剪贴板为全局资源，多个浏览器并行时需要串行访问
+                with _clipboard_lock:
+                    self.events.put(("log", "方法2: 点击textarea并复制..."))
+
+                    # 滚动到textarea可见
+                    self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", textarea_element)
+
+                    # 点击textarea
+                    self.driver.execute_script("arguments[0].click();", textarea_element)
+
+                    # 全选内容
+                    # 方法A: 使用Ctrl+A
+                    textarea_element.send_keys(Keys.CONTROL + "a")
+
+                    # 复制内容，等待剪贴板内容发生变化
+                    try:
+                        previous_content = pyperclip.paste()
+                    except Exception:
+                        previous_content = None
+                    textarea_element.send_keys(Keys.CONTROL + "c")
+
+                    def copied_content():
+                        content = pyperclip.paste()
+                        return content if content and content != previous_content else None
+
+                    # 获取剪贴板内容（内容与复制前相同时，等待超时后直接读取）
+                    try:
+                        clipboard_content = (poll_until(copied_content, 2, "剪贴板复制", self.wait_stats)
+                                             or pyperclip.paste())
+                        if clipboard_content:
+                            self.events.put(("log", f"从剪贴板获取到内容，长度: {len(clipboard_content)} 字符"))
+                            self.events.put(("log", "剪贴板内容预览:"))
+                            content_preview = clipboard_content[:500] + "..." if len(
+                                clipboard_content) > 500 else clipboard_content
+                            self.events.put(("log", content_preview))
+
+                            viewer_links = self._parse_links_from_content(clipboard_content)
+                            if viewer_links:
+                                return viewer_links
+                        else:
+                            self.events.put(("log", "剪贴板内容为空"))
+                    except Exception as e:
+                        self.events.put(("log", f"获取剪贴板内容失败: {e}"))
+
+            except Exception as e:
+                self.events.put(("log", f"点击复制方法失败: {e}"))
+
+            # 方法3：使用JavaScript强制获取内容
+            try:
+                self.events.put(("log", "方法3: 使用JavaScript强制获取..."))
+
+                # 尝试多种JavaScript方法获取内容
+                js_methods = [
+                    "return arguments[0].value;",
+                    "return arguments[0].textContent;",
+                    "return arguments[0].innerText;",
+                    "return arguments[0].innerHTML;",
+                    "return arguments[0].defaultValue;",
+                    "arguments[0].select(); return document.getSelection().toString();",
+                ]
+
+                for i, js_code in enumerate(js_methods):
+                    try:
+                        content = self.driver.execute_script(js_code, textarea_element)
+                        if content and len(content.strip()) > 0:
+                            self.events.put(("log", f"JavaScript方法 {i + 1} 成功获取内容"))
+                            viewer_links = self._parse_links_from_content(content)
+                            if viewer_links:
+                                return viewer_links
+                    except Exception as e:
+                        continue
+
+            except Exception as e:
+                self.events.put(("log", f"JavaScript强制获取失败: {e}"))
+
+            self.events.put(("log", "所有textarea获取方法都失败"))
+            return []
+
+        except Exception as e:
+            self.events.put(("log", f"textarea方法整体失败: {e}"))
+            return []
+
+    def _parse_links_from_content(self, content):
+        """从内容中解析viewer链接"""
+        try:
+            viewer_links = []
+
+            if not content:
+                return []
+
+            # 按行分割内容
+            lines = content.split('\n')
+
+            for line in lines:
+                line = line.strip()
+                if line and 'ibb.co/' in line:
+                    # 方法1: 提取完整的https链接
+                    urls = re.findall(r'https://ibb\.co/[A-Za-z0-9]+', line)
+                    for url in urls:
+                        if '/album/' not in url:  # 排除相册链接
+                            viewer_links.append(url)
+
+                    # 方法2: 如果没有https，尝试提取ibb.co部分并补全
+                    if not urls and 'ibb.co/' in line:
+                        partial_urls = re.findall(r'ibb\.co/([A-Za-z0-9]+)', line)
+                        for partial_url in partial_urls:
+                            if len(partial_url) >= 5:  # 确保ID长度合理
+                                full_url = f'https://ibb.co/{partial_url}'
+                                viewer_links.append(full_url)
+
+            # 去重
+            viewer_links = list(set(viewer_links))
+
+            if viewer_links:
+                self.events.put(("log", f"解析到 {len(viewer_links)} 个唯一viewer链接"))
+
+                # 显示前几个链接
+                for i, link in enumerate(viewer_links[:5]):
+                    self.events.put(("log", f"  {i + 1}. {link}"))
+                if len(viewer_links) > 5:
+                    self.events.put(("log", f"  ... 还有 {len(viewer_links) - 5} 个链接"))
+
+            return viewer_links
+
+        except Exception as e:
+            self.events.put(("log", f"解析链接失败: {e}"))
+            return []
+
+    def _extract_links_from_html(self):
+        """从HTML源码提取viewer链接（备用方法）"""
+        try:
+            self.events.put(("log", "使用HTML解析方法提取viewer链接..."))
+
+            # 获取页面源码
+            page_source = self.driver.page_source
+
+            # 使用正则表达式提取viewer链接
+            # 特征：<a href开头，含有https://ibb.co，且其后只有一个/
+            pattern = r'<a href="(https://ibb\.co/[^/"]+)"[^>]*>'
+            matches = re.findall(pattern, page_source)
+
+            # 去重
+            viewer_links = list(set(matches))
+
+            self.events.put(("log", f"HTML方法提取到 {len(viewer_links)} 个viewer链接"))
+
+            # 显示前几个链接
+            for i, link in enumerate(viewer_links[:5]):
+                self.events.put(("log", f"  {i + 1}. {link}"))
+            if len(viewer_links) > 5:
+                self.events.put(("log", f"  ... 还有 {len(viewer_links) - 5} 个链接"))
+
+            return viewer_links
+
+        except Exception as e:
+            self.events.put(("log", f"HTML解析方法失败: {e}"))
+            return []
+
+    def _load_all_content(self):
+        """滚动加载所有内容，根据DOM变化和请求状态判断是否还有新内容"""
+        self.driver.execute_script(INSTALL_MUTATION_OBSERVER)
+        last_state = self.driver.execute_script(LISTING_STATE)
+
+        while True:
+            # 滚动本身也算一次活动，避免在懒加载请求发出之前就判定为安静
+            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);"
+                                       "window.__imgbbLastMutation = Date.now();")
+            state = self._wait_for_more_content(last_state, "滚动加载")
+
+            if not self._has_grown(state, last_state):
+                # 页面已安静但没有新内容，尝试点击Load more按钮
+                if not self._click_load_more():
+                    break
+                self.driver.execute_script("window.__imgbbLastMutation = Date.now();")
+                state = self._wait_for_more_content(last_state, "Load more加载")
+                if not self._has_grown(state, last_state):
+                    break
+
+            last_state = state
+
+    def _wait_for_more_content(self, last_state, name):
+        """等待页面出现新内容，或DOM与请求都已安静下来"""
+        def condition(driver):
+            state = driver.execute_script(LISTING_STATE)
+            idle = (state['ready'] == 'complete' and state['pending'] == 0
+                    and state['quietMs'] >= self.quiet_ms)
+            return state if self._has_grown(state, last_state) or idle else False
+
+        state = wait_for(self.driver, condition, self.scroll_timeout, name, self.wait_stats)
+        return state or self.driver.execute_script(LISTING_STATE)
+
+    def _has_grown(self, state, last_state):
+        """页面高度或条目数是否增加"""
+        return state['height'] > last_state['height'] or state['items'] > last_state['items']
+
+    def _click_load_more(self):
+        """点击可见的Load more按钮，返回是否点击成功"""
+        try:
+            load_more_buttons = self.driver.find_elements(By.XPATH,
+                                                          "//button[contains(text(), 'Load more')] | //a[contains(text(), 'Load more')] | //*[contains(@class, 'load-more')]")
+
+            for btn in load_more_buttons:
+                if btn.is_displayed() and btn.is_enabled():
+                    try:
+                        self.driver.execute_script("arguments[0].click();", btn)
+                        self.events.put(("log", "点击了Load more按钮"))
+                        return True
+                    except:
+                        continue
+        except:
+            pass
+
+        return False
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResolveCache:
+    """viewer ID到i.ibb.co直链的持久化缓存（SQLite），支持TTL与失效"""
+
+    def __init__(self, path, ttl=30 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl  # 缓存有效期（秒），None表示永不过期
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS resolve_cache (
+                    viewer_id TEXT PRIMARY KEY,
+                    direct_url TEXT NOT NULL,
+                    resolved_at REAL NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def viewer_id(viewer_url):
+        """从viewer链接中提取图片ID"""
+        return viewer_url.rstrip('/').split('/')[-1]
+
+    def get(self, viewer_id):
+        """查询直链，过期或不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT direct_url, resolved_at FROM resolve_cache WHERE viewer_id = ?",
+                                     (viewer_id,)).fetchone()
+            if row and (self.ttl is None or time.time() - row[1] <= self.ttl):
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, viewer_id, direct_url):
+        """写入或更新直链"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO resolve_cache VALUES (?, ?, ?)",
+                               (viewer_id, direct_url, time.time()))
+
+    def invalidate(self, viewer_id):
+        """使单个viewer ID的缓存失效"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM resolve_cache WHERE viewer_id = ?", (viewer_id,))
+
+    def clear(self):
+        """清空全部缓存"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM resolve_cache")
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
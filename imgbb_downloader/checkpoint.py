@@ -0,0 +1,86 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class DiscoveryCheckpoint:
+    """相册发现结果的检查点（SQLite）：主页的相册列表和每个相册的viewer链接
+
+    每个结果抓取完成后立即写入，进程中断后重新运行时直接读取，不必再次翻页或滚动加载。
+    检查点只用于继续中断的运行：运行结束后（即使部分图片失败）删除对应记录，
+    下次运行会重新抓取以发现新图片；ttl防止使用过旧的中断记录。
+    """
+
+    def __init__(self, path, ttl=24 * 3600):
+        self.path = path
+        self.ttl = ttl  # 检查点有效期（秒），None表示永不过期
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS discovery (
+                    url TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def _get(self, url, kind):
+        with self._lock:
+            row = self._conn.execute("SELECT data, updated_at FROM discovery WHERE url = ? AND kind = ?",
+                                     (url, kind)).fetchone()
+        if row and (self.ttl is None or time.time() - row[1] <= self.ttl):
+            return json.loads(row[0])
+        return None
+
+    def _put(self, url, kind, data):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO discovery VALUES (?, ?, ?, ?)",
+                               (url, kind, json.dumps(data, ensure_ascii=False), time.time()))
+
+    def get_albums(self, profile_url):
+        """读取主页的相册列表，没有或已过期时返回None"""
+        return self._get(profile_url, 'albums')
+
+    def put_albums(self, profile_url, albums):
+        """保存主页的相册列表"""
+        self._put(profile_url, 'albums', albums)
+
+    def get_album(self, album_url):
+        """读取相册的名称和viewer链接，没有或已过期时返回None"""
+        return self._get(album_url, 'album')
+
+    def put_album(self, album_url, album_info):
+        """保存相册的名称和viewer链接"""
+        self._put(album_url, 'album', album_info)
+
+    def discard(self, album_url):
+        """删除单个相册的记录"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM discovery WHERE url = ? AND kind = 'album'", (album_url,))
+
+    def complete(self, album_urls):
+        """相册的下载已结束：删除这些相册及包含它们的相册列表"""
+        album_urls = set(album_urls)
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM discovery WHERE url = ? AND kind = 'album'",
+                                   [(url,) for url in album_urls])
+            for profile_url, data in self._conn.execute(
+                    "SELECT url, data FROM discovery WHERE kind = 'albums'").fetchall():
+                if any(album['url'] in album_urls for album in json.loads(data)):
+                    self._conn.execute("DELETE FROM discovery WHERE url = ?", (profile_url,))
+
+    def clear(self):
+        """清空全部检查点"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM discovery")
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,263 @@
+import argparse
+import os
+
+from .blobstore import BlobStore
+from .engine import ImgBBDownloader, filter_albums
+from .events import LogSink, format_bytes
+from .jobs import JobQueue, JobRunner
+from .metrics import Metrics
+from .shard import ShardCoordinator
+
+
+def add_download_options(parser):
+    """download和jobs run共用的下载参数"""
+    parser.add_argument('-j', '--workers', type=int, default=8, help='同时下载的图片数（默认: 8）')
+    parser.add_argument('--resolve-workers', type=int, default=16, help='同时解析的viewer链接数（默认: 16）')
+    parser.add_argument('--per-host', type=int, default=8, help='单个主机的并发请求上限（默认: 8）')
+    parser.add_argument('--parallel-albums', type=int, default=3, help='同时下载的相册数（默认: 3）')
+    parser.add_argument('--connections', type=int, default=32, help='所有相册共享的并发连接上限（默认: 32）')
+    parser.add_argument('--per-album', type=int, default=16, help='单个相册的并发连接上限（默认: 16）')
+    parser.add_argument('--initial-rate', type=float, default=8.0,
+                        help='下载请求的初始速率（每秒），响应正常时逐步提速（默认: 8）')
+    parser.add_argument('--max-rate', type=float, default=64.0,
+                        help='下载请求的最高速率（每秒），遇到429/503时自动降速（默认: 64）')
+    parser.add_argument('--order', choices=['fair', 'shortest'], default='fair',
+                        help='相册调度顺序：fair按列表顺序，shortest图片少的先下载（默认: fair）')
+    parser.add_argument('--browsers', type=int, default=2, help='需要浏览器时同时运行的无头Chrome数量（默认: 2）')
+    parser.add_argument('--http2', action='store_true', help='使用HTTP/2（需要安装httpx[http2]）')
+    parser.add_argument('--engine', choices=['threads', 'asyncio'], default='threads',
+                        help='解析和下载方式：threads多线程，asyncio协程（需要httpx，适合数千并发）（默认: threads）')
+    parser.add_argument('--prune', action='store_true', help='增量同步时删除相册中已移除的图片')
+    parser.add_argument('--no-cache', action='store_true', help='不使用持久化的解析缓存')
+    parser.add_argument('--dedup', action='store_true',
+                        help='跨相册去重：图片只在下载目录的.blobs中保存一份，相册中是硬链接或符号链接')
+
+
+def engine_options(args):
+    """把下载参数转换为ImgBBDownloader的参数"""
+    return dict(
+        resolve_workers=args.resolve_workers,
+        per_host_limit=args.per_host,
+        download_workers=args.workers,
+        parallel_albums=args.parallel_albums,
+        global_connections=args.connections,
+        per_album_connections=args.per_album,
+        album_order=args.order,
+        initial_rate=args.initial_rate,
+        max_rate=args.max_rate,
+        http2=args.http2,
+        download_backend=args.engine,
+        cache_path=':memory:' if args.no_cache else None,
+        prune_deleted=args.prune,
+        dedup_store=args.dedup,
+        crawler_backend=args.crawler,
+        driver_pool_size=args.browsers,
+        light_browser=not args.full_browser,
+    )
+
+
+def build_parser():
+    """命令行参数"""
+    parser = argparse.ArgumentParser(prog='python -m imgbb_downloader',
+                                     description='ImgBB 批量下载工具（命令行版）')
+    parser.add_argument('-v', '--verbose', action='store_true', help='输出每张图片的进度')
+    parser.add_argument('--crawler', choices=['auto', 'http', 'selenium'], default='auto',
+                        help='相册抓取方式：auto先用HTTP、失败时改用浏览器（默认: auto）')
+    parser.add_argument('--full-browser', action='store_true',
+                        help='浏览器加载完整页面（默认不加载图片、字体、样式表和第三方脚本）')
+    parser.add_argument('--trace', metavar='FILE', help='把每个阶段的耗时和错误写入JSONL追踪文件')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='在127.0.0.1的该端口提供Prometheus格式的/metrics')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help='列出主页下的所有相册')
+    list_parser.add_argument('url', help='用户主页链接')
+
+    download_parser = subparsers.add_parser('download', help='下载主页下的相册或单个相册')
+    download_parser.add_argument('url', help='用户主页链接或相册链接')
+    download_parser.add_argument('-o', '--output', default='downloads', help='下载目录（默认: downloads）')
+    download_parser.add_argument('--album', action='append', default=[], metavar='PATTERN',
+                                 help='只下载名称匹配该正则的相册，可重复指定')
+    download_parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                                 help='跳过名称匹配该正则的相册，可重复指定')
+    download_parser.add_argument('--sync', action='store_true', help='增量同步，只下载清单中没有的图片')
+    download_parser.add_argument('--fresh', action='store_true',
+                                 help='清除下载目录中上次中断时保存的相册列表和viewer链接，重新抓取')
+    add_download_options(download_parser)
+
+    shard_parser = subparsers.add_parser('shard', help='多进程分片下载：相册分给多个工作进程，其他机器可通过共享目录加入')
+    shard_parser.add_argument('url', help='用户主页链接或相册链接')
+    shard_parser.add_argument('-o', '--output', default='downloads', help='下载目录（默认: downloads）')
+    shard_parser.add_argument('--album', action='append', default=[], metavar='PATTERN',
+                              help='只下载名称匹配该正则的相册，可重复指定')
+    shard_parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                              help='跳过名称匹配该正则的相册，可重复指定')
+    shard_parser.add_argument('-p', '--processes', type=int, default=os.cpu_count(),
+                              help='本机工作进程数（默认: CPU核数）')
+    shard_parser.add_argument('--fresh', action='store_true',
+                              help='清除下载目录中上次中断时保存的相册列表和viewer链接，重新抓取')
+    add_download_options(shard_parser)
+
+    worker_parser = subparsers.add_parser('shard-worker', help='加入共享下载目录中的分片队列，处理到队列为空')
+    worker_parser.add_argument('-o', '--output', default='downloads', help='共享的下载目录（默认: downloads）')
+    worker_parser.add_argument('-p', '--processes', type=int, default=os.cpu_count(),
+                               help='本机工作进程数（默认: CPU核数）')
+    add_download_options(worker_parser)
+
+    gc_parser = subparsers.add_parser('gc', help='清理去重存储中没有任何相册引用的图片（不要在下载时运行）')
+    gc_parser.add_argument('-o', '--output', default='downloads', help='下载目录（默认: downloads）')
+    gc_parser.add_argument('--dry-run', action='store_true', help='只统计，不删除')
+
+    jobs_parser = subparsers.add_parser('jobs', help='持久化任务队列：批量添加链接，无人值守运行，中断后续传')
+    jobs_parser.add_argument('--db', default='imgbb_jobs.sqlite3', help='任务数据库（默认: imgbb_jobs.sqlite3）')
+    jobs_subparsers = jobs_parser.add_subparsers(dest='jobs_command', required=True)
+
+    add_parser = jobs_subparsers.add_parser('add', help='从文件添加任务，每行一个主页或相册链接')
+    add_parser.add_argument('file', help='链接列表文件，忽略空行和#开头的行')
+    add_parser.add_argument('-o', '--output', default='downloads', help='下载目录（默认: downloads）')
+    add_parser.add_argument('--album', action='append', default=[], metavar='PATTERN',
+                            help='只下载名称匹配该正则的相册，可重复指定')
+    add_parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                            help='跳过名称匹配该正则的相册，可重复指定')
+
+    run_parser = jobs_subparsers.add_parser('run', help='运行排队中的任务，直到队列为空')
+    run_parser.add_argument('--jobs', type=int, default=2, help='同时运行的任务数（默认: 2）')
+    run_parser.add_argument('--stale-after', type=float, default=120,
+                            help='运行中的任务超过该秒数没有心跳时视为已中断，重新排队（默认: 120）')
+    add_download_options(run_parser)
+
+    jobs_subparsers.add_parser('status', help='列出所有任务的状态和进度')
+    jobs_subparsers.add_parser('retry', help='把失败的任务重新排队')
+
+    return parser
+
+
+def run_jobs(args, events):
+    """jobs子命令"""
+    queue = JobQueue(args.db)
+    try:
+        if args.jobs_command == 'add':
+            added = queue.add_file(args.file, os.path.abspath(args.output),
+                                   {'album': args.album, 'exclude': args.exclude})
+            print(f"已添加 {added} 个任务")
+            return 0
+
+        if args.jobs_command == 'retry':
+            print(f"{queue.retry_failed()} 个失败的任务已重新排队")
+            return 0
+
+        if args.jobs_command == 'status':
+            jobs = queue.jobs()
+            counts = {}
+            for job in jobs:
+                counts[job['state']] = counts.get(job['state'], 0) + 1
+                progress = f"{job['images_done']}/{job['images_total']}" if job['images_total'] else '-'
+                print(f"{job['id']}\t{job['state']}\t{progress}\t成功 {job['success']}\t失败 {job['failed']}"
+                      f"\t{job['url']}\t{job['message'] or ''}")
+            print("，".join(f"{state} {count}" for state, count in sorted(counts.items())) or "没有任务")
+            return 0
+
+        # 所有任务共用一份指标，追踪文件和/metrics端点只创建一次
+        metrics = Metrics(args.trace)
+        if args.metrics_port is not None:
+            port = metrics.serve(args.metrics_port)
+            events.put(("log", f"指标端点: http://127.0.0.1:{port}/metrics"))
+        queue.stale_after = args.stale_after
+        runner = JobRunner(queue, events, workers=args.jobs, engine_options=dict(engine_options(args), metrics=metrics))
+        try:
+            results = runner.run()
+        finally:
+            metrics.close()
+        lines = metrics.summary()
+        if lines:
+            events.put(("log", "阶段耗时统计:"))
+            for line in lines:
+                events.put(("log", f"  {line}"))
+        failed = sum(1 for state in results.values() if state != 'done')
+        events.put(("log", f"本次运行了 {len(results)} 个任务，失败 {failed} 个"))
+        return 0 if failed == 0 else 1
+    finally:
+        queue.close()
+
+
+def run_shard(args, events):
+    """shard和shard-worker子命令"""
+    if args.metrics_port is not None:
+        events.put(("log", "分片模式不提供/metrics端点，各工作进程结束时在日志中输出阶段统计"))
+    coordinator = ShardCoordinator(args.output, events, processes=args.processes,
+                                   engine_options=engine_options(args), trace_path=args.trace)
+    if args.command == 'shard-worker':
+        coordinator.work()
+        return 0
+
+    # 相册列表只在协调进程中抓取一次，并写入发现检查点
+    downloader = ImgBBDownloader(events=events, output_dir=args.output, resume_discovery=not args.fresh,
+                                 **engine_options(args))
+    try:
+        if '/album/' in args.url:
+            albums = [{'name': args.url, 'url': args.url}]
+        else:
+            albums = filter_albums(downloader.get_albums(args.url, resume=True), args.album, args.exclude)
+            if not albums:
+                return 1
+
+        success, failed = coordinator.run(albums)
+        # 分片下载已结束（包括部分图片失败），下次运行重新抓取；中断时保留检查点
+        downloader.discovery.complete(album['url'] for album in albums)
+    finally:
+        downloader.close()
+    return 0 if failed == 0 and success > 0 else 1
+
+
+def main(argv=None):
+    """命令行入口，返回退出码"""
+    args = build_parser().parse_args(argv)
+    events = LogSink(verbose=args.verbose)
+
+    if args.command == 'jobs':
+        return run_jobs(args, events)
+
+    if args.command in ('shard', 'shard-worker'):
+        return run_shard(args, events)
+
+    if args.command == 'gc':
+        if not os.path.isdir(os.path.join(args.output, BlobStore.DIRNAME)):
+            print(f"{args.output} 中没有去重存储")
+            return 1
+        store = BlobStore(args.output)
+        try:
+            removed, freed = store.gc(dry_run=args.dry_run)
+        finally:
+            store.close()
+        action = "可删除" if args.dry_run else "已删除"
+        print(f"{action} {removed} 个无引用的文件，共 {format_bytes(freed)}")
+        return 0
+
+    if args.command == 'list':
+        downloader = ImgBBDownloader(events=events, cache_path=':memory:', checkpoint_path=':memory:',
+                                     crawler_backend=args.crawler,
+                                     light_browser=not args.full_browser, trace_path=args.trace,
+                                     metrics_port=args.metrics_port)
+        try:
+            albums = downloader.get_albums(args.url)
+        finally:
+            downloader.close()
+        for i, album in enumerate(albums, 1):
+            print(f"{i}\t{album['name']}\t{album['url']}")
+        return 0 if albums else 1
+
+    downloader = ImgBBDownloader(events=events, output_dir=args.output, sync_mode=args.sync, trace_path=args.trace,
+                                 metrics_port=args.metrics_port, resume_discovery=not args.fresh,
+                                 **engine_options(args))
+    try:
+        if '/album/' in args.url:
+            success, failed = downloader.download_album(args.url)
+        else:
+            albums = filter_albums(downloader.get_albums(args.url, resume=True), args.album, args.exclude)
+            if not albums:
+                return 1
+            success, failed = downloader.download_albums(albums)
+    finally:
+        downloader.close()
+
+    return 0 if failed == 0 and success > 0 else 1
@@ -0,0 +1,164 @@
+import re
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+from .metrics import Metrics
+
+
+class HttpCrawler:
+    """纯HTTP的相册抓取：按页面自带的分页链接翻页，直接从HTML中提取相册和viewer链接"""
+
+    def __init__(self, transport, events, max_pages=1000, metrics=None):
+        self.http = transport
+        self.events = events
+        self.max_pages = max_pages  # 单个列表最多翻页数，防止分页链接成环
+        self.metrics = metrics or Metrics()
+
+    def start(self):
+        """与SeleniumCrawler接口一致，无需准备"""
+
+    def quit(self):
+        """与SeleniumCrawler接口一致，无需清理"""
+
+    def get_albums(self, base_url):
+        """从主页获取所有相册"""
+        albums_url = base_url.rstrip('/') + "/albums"
+        self.events.put(("log", f"访问相册页面: {albums_url}"))
+
+        albums = []
+        seen = set()
+        for soup in self._iter_pages(albums_url):
+            for link in soup.select("a.list-item-desc-title-link"):
+                album_name = link.get_text(strip=True)
+                album_url = urljoin(albums_url, link.get('href', ''))
+                if album_name and '/album/' in album_url and album_url not in seen:
+                    seen.add(album_url)
+                    albums.append({'name': album_name, 'url': album_url})
+                    self.events.put(("log", f"找到相册: {album_name} - {album_url}"))
+
+        return albums
+
+    def get_album_info(self, album_url):
+        """获取单个相册的名称和viewer链接"""
+        album_name = None
+        viewer_links = []
+        seen = set()
+
+        # viewer链接与相册链接同域名，形如 https://ibb.co/<图片ID>
+        parsed = urlparse(album_url)
+        viewer_pattern = re.compile(rf'^{re.escape(parsed.scheme)}://{re.escape(parsed.netloc)}/([A-Za-z0-9]+)/?$')
+
+        for soup in self._iter_pages(album_url):
+            if album_name is None:
+                album_name = self._album_title(soup)
+
+            for link in soup.find_all('a', href=True):
+                match = viewer_pattern.match(urljoin(album_url, link['href']))
+                if match and match.group(1) != 'album':
+                    viewer_url = f"{parsed.scheme}://{parsed.netloc}/{match.group(1)}"
+                    if viewer_url not in seen:
+                        seen.add(viewer_url)
+                        viewer_links.append(viewer_url)
+
+        if not album_name:
+            album_name = f"相册_{album_url.rstrip('/').split('/')[-1]}"
+
+        self.events.put(("log", f"HTTP方式提取到 {len(viewer_links)} 个viewer链接"))
+        return {
+            'name': album_name,
+            'url': album_url,
+            'viewer_links': viewer_links
+        }
+
+    def _iter_pages(self, url):
+        """依次返回列表的每一页，沿着页面中的下一页链接翻页"""
+        visited = set()
+        while url and url not in visited and len(visited) < self.max_pages:
+            visited.add(url)
+            with self.metrics.span('list_page_fetch', url=url):
+                response = self.http.get(url)
+                if response.status_code != 200:
+                    raise IOError(f"HTTP {response.status_code}: {url}")
+
+            with self.metrics.span('list_page_parse'):
+                soup = BeautifulSoup(response.text, 'html.parser')
+            yield soup
+
+            url = self._next_page_url(soup, url)
+            if url:
+                self.events.put(("log", f"加载下一页: {url}"))
+
+    def _next_page_url(self, soup, current_url):
+        """查找“加载更多”对应的下一页链接"""
+        next_link = (soup.select_one('a[data-pagination="next"][href]')
+                     or soup.select_one('link[rel="next"][href]'))
+        if next_link:
+            return urljoin(current_url, next_link['href'])
+        return None
+
+    def _album_title(self, soup):
+        """从页面中读取相册名称"""
+        meta = soup.find('meta', property='og:title')
+        if meta and meta.get('content', '').strip():
+            return meta['content'].strip()
+
+        for selector in ["h1", ".title", ".album-title", ".content-title"]:
+            element = soup.select_one(selector)
+            if element:
+                title_text = element.get_text(strip=True)
+                if title_text and len(title_text) < 100:
+                    return title_text
+        return None
+
+
+class FallbackCrawler:
+    """先用HTTP抓取，没有结果时再启动Selenium"""
+
+    def __init__(self, primary, fallback_factory):
+        self.primary = primary
+        self.fallback_factory = fallback_factory
+        self.fallback = None
+        self.events = primary.events
+
+    def start(self):
+        """启动主抓取器，浏览器在需要时才启动"""
+        self.primary.start()
+
+    def quit(self):
+        """关闭所有抓取器"""
+        self.primary.quit()
+        if self.fallback is not None:
+            self.fallback.quit()
+
+    def get_albums(self, base_url):
+        """从主页获取所有相册"""
+        try:
+            albums = self.primary.get_albums(base_url)
+            if albums:
+                return albums
+            self.events.put(("log", "HTTP方式未找到相册，改用浏览器..."))
+        except Exception as e:
+            self.events.put(("log", f"HTTP方式获取相册失败（{e}），改用浏览器..."))
+
+        # SeleniumCrawler.get_albums会自行启动和关闭浏览器
+        return self._get_fallback().get_albums(base_url)
+
+    def get_album_info(self, album_url):
+        """获取单个相册的名称和viewer链接"""
+        try:
+            album_info = self.primary.get_album_info(album_url)
+            if album_info and album_info['viewer_links']:
+                return album_info
+            self.events.put(("log", "HTTP方式未提取到viewer链接，改用浏览器..."))
+        except Exception as e:
+            self.events.put(("log", f"HTTP方式获取相册失败（{e}），改用浏览器..."))
+
+        fallback = self._get_fallback()
+        fallback.start()
+        return fallback.get_album_info(album_url)
+
+    def _get_fallback(self):
+        if self.fallback is None:
+            self.fallback = self.fallback_factory()
+        return self.fallback
@@ -0,0 +1,1059 @@
+import codecs
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlparse
+
+from .blobstore import BlobStore
+from .cache import ResolveCache
+from .checkpoint import DiscoveryCheckpoint
+from .crawler import FallbackCrawler, HttpCrawler
+from .events import NullSink, format_bytes
+from .manifest import AlbumLock, AlbumManifest, file_sha256
+from .metrics import Metrics
+from .progress import TransferProgress
+from .ratelimit import AdaptiveRateLimiter, parse_retry_after
+from .transport import HttpTransport
+from .viewer import ViewerPageScanner
+
+
+def filter_albums(albums, include=(), exclude=()):
+    """按名称正则筛选相册"""
+    selected = []
+    for album in albums:
+        if include and not any(re.search(pattern, album['name']) for pattern in include):
+            continue
+        if any(re.search(pattern, album['name']) for pattern in exclude):
+            continue
+        selected.append(album)
+    return selected
+
+
+class ImgBBDownloader:
+    """ImgBB下载引擎：相册发现、链接解析与图片下载
+
+    进度通过事件接收器上报。接收器可以是任何带put((类型, 数据))方法的对象，
+    例如queue.Queue；事件类型有log、error、status、albums、album（单个相册的图片进度）
+    和bytes（字节进度，url为None时表示整个任务）。
+    """
+
+    def __init__(self, events=None, output_dir="downloads", resolve_workers=16, per_host_limit=8,
+                 download_workers=8, pipeline_queue_size=64, download_retries=3, pool_size=32,
+                 http2=False, chunk_size=256 * 1024, fsync_downloads=False, cache_path=None,
+                 cache_ttl=30 * 24 * 3600, sync_mode=False, prune_deleted=False, crawler_backend="auto",
+                 driver_pool_size=2, driver_max_pages=50, discovery_workers=4, light_browser=True,
+                 parallel_albums=3, global_connections=None, per_album_connections=16, album_order="fair",
+                 trace_path=None, metrics_port=None, download_backend="threads", dedup_store=False, metrics=None,
+                 checkpoint_path=None, checkpoint_ttl=24 * 3600, resume_discovery=True, initial_rate=8.0,
+                 max_rate=64.0):
+        self.events = events if events is not None else NullSink()
+        # 各阶段耗时与错误统计；trace_path写入JSONL追踪，metrics_port在本机提供/metrics
+        # 传入metrics时与其他引擎共用同一份统计，由创建者负责关闭
+        self._owns_metrics = metrics is None
+        self.metrics = metrics if metrics is not None else Metrics(trace_path)
+        if metrics_port is not None:
+            port = self.metrics.serve(metrics_port)
+            self.events.put(("log", f"指标端点: http://127.0.0.1:{port}/metrics"))
+        self.output_dir = output_dir
+        self.crawler_backend = crawler_backend  # auto: 先HTTP后浏览器；http/selenium: 只用其中一种
+        self.driver_pool_size = driver_pool_size  # 同时运行的无头Chrome数量
+        self.driver_max_pages = driver_max_pages  # 每个Chrome加载多少页面后重建
+        self.discovery_workers = discovery_workers  # 同时获取相册信息的数量
+        self.light_browser = light_browser  # 浏览器不加载图片、字体、样式表和第三方脚本
+        self._driver_pool = None
+        self._driver_pool_lock = threading.Lock()
+        self._wait_stats = None
+
+        # 并发配置
+        self.resolve_workers = resolve_workers  # 同时解析的viewer链接上限
+        self.per_host_limit = per_host_limit  # 单个主机的并发请求上限
+        self.download_workers = download_workers  # 同时下载的图片数
+        self.pipeline_queue_size = pipeline_queue_size  # 解析与下载之间的队列容量
+        self.download_retries = download_retries  # 解析或下载遇到429/503、传输中断时的重试次数
+        self.parallel_albums = parallel_albums  # 同时下载的相册数
+        self.per_album_connections = per_album_connections  # 单个相册同时占用的连接上限
+        self.album_order = album_order  # fair: 按选择顺序；shortest: 图片少的相册先下载
+        self.progress_interval = 0.5  # 字节进度的上报间隔（秒）
+        # 所有相册共享的连接名额，默认与连接池大小一致
+        self.global_connections = global_connections or pool_size
+        self._connection_budget = threading.BoundedSemaphore(self.global_connections)
+        # 下载请求的自适应限速：从initial_rate开始，响应正常时逐步提到max_rate（每秒请求数）
+        self.rate_limiter = AdaptiveRateLimiter(initial_rate=initial_rate, max_rate=max_rate)
+        self.http = HttpTransport(pool_size=pool_size, http2=http2, metrics=self.metrics)
+        if http2 and not self.http.http2:
+            self.events.put(("log", "未安装httpx[http2]，使用HTTP/1.1连接池"))
+        self.resolve_cache = ResolveCache(cache_path or os.path.join(output_dir, ".resolve_cache.sqlite3"),
+                                          ttl=cache_ttl)
+        # 发现结果检查点：中断后重新运行时不必再翻页、滚动加载已抓取过的相册列表和相册
+        self.discovery = DiscoveryCheckpoint(checkpoint_path or os.path.join(output_dir, ".discovery.sqlite3"),
+                                             ttl=checkpoint_ttl)
+        if not resume_discovery:
+            self.discovery.clear()
+        self._cancelled = threading.Event()  # 被取消的运行保留检查点，下次运行时继续
+        self.chunk_size = chunk_size  # 流式下载的分块大小
+        self.viewer_chunk_size = 8 * 1024  # 流式读取viewer页的分块大小
+        self.viewer_drain_limit = 32 * 1024  # 提前停止后剩余数据不超过该值时读完以复用连接
+        self.stop_at_og_image = False  # 信任页面头部的og:image，不等下载按钮
+        self.fsync_downloads = fsync_downloads  # 重命名前是否fsync到磁盘
+        self.sync_mode = sync_mode  # 增量同步：只下载清单中没有的图片
+        self.prune_deleted = prune_deleted  # 增量同步时删除相册中已移除的图片
+        # 跨相册去重：图片只保存一份，相册目录中是链接
+        self.blob_store = BlobStore(output_dir) if dedup_store else None
+        self._host_slots = {}
+        self._host_slots_lock = threading.Lock()
+        self._active_paths = set()
+        self._active_paths_cond = threading.Condition()
+        self._active_images = set()  # 正在下载的图片的去重键
+        self._active_images_cond = threading.Condition()
+
+        # asyncio后端：解析和下载由事件循环中的协程完成，未安装httpx时退回多线程
+        self._async = None
+        if download_backend == "asyncio":
+            try:
+                from .aio import AsyncBackend
+                self._async = AsyncBackend(self, http2=http2)
+            except ImportError:
+                self.events.put(("log", "未安装httpx，使用多线程下载"))
+
+    def get_albums(self, profile_url, resume=False):
+        """获取主页下的所有相册，返回[{'name', 'url'}]
+
+        resume为True时表示继续上次中断的下载：优先使用检查点中的相册列表，重新抓取的结果也写入检查点。
+        默认每次都重新抓取，不读写检查点。
+        """
+        albums = self.discovery.get_albums(profile_url) if resume else None
+        if albums:
+            self.events.put(("log", "从检查点恢复相册列表"))
+        else:
+            try:
+                albums = self._create_crawler().get_albums(profile_url)
+            except Exception as e:
+                self.events.put(("error", f"获取相册列表失败: {str(e)}"))
+                return []
+            if albums and resume:
+                self.discovery.put_albums(profile_url, albums)
+
+        if albums:
+            self.events.put(("albums", albums))
+            self.events.put(("log", f"找到 {len(albums)} 个相册"))
+        else:
+            self.events.put(("error", "未找到任何相册"))
+        self._log_wait_stats()
+        return albums
+
+    def get_album_info(self, album_url):
+        """获取单个相册的名称和viewer链接，检查点中有上次中断留下的记录时不再抓取"""
+        album_info = self.discovery.get_album(album_url)
+        if album_info:
+            self.events.put(("log", f"从检查点恢复相册 {album_info['name']}: "
+                                    f"{len(album_info['viewer_links'])} 个viewer链接"))
+            return album_info
+
+        crawler = self._create_crawler()
+        try:
+            crawler.start()
+            album_info = crawler.get_album_info(album_url)
+        finally:
+            crawler.quit()
+        if album_info and album_info['viewer_links']:
+            self.discovery.put_album(album_url, album_info)
+        return album_info
+
+    def download_album(self, album_url):
+        """下载单个相册，返回(成功数, 失败数)"""
+        try:
+            self.events.put(("log", f"开始下载相册: {album_url}"))
+
+            # 获取相册信息
+            album_info = self.get_album_info(album_url)
+            if album_info:
+                # 直接开始下载
+                with self._report_progress(TransferProgress()) as progress:
+                    success, failed = self._process_album_download(album_info['name'], album_info['viewer_links'],
+                                                                   album_url, progress)
+                if not self._cancelled.is_set():
+                    # 运行已结束（包括部分图片失败），下次运行重新抓取以发现新图片
+                    self.discovery.discard(album_url)
+                return success, failed
+
+            self.events.put(("error", "获取相册信息失败"))
+            return 0, 0
+
+        except Exception as e:
+            self.events.put(("error", f"下载相册失败: {str(e)}"))
+            return 0, 0
+        finally:
+            self._log_wait_stats()
+            self._log_stage_stats()
+
+    def download_albums(self, albums):
+        """下载多个相册，返回(总成功数, 总失败数)
+
+        相册信息在后台并行获取（每个任务使用独立的抓取器和浏览器）。最多parallel_albums个相册
+        同时下载，共享同一份全局连接名额，每个相册最多占用per_album_connections个连接。
+        获取信息失败的相册图片数未知，按一张失败计入总失败数。
+        """
+        total_success = 0
+        total_failed = 0
+        try:
+            for album_info in albums:
+                self._emit_album_state(album_info['url'], album_info['name'], "排队中")
+
+            with self._report_progress(TransferProgress()) as progress, \
+                    ThreadPoolExecutor(max_workers=self.discovery_workers) as discovery, \
+                    ThreadPoolExecutor(max_workers=self.parallel_albums) as downloads:
+                infos = [discovery.submit(self.get_album_info, album_info['url']) for album_info in albums]
+
+                # fair按顺序边发现边下载；shortest要等全部发现完才能排序
+                discovery_failed = []
+                ready = self._iter_discovered(albums, infos, discovery_failed)
+                if self.album_order == "shortest":
+                    ready = sorted(ready, key=lambda item: len(item[1]['viewer_links']))
+
+                try:
+                    jobs = [downloads.submit(self._process_album_download, album_info['name'],
+                                             detailed_info['viewer_links'], album_info['url'], progress)
+                            for album_info, detailed_info in ready]
+
+                    # 提交下载时已遍历完所有相册的信息
+                    total_failed += len(discovery_failed)
+                    for future in jobs:
+                        success, failed = future.result()
+                        total_success += success
+                        total_failed += failed
+                except KeyboardInterrupt:
+                    # 取消异步传输，让相册线程尽快退出
+                    self.cancel()
+                    raise
+
+            if not self._cancelled.is_set():
+                # 运行已结束（包括部分图片失败），丢弃检查点，下次运行重新抓取以发现新相册和新图片
+                self.discovery.complete(album_info['url'] for album_info in albums)
+            self.events.put(("status", f"下载完成! 成功: {total_success}, 失败: {total_failed}"))
+            self.events.put(("log", f"所有相册下载完成! 总计成功: {total_success}, 失败: {total_failed}"))
+
+        except Exception as e:
+            self.events.put(("error", f"下载过程出错: {str(e)}"))
+
+        self._log_wait_stats()
+        self._log_stage_stats()
+        return total_success, total_failed
+
+    def _iter_discovered(self, albums, infos, failed):
+        """按相册顺序等待相册信息，依次产出(相册, 详细信息)，跳过没有图片的相册
+
+        获取信息失败的相册加入failed列表。
+        """
+        for i, (album_info, future) in enumerate(zip(albums, infos)):
+            album_name = album_info['name']
+            self.events.put(("status", f"获取相册信息 {i + 1}/{len(albums)}: {album_name}"))
+
+            try:
+                detailed_info = future.result()
+            except Exception as e:
+                self.events.put(("log", f"获取相册 {album_name} 信息失败: {e}"))
+                detailed_info = None
+            else:
+                if not detailed_info:
+                    self.events.put(("log", f"获取相册 {album_name} 信息失败"))
+
+            if not detailed_info:
+                failed.append(album_info)
+                self._emit_album_state(album_info['url'], album_name, "失败", failed=1)
+            elif detailed_info['viewer_links']:
+                self.events.put(("log", f"开始处理相册: {album_name}"))
+                yield album_info, detailed_info
+            else:
+                self.events.put(("log", f"相册 {album_name} 没有找到图片"))
+                self._emit_album_state(album_info['url'], album_name, "无图片")
+
+    def _emit_album_state(self, album_key, album_name, state, total=0, done=0, failed=0):
+        """上报单个相册的状态和进度"""
+        self.events.put(("album", {'url': album_key, 'name': album_name, 'state': state,
+                                   'total': total, 'done': done, 'failed': failed}))
+
+    @contextmanager
+    def _report_progress(self, progress, album_key=None, album_name=None):
+        """在后台定期上报字节进度，结束时再上报一次最终值"""
+        stop = threading.Event()
+
+        def report():
+            self.events.put(("bytes", dict(progress.snapshot(), url=album_key, name=album_name)))
+
+        def loop():
+            while not stop.wait(self.progress_interval):
+                report()
+
+        reporter = threading.Thread(target=loop, daemon=True)
+        reporter.start()
+        try:
+            yield progress
+        finally:
+            stop.set()
+            reporter.join()
+            report()
+
+    @contextmanager
+    def _connection_slot(self, album_slot):
+        """先占用相册名额再占用全局连接名额，顺序固定以免互相等待"""
+        start = time.monotonic()
+        with album_slot:
+            with self._connection_budget:
+                self.metrics.observe('slot_wait_seconds', time.monotonic() - start)
+                yield
+
+    def cancel(self):
+        """取消asyncio后端中正在进行的解析和下载，未完成的.part文件和发现检查点保留供续传"""
+        self._cancelled.set()
+        if self._async is not None:
+            self._async.cancel()
+
+    def close(self):
+        """释放浏览器池、连接池和缓存"""
+        if self._driver_pool is not None:
+            self._driver_pool.close()
+        if self._async is not None:
+            self._async.close()
+        self.http.close()
+        self.resolve_cache.close()
+        self.discovery.close()
+        if self.blob_store is not None:
+            self.blob_store.close()
+        if self._owns_metrics:
+            self.metrics.close()
+
+    def _create_crawler(self):
+        """按crawler_backend创建相册抓取器"""
+        if self.crawler_backend == "http":
+            return HttpCrawler(self.http, self.events, metrics=self.metrics)
+        if self.crawler_backend == "selenium":
+            return self._create_selenium_crawler()
+        return FallbackCrawler(HttpCrawler(self.http, self.events, metrics=self.metrics),
+                               self._create_selenium_crawler)
+
+    def _create_selenium_crawler(self):
+        """创建使用共享浏览器池的Selenium抓取器（按需导入selenium）"""
+        from .browser import SeleniumCrawler
+        pool = self._get_driver_pool()
+        return SeleniumCrawler(self.events, pool, wait_stats=self._wait_stats,
+                               traffic_report=self.light_browser, size_probe=self._probe_size,
+                               metrics=self.metrics)
+
+    def _probe_size(self, url):
+        """用HEAD请求获取资源大小，失败时返回None"""
+        try:
+            response = self.http.head(url)
+            length = response.headers.get('Content-Length', '')
+            return int(length) if response.status_code == 200 and length.isdigit() else None
+        except Exception:
+            return None
+
+    def _get_driver_pool(self):
+        """第一次需要浏览器时创建浏览器池，之后的操作复用已启动的浏览器"""
+        with self._driver_pool_lock:
+            if self._driver_pool is None:
+                from .browser import DriverPool, setup_driver
+                from .waits import WaitStats
+                self._driver_pool = DriverPool(factory=lambda: setup_driver(light=self.light_browser),
+                                               size=self.driver_pool_size, max_pages=self.driver_max_pages)
+                self._wait_stats = WaitStats()
+                if self.crawler_backend == "selenium":
+                    threading.Thread(target=self._warm_driver_pool, daemon=True).start()
+            return self._driver_pool
+
+    def _warm_driver_pool(self):
+        """后台预热浏览器池"""
+        try:
+            self._driver_pool.warm()
+        except Exception as e:
+            self.events.put(("log", f"预热浏览器失败: {e}"))
+
+    def _process_album_download(self, album_name, viewer_links, album_url=None, parent_progress=None):
+        """处理单个相册的下载：解析与下载以流水线方式并行"""
+        manifest = None
+        album_lock = None
+        album = {'url': album_url or album_name, 'name': album_name,
+                 'total': len(viewer_links), 'skipped': 0, 'progress': None}
+        try:
+            self.events.put(("log", f"开始获取相册 '{album_name}' 的下载链接..."))
+
+            # 创建文件夹
+            safe_album_name = re.sub(r'[<>:"/\\|?*]', '_', album_name)
+            album_dir = os.path.join(self.output_dir, safe_album_name)
+            os.makedirs(album_dir, exist_ok=True)
+
+            # 其他任务或进程正在下载同一目录时等它结束，之后读取的清单已包含它的结果
+            album_lock = AlbumLock(album_dir)
+            album_lock.acquire(on_wait=lambda: self.events.put(
+                ("log", f"相册 '{album_name}' 正在被其他任务下载，等待其完成...")))
+            manifest = AlbumManifest(album_dir)
+            manifest.album_url = album_url or manifest.album_url
+
+            pending = list(enumerate(viewer_links))
+            skipped = 0
+            if self.sync_mode:
+                pending, skipped = self._diff_with_manifest(manifest, viewer_links)
+                if not pending:
+                    self.events.put(("log", f"相册 '{album_name}' 没有新图片"))
+                    self._emit_album_state(album['url'], album_name, "完成", album['total'], skipped)
+                    return skipped, 0
+            album['skipped'] = skipped
+            album['progress'] = TransferProgress(files=len(pending), parent=parent_progress)
+            self._emit_album_state(album['url'], album_name, "下载中", album['total'], skipped)
+
+            self.events.put(("log", f"开始下载相册 '{album_name}' 的 {len(pending)} 张图片..."))
+
+            with self._report_progress(album['progress'], album['url'], album_name) as progress:
+                if self._async is not None:
+                    counts = self._async.run_album(pending, album_dir, manifest, album)
+                else:
+                    counts = self._run_pipeline(pending, album_dir, manifest, album)
+
+            self.events.put(
+                ("log", f"获取到 {counts['resolved']} 个下载链接，失败 {counts['resolve_failed']} 个"))
+
+            if not counts['resolved']:
+                self._emit_album_state(album['url'], album_name, "失败", album['total'], skipped, len(pending))
+                return skipped, len(pending)
+
+            self.events.put(
+                ("log", f"相册 '{album_name}' 下载完成! 成功: {counts['success']}, 失败: {counts['failed']}"))
+            self.events.put(("log", f"相册 '{album_name}' 传输 {format_bytes(progress.transferred)}，"
+                                    f"平均 {format_bytes(progress.average_rate())}/s"))
+            # 没能解析出直链的图片同样没有下载，计入失败数
+            failed = counts['failed'] + counts['resolve_failed']
+            self._emit_album_state(album['url'], album_name, "完成", album['total'], skipped + counts['success'],
+                                   failed)
+            self._log_connection_stats()
+            self.events.put(("log", f"解析缓存: 累计命中 {self.resolve_cache.hits} 次，"
+                                    f"未命中 {self.resolve_cache.misses} 次"))
+            if self.blob_store is not None:
+                self.events.put(("log", f"去重存储: 累计复用 {self.metrics.value('dedup_total', result='linked')} 张、"
+                                        f"合并重复内容 {self.metrics.value('dedup_total', result='duplicate')} 张，"
+                                        f"节省 {format_bytes(self.metrics.value('dedup_saved_bytes_total'))}"))
+            return skipped + counts['success'], failed
+
+        except Exception as e:
+            self.events.put(("error", f"处理相册下载失败: {str(e)}"))
+            self._emit_album_state(album['url'], album_name, "失败", album['total'])
+            return 0, len(viewer_links) if viewer_links else 0
+        finally:
+            if manifest is not None:
+                try:
+                    manifest.save()
+                except OSError as e:
+                    self.events.put(("log", f"保存清单失败: {e}"))
+            if album_lock is not None:
+                album_lock.release()
+
+    def _run_pipeline(self, pending, album_dir, manifest, album):
+        """多线程流水线：解析线程池把下载链接送入有界队列，由下载线程消费，返回计数"""
+        link_queue = queue.Queue(maxsize=self.pipeline_queue_size)
+        counts = {'resolved': 0, 'resolve_failed': 0, 'success': 0, 'failed': 0}
+        counts_lock = threading.Lock()
+        album_slot = threading.BoundedSemaphore(self.per_album_connections)
+
+        workers = [threading.Thread(target=self._download_worker,
+                                    args=(link_queue, album_dir, manifest, counts, counts_lock,
+                                          len(pending), album_slot, album),
+                                    daemon=True)
+                   for _ in range(self.download_workers)]
+        for worker in workers:
+            worker.start()
+
+        try:
+            self._resolve_into_queue(pending, link_queue, counts, counts_lock, album_slot, album)
+        finally:
+            for _ in workers:
+                link_queue.put(None)
+            for worker in workers:
+                worker.join()
+        return counts
+
+    def _diff_with_manifest(self, manifest, viewer_links):
+        """对比清单与当前相册列表，返回(待下载列表, 已完成数量)"""
+        current_ids = set()
+        pending = []
+        for index, viewer_url in enumerate(viewer_links):
+            viewer_id = ResolveCache.viewer_id(viewer_url)
+            current_ids.add(viewer_id)
+            if not manifest.is_complete(viewer_id):
+                pending.append((index, viewer_url))
+
+        skipped = len(viewer_links) - len(pending)
+        self.events.put(("log", f"增量同步: 清单中已有 {skipped} 张，需要下载 {len(pending)} 张"))
+
+        # 列表为空多半是提取失败，此时不做删除
+        if self.prune_deleted and viewer_links:
+            removed_ids = [viewer_id for viewer_id in manifest.images if viewer_id not in current_ids]
+            for viewer_id in removed_ids:
+                manifest.remove(viewer_id)
+            if removed_ids:
+                self.events.put(("log", f"增量同步: 删除了 {len(removed_ids)} 张已从相册移除的图片"))
+
+        return pending, skipped
+
+    def _resolve_into_queue(self, pending, link_queue, counts, counts_lock, album_slot, album):
+        """并发解析viewer链接，解析结果按原序号送入下载队列"""
+        # 限制已提交但未完成的解析任务数，避免一次性为整个相册创建任务
+        in_flight = threading.BoundedSemaphore(self.resolve_workers * 2)
+
+        with ThreadPoolExecutor(max_workers=self.resolve_workers) as executor:
+            for index, viewer_url in pending:
+                in_flight.acquire()
+                future = executor.submit(self._resolve_task, index, viewer_url, link_queue,
+                                         counts, counts_lock, len(pending), album_slot, album)
+                future.add_done_callback(lambda _: in_flight.release())
+
+    def _resolve_task(self, index, viewer_url, link_queue, counts, counts_lock, total, album_slot, album):
+        """解析单个viewer链接并送入下载队列"""
+        try:
+            with self._connection_slot(album_slot):
+                download_url = self._resolve_link(viewer_url)
+        except Exception:
+            download_url = None
+
+        self._count_resolved(viewer_url, download_url, counts, counts_lock, total, album)
+        if download_url:
+            # 队列已满时阻塞，形成对解析阶段的背压
+            link_queue.put((index, viewer_url, download_url))
+
+    def _count_resolved(self, viewer_url, download_url, counts, counts_lock, total, album):
+        """更新解析计数并上报状态，解析失败的图片计为失败"""
+        with counts_lock:
+            if download_url:
+                counts['resolved'] += 1
+            else:
+                counts['resolve_failed'] += 1
+            resolved = counts['resolved'] + counts['resolve_failed']
+            done = album['skipped'] + counts['success']
+            failed = counts['failed'] + counts['resolve_failed']
+        self.events.put(("status", f"获取下载链接 {resolved}/{total}"))
+        if not download_url:
+            album['progress'].fail(viewer_url)
+            self._emit_album_state(album['url'], album['name'], "下载中", album['total'], done, failed)
+
+    def _resolve_link(self, viewer_url):
+        """解析viewer链接，优先使用持久化缓存"""
+        viewer_id = ResolveCache.viewer_id(viewer_url)
+        download_url = self.resolve_cache.get(viewer_id)
+        if download_url:
+            self.metrics.inc('resolve_cache_total', result='hit')
+            return download_url
+        self.metrics.inc('resolve_cache_total', result='miss')
+
+        download_url = self._resolve_with_host_limit(viewer_url)
+        if download_url:
+            self.resolve_cache.put(viewer_id, download_url)
+        return download_url
+
+    def _resolve_with_host_limit(self, viewer_url):
+        """在主机并发上限内解析单个viewer链接"""
+        start = time.monotonic()
+        with self._host_slot(viewer_url):
+            self.metrics.observe('host_wait_seconds', time.monotonic() - start)
+            return self._get_download_link(viewer_url)
+
+    def _host_slot(self, url):
+        """获取主机对应的并发信号量"""
+        host = urlparse(url).netloc
+        with self._host_slots_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_slots[host] = slot
+            return slot
+
+    def _get_download_link(self, viewer_url):
+        """从viewer链接获取下载链接：流式读取页面，找到下载按钮后不再读取剩余内容
+
+        遇到429/503时由限速器降速，等待后重试。
+        """
+        for attempt in range(self.download_retries + 1):
+            if attempt:
+                start = time.monotonic()
+                self.rate_limiter.acquire()
+                self.metrics.observe('rate_limit_wait_seconds', time.monotonic() - start)
+            try:
+                # viewer_fetch只计到收到响应头，读取和扫描正文计入viewer_parse
+                with self.metrics.span('viewer_fetch', url=viewer_url):
+                    response = self.http.get(viewer_url, stream=True)
+
+                try:
+                    if self._resolve_throttled(response, attempt):
+                        continue
+                    if response.status_code != 200:
+                        self.metrics.inc('errors_total', stage='resolve', category=f'http_{response.status_code}')
+                        return None
+
+                    with self.metrics.span('viewer_parse', url=viewer_url) as span:
+                        # 查找下载按钮，找不到时依次尝试og:image、图片JSON和直链
+                        download_url, span['bytes'] = self._scan_viewer_page(response)
+                        if download_url:
+                            return download_url
+
+                        span['ok'] = False
+                        span['error'] = 'no_link'
+                        self.metrics.inc('errors_total', stage='resolve', category='no_link')
+                        return None
+                finally:
+                    response.close()
+
+            except Exception:
+                # 异常已由所在阶段的span记录
+                return None
+
+    def _resolve_throttled(self, response, attempt):
+        """viewer页被限流（429/503）时通知限速器，还能重试时返回True"""
+        if response.status_code not in (429, 503):
+            return False
+        self.rate_limiter.on_throttle(parse_retry_after(response.headers.get('Retry-After')))
+        if attempt >= self.download_retries:
+            return False
+        self.metrics.inc('resolve_retries_total', reason='throttled')
+        return True
+
+    def _scan_viewer_page(self, response):
+        """边读边扫描viewer页，返回(下载链接, 读取的字节数)"""
+        decoder = self._viewer_decoder(response)
+        scanner = ViewerPageScanner(stop_at_og_image=self.stop_at_og_image)
+        received = 0
+        # 同一个迭代器交给_finish_early继续读取，httpx的流只能迭代一次
+        chunks = response.iter_content(chunk_size=self.viewer_chunk_size)
+        for chunk in chunks:
+            received += len(chunk)
+            if scanner.feed(decoder.decode(chunk)):
+                self._finish_early(response, chunks)
+                break
+        else:
+            scanner.feed(decoder.decode(b'', final=True))
+            self.metrics.inc('viewer_reads_total', result='complete')
+
+        self.metrics.inc('viewer_bytes_total', received)
+        return scanner.result(), received
+
+    @staticmethod
+    def _viewer_decoder(response):
+        """按Content-Type中的字符集创建增量解码器，默认UTF-8"""
+        match = re.search(r'charset=([\w-]+)', response.headers.get('Content-Type', ''))
+        try:
+            return codecs.getincrementaldecoder(match.group(1) if match else 'utf-8')(errors='replace')
+        except LookupError:
+            return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def _finish_early(self, response, chunks):
+        """提前停止读取：剩余内容不多时读完以便连接回到连接池，否则直接关闭连接"""
+        if getattr(response, 'http_version', None) == 'HTTP/2':
+            # HTTP/2关闭的只是这一个流，连接仍可复用
+            self.metrics.inc('viewer_reads_total', result='stopped')
+            return
+
+        length = response.headers.get('Content-Length', '')
+        if length.isdigit() and not response.headers.get('Content-Encoding') and hasattr(response, 'raw'):
+            if int(length) - response.raw.tell() > self.viewer_drain_limit:
+                self.metrics.inc('viewer_reads_total', result='closed')
+                return
+
+        drained = 0
+        for chunk in chunks:
+            drained += len(chunk)
+            if drained > self.viewer_drain_limit:
+                self.metrics.inc('viewer_reads_total', result='closed')
+                return
+        self.metrics.inc('viewer_reads_total', result='drained')
+
+    def _download_worker(self, link_queue, album_dir, manifest, counts, counts_lock, total, album_slot, album):
+        """下载线程：从队列中取出下载链接直到收到结束标记"""
+        while True:
+            item = link_queue.get()
+            if item is None:
+                break
+
+            index, viewer_url, url = item
+            result = self._download_one(url, index, album_dir, viewer_url, album['progress'],
+                                        slot=lambda: self._connection_slot(album_slot))
+            if result:
+                self._record_in_manifest(manifest, viewer_url, url, result)
+            self._count_download(url, result, counts, counts_lock, total, album)
+
+    def _count_download(self, url, result, counts, counts_lock, total, album):
+        """更新下载计数并上报相册进度"""
+        if not result:
+            album['progress'].fail(url)
+
+        with counts_lock:
+            if result:
+                counts['success'] += 1
+            else:
+                counts['failed'] += 1
+            downloaded = counts['success'] + counts['failed']
+            done = album['skipped'] + counts['success']
+            failed = counts['failed'] + counts['resolve_failed']
+        self.events.put(("status", f"下载图片 {downloaded}/{total}"))
+        self._emit_album_state(album['url'], album['name'], "下载中", album['total'], done, failed)
+
+    def _record_in_manifest(self, manifest, viewer_url, url, result):
+        """把下载结果写入相册清单"""
+        viewer_id = ResolveCache.viewer_id(viewer_url)
+        try:
+            size = os.path.getsize(result['path'])
+            sha256 = result['sha256']
+            if sha256 is None:
+                # 文件在本次运行之前已存在，尽量沿用清单中的哈希
+                entry = manifest.images.get(viewer_id)
+                if entry and entry['size'] == size and entry.get('sha256'):
+                    sha256 = entry['sha256']
+                else:
+                    sha256 = file_sha256(result['path'])
+
+            manifest.record(viewer_id, {
+                'viewer_url': viewer_url,
+                'url': url,
+                'filename': os.path.basename(result['path']),
+                'size': size,
+                'sha256': sha256,
+            })
+            manifest.checkpoint()
+        except OSError as e:
+            self.events.put(("log", f"写入清单失败: {e}"))
+
+    def _download_one(self, url, index, album_dir, viewer_url=None, progress=None, slot=None):
+        """下载单张图片（支持断点续传），成功时返回{'path', 'sha256'}，失败返回None
+
+        slot返回每次请求期间占用的连接名额；限速等待发生在占用名额之前，也不计入download阶段。
+        """
+        progress = progress or TransferProgress()
+        slot = slot or nullcontext
+        try:
+            file_path = self._target_path(url, index, album_dir)
+            part_path = file_path + '.part'
+
+            with self._claim_path(file_path), self._claim_image(url, viewer_url):
+                # 只有完整下载的文件才会被重命名到最终路径
+                if os.path.exists(file_path):
+                    size = os.path.getsize(file_path)
+                    progress.set_size(url, size)
+                    progress.set_position(url, size)
+                    return {'path': file_path, 'sha256': None}
+
+                linked = self._link_from_store(url, viewer_url, file_path, progress)
+                if linked:
+                    return linked
+
+                for attempt in range(self.download_retries + 1):
+                    offset, meta = self._load_partial(part_path, url)
+                    if offset and offset == meta['length']:
+                        # 上次已下载完整但未来得及重命名
+                        progress.set_size(url, offset)
+                        progress.set_position(url, offset)
+                        self._finish_partial(part_path, file_path)
+                        return {'path': file_path, 'sha256': None}
+
+                    headers = self._request_headers(offset, meta)
+                    start = time.monotonic()
+                    self.rate_limiter.acquire()
+                    self.metrics.observe('rate_limit_wait_seconds', time.monotonic() - start)
+
+                    with slot(), self.metrics.span('download', url=url) as span:
+                        response = self.http.get(url, headers=headers, stream=True)
+                        try:
+                            action, offset, meta = self._check_response(response, url, part_path, offset, meta,
+                                                                        viewer_url)
+                            if action != 'write':
+                                span['ok'] = False
+                            if action == 'retry':
+                                continue
+                            if action == 'fail':
+                                return None
+
+                            progress.set_size(url, meta.get('length'))
+                            progress.set_position(url, offset)
+                            digest = self._partial_digest(part_path, offset)
+                            if self._stream_to_file(response, part_path, offset, meta.get('length'), digest,
+                                                    lambda count: progress.advance(url, count)):
+                                self._finish_partial(part_path, file_path)
+                                self.rate_limiter.on_success()
+                                self._add_to_store(url, viewer_url, file_path, digest.hexdigest())
+                                return {'path': file_path, 'sha256': digest.hexdigest()}
+                            # 传输中断时保留.part，下次尝试从断点继续
+                            span['ok'] = False
+                            self.metrics.inc('download_retries_total', reason='interrupted')
+                        finally:
+                            response.close()
+
+                # 无法校验的残留数据不予保留
+                if not os.path.exists(part_path + '.json'):
+                    self._discard_partial(part_path)
+                return None
+
+        except Exception as e:
+            self.metrics.error('download', e, url=url)
+            return None
+
+    def _link_from_store(self, url, viewer_url, file_path, progress):
+        """去重存储中已有这张图片时直接链接到相册目录，返回{'path', 'sha256'}，否则返回None"""
+        if self.blob_store is None:
+            return None
+        found = self.blob_store.find(self._image_keys(url, viewer_url))
+        if not found or not self.blob_store.link(found[1], file_path):
+            return None
+
+        size = os.path.getsize(file_path)
+        progress.set_size(url, size)
+        progress.set_position(url, size)
+        self.metrics.inc('dedup_total', result='linked')
+        self.metrics.inc('dedup_saved_bytes_total', size)
+        return {'path': file_path, 'sha256': found[0]}
+
+    def _add_to_store(self, url, viewer_url, file_path, sha256):
+        """把下载完成的文件放入去重存储，内容重复时相册中的文件换成链接"""
+        if self.blob_store is None:
+            return
+        try:
+            if self.blob_store.add(file_path, sha256, self._image_keys(url, viewer_url)):
+                self.metrics.inc('dedup_total', result='duplicate')
+                self.metrics.inc('dedup_saved_bytes_total', os.path.getsize(file_path))
+            else:
+                self.metrics.inc('dedup_total', result='stored')
+        except OSError as e:
+            self.events.put(("log", f"写入去重存储失败: {e}"))
+
+    @staticmethod
+    def _image_keys(url, viewer_url):
+        """图片在去重存储中的索引键"""
+        return BlobStore.image_keys(url, ResolveCache.viewer_id(viewer_url) if viewer_url else None)
+
+    @staticmethod
+    def _target_path(url, index, album_dir):
+        """图片的保存路径，直链中没有文件名时按序号命名"""
+        filename = url.split('/')[-1]
+        if not filename or '.' not in filename:
+            filename = f"image_{index + 1}.jpg"
+        return os.path.join(album_dir, filename)
+
+    @staticmethod
+    def _request_headers(offset, meta):
+        """下载请求头：有.part时带上Range和If-Range"""
+        # 禁用传输压缩，保证Range偏移与文件字节一致
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+            validator = meta.get('etag') or meta.get('last_modified')
+            if validator:
+                headers['If-Range'] = validator
+        return headers
+
+    def _check_response(self, response, url, part_path, offset, meta, viewer_url=None):
+        """按状态码决定如何处理下载响应，返回(动作, 写入起点, 续传信息)
+
+        动作为write（从写入起点继续写入.part）、retry（重新请求）或fail（放弃这张图片）。
+        """
+        if response.status_code in (429, 503):
+            # 服务器限流，降速后重试
+            self.rate_limiter.on_throttle(parse_retry_after(response.headers.get('Retry-After')))
+            self.metrics.inc('download_retries_total', reason='throttled')
+            return 'retry', offset, meta
+
+        if response.status_code == 206 and offset:
+            if not self._range_matches(response, offset, meta):
+                # 服务器上的文件已变化，从头下载
+                self._discard_partial(part_path)
+                self.metrics.inc('download_retries_total', reason='changed')
+                return 'retry', offset, meta
+        elif response.status_code == 200:
+            # 新下载，或服务器不支持Range时整体重下
+            offset = 0
+            meta = self._partial_meta(url, response)
+            self._save_partial_meta(part_path, meta)
+        elif response.status_code == 416:
+            self._discard_partial(part_path)
+            self.metrics.inc('download_retries_total', reason='range_not_satisfiable')
+            return 'retry', offset, meta
+        else:
+            self.metrics.inc('errors_total', stage='download', category=f'http_{response.status_code}')
+            if response.status_code in (404, 410) and viewer_url:
+                # 直链已失效，下次运行时重新解析
+                self.resolve_cache.invalidate(ResolveCache.viewer_id(viewer_url))
+            return 'fail', offset, meta
+        return 'write', offset, meta
+
+    def _partial_digest(self, part_path, offset):
+        """为续传准备哈希对象，先读入.part中已有的数据"""
+        digest = hashlib.sha256()
+        if offset:
+            with open(part_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                    digest.update(chunk)
+        return digest
+
+    def _stream_to_file(self, response, part_path, offset, total_length, digest, on_chunk=None):
+        """从offset开始分块写入.part文件并更新哈希，返回是否已完整接收"""
+        received = offset
+        try:
+            with open(part_path, 'ab' if offset else 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        digest.update(chunk)
+                        received += len(chunk)
+                        self.metrics.inc('downloaded_bytes_total', len(chunk))
+                        if on_chunk:
+                            on_chunk(len(chunk))
+                if self.fsync_downloads:
+                    f.flush()
+                    os.fsync(f.fileno())
+        except Exception as e:
+            self.metrics.error('stream', e)
+            return False
+
+        return self._check_received(part_path, received, total_length)
+
+    def _check_received(self, part_path, received, total_length):
+        """检查.part的字节数是否与预期长度一致"""
+        if total_length is None:
+            return True
+        if received > total_length:
+            # 数据超出预期长度，说明.part已损坏
+            self._discard_partial(part_path)
+            return False
+        return received == total_length
+
+    def _partial_meta(self, url, response):
+        """记录用于续传校验的ETag/Last-Modified/Content-Length"""
+        etag = response.headers.get('ETag')
+        if etag and etag.startswith('W/'):
+            # 弱ETag不能用于If-Range
+            etag = None
+
+        length = response.headers.get('Content-Length')
+        return {
+            'url': url,
+            'etag': etag,
+            'last_modified': response.headers.get('Last-Modified'),
+            'length': int(length) if length and length.isdigit() else None,
+        }
+
+    def _save_partial_meta(self, part_path, meta):
+        """保存.part文件的续传信息，长度未知时无法续传"""
+        meta_path = part_path + '.json'
+        if meta['length'] is None:
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            return
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    def _load_partial(self, part_path, url):
+        """读取可续传的.part文件，返回(已下载字节数, 续传信息)"""
+        if not os.path.exists(part_path):
+            return 0, {}
+
+        try:
+            with open(part_path + '.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            size = os.path.getsize(part_path)
+            if meta.get('url') == url and meta.get('length') and size <= meta['length']:
+                return size, meta
+        except (OSError, ValueError):
+            pass
+
+        self._discard_partial(part_path)
+        return 0, {}
+
+    def _range_matches(self, response, offset, meta):
+        """校验206响应与.part文件是否属于同一份资源"""
+        match = re.match(r'bytes (\d+)-\d+/(\d+|\*)', response.headers.get('Content-Range', ''))
+        if not match or int(match.group(1)) != offset:
+            return False
+        if match.group(2) != '*' and int(match.group(2)) != meta['length']:
+            return False
+
+        etag = response.headers.get('ETag')
+        if meta.get('etag') and etag and etag != meta['etag']:
+            return False
+        last_modified = response.headers.get('Last-Modified')
+        if meta.get('last_modified') and last_modified and last_modified != meta['last_modified']:
+            return False
+        return True
+
+    def _finish_partial(self, part_path, file_path):
+        """下载完成，原子重命名并清理续传信息"""
+        os.replace(part_path, file_path)
+        if os.path.exists(part_path + '.json'):
+            os.remove(part_path + '.json')
+
+    def _discard_partial(self, part_path):
+        """删除.part文件及其续传信息"""
+        for path in (part_path, part_path + '.json'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @contextmanager
+    def _claim_path(self, file_path):
+        """同一目标文件同一时间只允许一个线程写入"""
+        with self._active_paths_cond:
+            while file_path in self._active_paths:
+                self._active_paths_cond.wait()
+            self._active_paths.add(file_path)
+        try:
+            yield
+        finally:
+            with self._active_paths_cond:
+                self._active_paths.discard(file_path)
+                self._active_paths_cond.notify_all()
+
+    @contextmanager
+    def _claim_image(self, url, viewer_url):
+        """开启去重时同一张图片同一时间只由一个线程下载
+
+        其他相册中的同一张图片（viewer ID或直链相同）等它结束后直接从去重存储链接，不再重复下载。
+        """
+        if self.blob_store is None:
+            yield
+            return
+        keys = self._image_keys(url, viewer_url)
+        with self._active_images_cond:
+            while any(key in self._active_images for key in keys):
+                self._active_images_cond.wait()
+            self._active_images.update(keys)
+        try:
+            yield
+        finally:
+            with self._active_images_cond:
+                self._active_images.difference_update(keys)
+                self._active_images_cond.notify_all()
+
+    def _log_wait_stats(self):
+        """输出浏览器等待耗时统计，之后重新计数"""
+        if self._wait_stats is None:
+            return
+        lines = self._wait_stats.summary()
+        if lines:
+            self.events.put(("log", "浏览器等待统计:"))
+            for line in lines:
+                self.events.put(("log", f"  {line}"))
+        self._wait_stats.reset()
+
+    def _log_stage_stats(self):
+        """输出各阶段的累计耗时和错误统计"""
+        if not self._owns_metrics:
+            # 共用的统计由创建者在所有引擎结束后输出
+            return
+        lines = self.metrics.summary()
+        if lines:
+            self.events.put(("log", "阶段耗时统计:"))
+            for line in lines:
+                self.events.put(("log", f"  {line}"))
+
+    def _log_connection_stats(self):
+        """输出连接复用统计"""
+        stats = (self._async or self.http).stats()
+        protocol = "HTTP/2" if stats['http2'] else "HTTP/1.1"
+        self.events.put(("log", f"{protocol}连接池: 累计请求 {stats['requests']} 次，新建连接 {stats['connections']} 个，"
+                                f"复用 {stats['reused']} 次"))
@@ -0,0 +1,110 @@
+import sys
+import threading
+import time
+
+
+def format_bytes(size):
+    """把字节数格式化为便于阅读的文本"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_duration(seconds):
+    """把秒数格式化为H:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def format_progress(progress):
+    """把字节进度格式化为“已完成 / 总量 (百分比)，速率，剩余时间”"""
+    text = f"{format_bytes(progress['done'])} / {format_bytes(progress['total'])}"
+    if progress['total']:
+        text += f" ({progress['done'] * 100 // progress['total']}%)"
+    text += f"，{format_bytes(progress['rate'])}/s"
+    if progress['eta'] is not None:
+        text += f"，剩余约 {format_duration(progress['eta'])}"
+    return text
+
+
+class TotalProgressSink:
+    """转发事件，并把各任务的字节进度（url以prefix开头）合并为总进度（url为None）"""
+
+    def __init__(self, downstream, prefix='job:'):
+        self.downstream = downstream
+        self.prefix = prefix
+        self._progress = {}
+        self._lock = threading.Lock()
+
+    def put(self, event):
+        self.downstream.put(event)
+        message_type, data = event
+        if message_type == "bytes" and data['url'] is not None and data['url'].startswith(self.prefix):
+            with self._lock:
+                self._progress[data['url']] = data
+            self.downstream.put(("bytes", self.total()))
+
+    def finish(self, key):
+        """任务已结束：保留已传输的字节数，不再计入速率"""
+        with self._lock:
+            if key in self._progress:
+                self._progress[key] = dict(self._progress[key], rate=0.0, eta=None)
+
+    def total(self):
+        """所有任务的字节进度之和"""
+        with self._lock:
+            progresses = list(self._progress.values())
+        done = sum(progress['done'] for progress in progresses)
+        total = sum(progress['total'] for progress in progresses)
+        rate = sum(progress['rate'] for progress in progresses)
+        eta = (total - done) / rate if rate > 0 and total else None
+        return {'done': done, 'total': total, 'rate': rate, 'eta': eta, 'url': None, 'name': None}
+
+
+class NullSink:
+    """丢弃所有事件"""
+
+    def put(self, event):
+        pass
+
+
+class LogSink:
+    """把事件输出为文本日志，用于无界面运行"""
+
+    def __init__(self, stream=None, verbose=False, progress_interval=5.0):
+        self.stream = stream or sys.stderr
+        self.verbose = verbose  # 是否输出高频的status事件和每个相册的字节进度
+        self.progress_interval = progress_interval  # 总进度的输出间隔（秒）
+        self._last_progress = 0.0
+        self._lock = threading.Lock()
+
+    def put(self, event):
+        message_type, data = event
+
+        if message_type == "log":
+            self._write(data)
+        elif message_type == "error":
+            self._write(f"错误: {data}")
+        elif message_type == "status" and self.verbose:
+            self._write(data)
+        elif message_type == "bytes":
+            self._write_progress(data)
+
+    def _write_progress(self, progress):
+        """总进度按固定间隔输出，相册进度只在verbose时输出"""
+        if progress['url'] is not None:
+            if self.verbose:
+                self._write(f"{progress['name']}: {format_progress(progress)}")
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_progress < self.progress_interval:
+                return
+            self._last_progress = now
+        self._write(f"总进度: {format_progress(progress)}")
+
+    def _write(self, message):
+        with self._lock:
+            print(f"[{time.strftime('%H:%M:%S')}] {message}", file=self.stream, flush=True)
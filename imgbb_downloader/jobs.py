@@ -0,0 +1,320 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from .engine import ImgBBDownloader, filter_albums
+from .events import TotalProgressSink
+
+
+class JobQueue:
+    """持久化的下载任务队列（SQLite），可由多个进程共用
+
+    任务状态依次为queued、running，最后是done或failed。运行中的任务定期更新心跳，
+    心跳超时（进程崩溃或被强制结束）的任务会重新排队；重新运行时开启增量同步，
+    已完成的图片按相册清单跳过，未完成的.part文件从断点继续。
+    """
+
+    def __init__(self, path, stale_after=120.0):
+        self.path = path
+        self.stale_after = stale_after  # 心跳超过该秒数未更新的运行中任务视为已中断
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 自动提交模式，需要原子性的操作用BEGIN IMMEDIATE显式加写锁
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                output_dir TEXT NOT NULL,
+                options TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                images_done INTEGER NOT NULL DEFAULT 0,
+                images_total INTEGER NOT NULL DEFAULT 0,
+                success INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                message TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL
+            )
+        """)
+
+    @contextmanager
+    def _transaction(self):
+        """加写锁的事务，出错时回滚"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def add(self, url, output_dir, options=None):
+        """添加任务，同一链接和下载目录已在排队或运行时返回已有任务的ID"""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT id FROM jobs WHERE url = ? AND output_dir = ? AND state IN ('queued', 'running')",
+                               (url, output_dir)).fetchone()
+            if row:
+                return row['id'], False
+            cursor = conn.execute("INSERT INTO jobs (url, output_dir, options, state, created_at) "
+                                  "VALUES (?, ?, ?, 'queued', ?)",
+                                  (url, output_dir, json.dumps(options or {}, ensure_ascii=False), time.time()))
+            return cursor.lastrowid, True
+
+    def add_file(self, path, output_dir, options=None):
+        """从文本文件添加任务，每行一个主页或相册链接，忽略空行和#开头的注释，返回新增的任务数"""
+        added = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                url = line.strip()
+                if url and not url.startswith('#'):
+                    added += self.add(url, output_dir, options)[1]
+        return added
+
+    def claim(self):
+        """取出最早排队的任务并标记为运行中，队列为空时返回None
+
+        心跳超时的任务先重新排队，多个进程或机器共用队列时，其中一个退出后其余的可以接手。
+        """
+        with self._transaction() as conn:
+            self._requeue_stale(conn)
+            row = conn.execute("SELECT * FROM jobs WHERE state = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            conn.execute("UPDATE jobs SET state = 'running', attempts = attempts + 1, success = 0, failed = 0, "
+                         "started_at = ?, heartbeat_at = ?, finished_at = NULL, message = NULL WHERE id = ?", (now, now, row['id']))
+        job = dict(row)
+        job['attempts'] += 1
+        job['options'] = json.loads(job['options'])
+        return job
+
+    def heartbeat(self, job_ids):
+        """更新运行中任务的心跳"""
+        if not job_ids:
+            return
+        with self._transaction() as conn:
+            conn.executemany("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND state = 'running'",
+                             [(time.time(), job_id) for job_id in job_ids])
+
+    def update_progress(self, job_id, images_done, images_total):
+        """记录任务的图片进度"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET images_done = ?, images_total = ?, heartbeat_at = ? "
+                         "WHERE id = ? AND state = 'running'", (images_done, images_total, time.time(), job_id))
+
+    def finish(self, job_id, success, failed, message=None):
+        """记录任务结果：没有失败且至少有一张成功时为done，否则为failed"""
+        state = 'done' if failed == 0 and success > 0 else 'failed'
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET state = ?, success = ?, failed = ?, message = ?, finished_at = ? "
+                         "WHERE id = ? AND state = 'running'", (state, success, failed, message, time.time(), job_id))
+        return state
+
+    def release(self, job_id, message=None):
+        """把运行中的任务放回队列（例如被用户中断），下次运行时继续"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET state = 'queued', message = ? WHERE id = ? AND state = 'running'",
+                         (message, job_id))
+
+    def requeue_stale(self):
+        """把心跳超时的运行中任务放回队列，返回数量"""
+        with self._transaction() as conn:
+            return self._requeue_stale(conn)
+
+    def _requeue_stale(self, conn):
+        cursor = conn.execute("UPDATE jobs SET state = 'queued', message = '上次运行中断' "
+                              "WHERE state = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                              (time.time() - self.stale_after,))
+        return cursor.rowcount
+
+    def retry_failed(self):
+        """把失败的任务重新排队，返回数量"""
+        with self._transaction() as conn:
+            return conn.execute("UPDATE jobs SET state = 'queued', message = NULL WHERE state = 'failed'").rowcount
+
+    def jobs(self):
+        """按ID顺序返回所有任务"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+        return [dict(row, options=json.loads(row['options'])) for row in rows]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+class JobEventSink:
+    """转发单个任务的事件（日志加上任务编号），并把相册进度汇总后写入任务队列
+
+    任务的总字节进度改为job:<ID>键转发，由TotalProgressSink合并为所有任务的总进度。
+    """
+
+    def __init__(self, queue, job_id, downstream, interval=2.0, stopped=None):
+        self.queue = queue
+        self.job_id = job_id
+        self.downstream = downstream
+        self.interval = interval  # 写入进度的最短间隔（秒）
+        self.stopped = stopped  # 设置后不再写入队列（任务已被放回，数据库可能已关闭）
+        self._albums = {}
+        self._last_update = 0.0
+        self._lock = threading.Lock()
+
+    def put(self, event):
+        message_type, data = event
+        if message_type == "album":
+            self._record_album(data)
+        elif message_type in ("log", "error", "status"):
+            event = (message_type, f"[任务{self.job_id}] {data}")
+        elif message_type == "bytes" and data['url'] is None:
+            # 每个任务的总进度按相册进度的格式输出，避免多个任务的总进度混在一起
+            event = (message_type, dict(data, url=f"job:{self.job_id}", name=f"任务{self.job_id}"))
+        self.downstream.put(event)
+
+    def _record_album(self, album):
+        now = time.monotonic()
+        with self._lock:
+            self._albums[album['url']] = album
+            if now - self._last_update < self.interval:
+                return
+            self._last_update = now
+        self.flush()
+
+    def flush(self):
+        """立即写入当前的图片进度"""
+        if self.stopped is not None and self.stopped.is_set():
+            return
+        with self._lock:
+            done = sum(album['done'] for album in self._albums.values())
+            total = sum(album['total'] for album in self._albums.values())
+        self.queue.update_progress(self.job_id, done, total)
+
+
+class JobRunner:
+    """从任务队列中取任务并发执行，队列取空后返回
+
+    默认每个任务使用独立的下载引擎；传入engine时所有任务依次使用这一个引擎，
+    连接池、浏览器池和解析缓存在任务之间复用，引擎由创建者关闭。
+    """
+
+    def __init__(self, queue, events, workers=2, engine_options=None, heartbeat_interval=10.0, output_dir=None,
+                 engine=None):
+        if engine is not None and workers != 1:
+            raise ValueError("共用下载引擎时只能同时运行一个任务")
+        self.queue = queue
+        self.events = events
+        self.workers = workers  # 同时运行的任务数
+        self.engine_options = engine_options or {}  # 传给每个ImgBBDownloader的参数
+        self.output_dir = output_dir  # 不为None时代替任务中记录的下载目录
+        self.engine = engine  # 共用的下载引擎（需开启增量同步），None表示每个任务新建
+        self._progress = TotalProgressSink(events)  # 合并同时运行的任务的字节进度
+        self.heartbeat_interval = heartbeat_interval
+        self.results = {}
+        self._engines = {}
+        self._engines_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def run(self):
+        """运行到队列为空，返回{任务ID: 状态}；被中断时把运行中的任务放回队列"""
+        requeued = self.queue.requeue_stale()
+        if requeued:
+            self.events.put(("log", f"{requeued} 个上次中断的任务已重新排队"))
+
+        # 工作线程设为守护线程，中断时不必等正在进行的下载结束
+        threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.workers)]
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        for thread in threads:
+            thread.start()
+        heartbeat.start()
+
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stop()
+            raise
+        finally:
+            self._stopping.set()
+            heartbeat.join()
+        return self.results
+
+    def stop(self):
+        """停止取新任务，取消正在运行的任务并放回队列"""
+        self._stopping.set()
+        with self._engines_lock:
+            engines = dict(self._engines)
+        for job_id, engine in engines.items():
+            engine.cancel()
+            self.queue.release(job_id, "运行被中断")
+            self.events.put(("log", f"[任务{job_id}] 已中断，下次运行时继续"))
+
+    def _heartbeat(self):
+        while not self._stopping.wait(self.heartbeat_interval):
+            with self._engines_lock:
+                job_ids = list(self._engines)
+            self.queue.heartbeat(job_ids)
+
+    def _worker(self):
+        while not self._stopping.is_set():
+            job = self.queue.claim()
+            if job is None:
+                return
+            self.results[job['id']] = self._run_job(job)
+
+    def _run_job(self, job):
+        """运行单个任务，返回最终状态"""
+        job_id = job['id']
+        sink = JobEventSink(self.queue, job_id, self._progress, stopped=self._stopping)
+        self.events.put(("log", f"[任务{job_id}] 开始: {job['url']}（第 {job['attempts']} 次）"))
+
+        success = failed = 0
+        message = None
+        engine = None
+        try:
+            if self.engine is not None:
+                engine = self.engine
+                engine.events = sink
+            else:
+                # 增量同步：已完成的图片按清单跳过，任务中断后重新运行即可续传
+                options = dict(self.engine_options, output_dir=self.output_dir or job['output_dir'], sync_mode=True)
+                engine = ImgBBDownloader(events=sink, **options)
+            with self._engines_lock:
+                self._engines[job_id] = engine
+
+            if '/album/' in job['url']:
+                success, failed = engine.download_album(job['url'])
+            else:
+                # 只有重新运行的任务才从检查点继续
+                albums = filter_albums(engine.get_albums(job['url'], resume=job['attempts'] > 1),
+                                       job['options'].get('album', ()), job['options'].get('exclude', ()))
+                if albums:
+                    success, failed = engine.download_albums(albums)
+                else:
+                    message = "没有要下载的相册"
+        except Exception as e:
+            message = str(e)
+        finally:
+            with self._engines_lock:
+                self._engines.pop(job_id, None)
+            if engine is not None and engine is not self.engine:
+                engine.close()
+
+        self._progress.finish(f"job:{job_id}")
+        if self._stopping.is_set():
+            # 被中断的任务已由stop()放回队列
+            return 'queued'
+        sink.flush()
+        state = self.queue.finish(job_id, success, failed, message)
+        self.events.put(("log", f"[任务{job_id}] 结束: {state}，成功 {success}，失败 {failed}"))
+        return state
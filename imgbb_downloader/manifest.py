@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class AlbumManifest:
+    """相册本地清单：记录每张图片的viewer ID、直链、文件名、大小和哈希"""
+
+    FILENAME = 'manifest.json'
+    SAVE_INTERVAL = 5.0  # 下载过程中两次写入清单的最短间隔（秒）
+
+    def __init__(self, album_dir):
+        self.album_dir = album_dir
+        self.path = os.path.join(album_dir, self.FILENAME)
+        self.album_url = None
+        self.images = {}
+        self._lock = threading.Lock()
+        self._saved_at = time.monotonic()
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.album_url = data.get('album_url')
+                self.images = data.get('images', {})
+            except (OSError, ValueError):
+                self.images = {}
+
+    def is_complete(self, viewer_id):
+        """清单中存在且本地文件大小一致"""
+        entry = self.images.get(viewer_id)
+        if not entry:
+            return False
+        file_path = os.path.join(self.album_dir, entry['filename'])
+        return os.path.exists(file_path) and os.path.getsize(file_path) == entry['size']
+
+    def record(self, viewer_id, entry):
+        """记录一张已下载的图片"""
+        with self._lock:
+            self.images[viewer_id] = entry
+
+    def remove(self, viewer_id):
+        """删除图片记录及本地文件"""
+        with self._lock:
+            entry = self.images.pop(viewer_id, None)
+        if entry:
+            file_path = os.path.join(self.album_dir, entry['filename'])
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    def checkpoint(self):
+        """距上次写入超过SAVE_INTERVAL时写入清单，进程意外退出后已完成的图片不必重新下载"""
+        if time.monotonic() - self._saved_at >= self.SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        """原子写入清单文件"""
+        with self._lock:
+            self._saved_at = time.monotonic()
+            data = {
+                'album_url': self.album_url,
+                'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'images': self.images,
+            }
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+class AlbumLock:
+    """相册目录的跨进程排他锁：同一目录同一时间只由一个下载引擎处理
+
+    多个任务或进程覆盖同一相册时（主页任务与其中的相册任务、多个jobs run），
+    后来者等待前者结束后再读取清单，避免互相抢写文件、清单只保留最后写入者的记录。
+    锁随文件句柄释放，进程崩溃后不会残留。
+    """
+
+    FILENAME = '.lock'
+
+    def __init__(self, album_dir, poll_interval=0.5):
+        self.path = os.path.join(album_dir, self.FILENAME)
+        self.poll_interval = poll_interval
+        self._file = None
+
+    def acquire(self, on_wait=None):
+        """等待直到取得锁，需要等待时先调用一次on_wait"""
+        f = open(self.path, 'a+b')
+        try:
+            if not self._try_lock(f):
+                if on_wait is not None:
+                    on_wait()
+                while not self._try_lock(f):
+                    time.sleep(self.poll_interval)
+        except BaseException:
+            f.close()
+            raise
+        self._file = f
+
+    def release(self):
+        """释放锁"""
+        if self._file is None:
+            return
+        if fcntl is None:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+    @staticmethod
+    def _try_lock(f):
+        try:
+            if fcntl is not None:
+                # flock按打开的文件计，同一进程中的两个引擎也互斥
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
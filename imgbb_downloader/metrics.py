@@ -0,0 +1,200 @@
+import json
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 耗时直方图的桶上限（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def error_category(exc):
+    """把异常归类为timeout、connection、protocol、io、parse或异常类名"""
+    name = type(exc).__name__.lower()
+    if isinstance(exc, socket.timeout) or 'timeout' in name:
+        return 'timeout'
+    if isinstance(exc, ConnectionError) or 'connect' in name:
+        return 'connection'
+    if 'chunked' in name or 'protocol' in name or 'decode' in name:
+        return 'protocol'
+    if isinstance(exc, OSError):
+        return 'io'
+    if isinstance(exc, (ValueError, KeyError, IndexError, AttributeError)):
+        return 'parse'
+    return name
+
+
+class Metrics:
+    """各阶段的计数器和耗时直方图，可写入JSONL追踪文件或以Prometheus文本格式导出
+
+    span记录一个阶段的耗时：正常结束计为成功，抛出异常时记录错误类别后继续抛出；
+    通过返回值表示失败的阶段可以在span中设置ok=False和error。
+    """
+
+    def __init__(self, trace_path=None):
+        self.trace_path = trace_path
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._trace_file = open(trace_path, 'a', encoding='utf-8') if trace_path else None
+        self._server = None
+
+    def inc(self, name, value=1, **labels):
+        """计数器加value"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def value(self, name, **labels):
+        """读取计数器的当前值"""
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def observe(self, name, value, **labels):
+        """把一个耗时记入直方图"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0,
+                                                     'max': 0.0}
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+            histogram['max'] = max(histogram['max'], value)
+
+    def error(self, stage, exc, **attrs):
+        """记录一次被捕获的异常，返回错误类别"""
+        category = error_category(exc)
+        self.inc('errors_total', stage=stage, category=category)
+        self.trace(dict(event='error', stage=stage, category=category, message=str(exc)[:200], **attrs))
+        return category
+
+    @contextmanager
+    def span(self, stage, **attrs):
+        """记录一个阶段的耗时，结束时写入直方图和追踪文件"""
+        span = dict(attrs, ok=True)
+        start = time.monotonic()
+        started_at = time.time()
+        try:
+            yield span
+        except Exception as e:
+            span['ok'] = False
+            span['error'] = self.error(stage, e)
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            self.observe('stage_seconds', elapsed, stage=stage)
+            self.inc('stage_total', stage=stage, result='ok' if span['ok'] else 'failed')
+            self.trace(dict(event='span', stage=stage, ts=round(started_at, 6), duration=round(elapsed, 6), **span))
+
+    def trace(self, record):
+        """向追踪文件写入一行JSON"""
+        if self._trace_file is None:
+            return
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.write(line + '\n')
+
+    def summary(self):
+        """返回每个阶段的统计文本：次数、平均耗时、P95上限和最长耗时"""
+        with self._lock:
+            items = sorted((dict(labels)['stage'], dict(histogram))
+                           for (name, labels), histogram in self._histograms.items()
+                           if name == 'stage_seconds')
+            errors = sorted((labels, value) for (name, labels), value in self._counters.items()
+                            if name == 'errors_total')
+
+        lines = [f"{stage}: {h['count']} 次，平均 {h['sum'] / h['count']:.3f}s，"
+                 f"P95 ≤ {self._quantile_bound(h, 0.95)}，最长 {h['max']:.3f}s"
+                 for stage, h in items]
+        lines += [f"错误 {dict(labels)['stage']}/{dict(labels)['category']}: {value} 次" for labels, value in errors]
+        return lines
+
+    def _quantile_bound(self, histogram, quantile):
+        """根据直方图估计分位数所在桶的上限"""
+        target = histogram['count'] * quantile
+        seen = 0
+        for bound, count in zip(BUCKETS, histogram['buckets']):
+            seen += count
+            if seen >= target:
+                return f"{bound}s"
+        return f"{histogram['max']:.3f}s"
+
+    def render(self):
+        """以Prometheus文本格式导出所有指标"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, dict(value, buckets=list(value['buckets'])))
+                                for key, value in self._histograms.items())
+
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"imgbb_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+        for (name, labels), histogram in histograms:
+            metric = f"imgbb_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram['buckets']):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {histogram['sum']:.6f}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host='127.0.0.1'):
+        """在本机启动/metrics端点，返回实际监听的端口"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def close(self):
+        """停止/metrics端点并关闭追踪文件"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+
+
+def _format_labels(labels):
+    """把标签格式化为{key="value",...}"""
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
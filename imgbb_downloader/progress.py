@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import deque
+
+
+class TransferProgress:
+    """字节级下载进度：已知大小之和、已完成字节数、滑动平均速率和剩余时间
+
+    每个文件用一个键（通常是下载链接）记录大小和位置。还没拿到大小的文件按已知文件的
+    平均大小估算，所以总量在下载过程中会逐渐变得准确。带parent时，传输的字节同时计入
+    上级进度，上级的完成量和总量是所有下级之和。
+    """
+
+    def __init__(self, files=0, parent=None, window=10.0):
+        self.files = files  # 预计要下载的文件数
+        self.parent = parent
+        self.window = window  # 计算速率的时间窗口（秒）
+        self.started = time.monotonic()
+        self.transferred = 0  # 本次实际通过网络接收的字节数
+        self._sizes = {}
+        self._positions = {}
+        self._failed = set()
+        self._samples = deque()
+        self._children = []
+        self._lock = threading.Lock()
+        if parent is not None:
+            with parent._lock:
+                parent._children.append(self)
+
+    def add_files(self, count):
+        """增加预计要下载的文件数"""
+        with self._lock:
+            self.files += count
+
+    def set_size(self, key, size):
+        """记录文件的完整大小，未知时传None"""
+        with self._lock:
+            if size is None:
+                self._sizes.pop(key, None)
+            else:
+                self._sizes[key] = size
+
+    def set_position(self, key, position):
+        """设置文件已有的字节数（续传起点或已存在的文件），不计入速率"""
+        with self._lock:
+            self._positions[key] = position
+
+    def advance(self, key, count):
+        """记录从网络接收的字节"""
+        with self._lock:
+            self._positions[key] = self._positions.get(key, 0) + count
+        self._sample(count)
+
+    def fail(self, key):
+        """文件下载失败，从完成量和总量中去掉"""
+        with self._lock:
+            self._sizes.pop(key, None)
+            self._positions.pop(key, None)
+            self._failed.add(key)
+
+    def _sample(self, count):
+        """记录一次传输用于计算速率，并传给上级"""
+        now = time.monotonic()
+        with self._lock:
+            self.transferred += count
+            self._samples.append((now, count))
+            self._trim(now)
+        if self.parent is not None:
+            self.parent._sample(count)
+
+    def _trim(self, now):
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+    def _totals(self):
+        """返回(已完成字节数, 估计总字节数)，包含所有下级"""
+        with self._lock:
+            done = sum(self._positions.values())
+            known = sum(self._sizes.values())
+            unknown_files = max(self.files - len(self._sizes) - len(self._failed), 0)
+            if self._sizes and unknown_files:
+                known += known // len(self._sizes) * unknown_files
+            children = list(self._children)
+
+        for child in children:
+            child_done, child_total = child._totals()
+            done += child_done
+            known += child_total
+        return done, max(known, done)
+
+    def rate(self):
+        """最近window秒内的平均速率（字节/秒）"""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            if not self._samples:
+                return 0.0
+            elapsed = max(now - max(self._samples[0][0], now - self.window), 1.0)
+            return sum(count for _, count in self._samples) / elapsed
+
+    def snapshot(self):
+        """当前进度：done、total、rate、eta（秒，未知时为None）"""
+        done, total = self._totals()
+        rate = self.rate()
+        eta = (total - done) / rate if rate > 0 and total else None
+        return {'done': done, 'total': total, 'rate': rate, 'eta': eta}
+
+    def average_rate(self):
+        """从开始到现在的平均速率（字节/秒）"""
+        return self.transferred / max(time.monotonic() - self.started, 1e-3)
@@ -0,0 +1,71 @@
+import threading
+import time
+
+
+class AdaptiveRateLimiter:
+    """自适应限速器：遇到429/503时乘性降速，响应正常时加性提速
+
+    令牌按当前速率补充，不为等待中的请求预订时隙：等待者醒来后按最新速率重新计算，
+    提速后已在等待的请求也能更快发出。同一时间只有一个等待者在计时，其余的排队。
+    """
+
+    def __init__(self, initial_rate=8.0, min_rate=0.5, max_rate=64.0,
+                 increase_step=0.5, backoff_factor=0.5):
+        self.rate = initial_rate  # 每秒允许发出的请求数
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.backoff_factor = backoff_factor
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._turn = threading.Lock()
+
+    def _refill(self, now):
+        """按当前速率补充令牌，最多积攒一个"""
+        self._tokens = min(1.0, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """有令牌时取走并返回0，否则返回还需等待的秒数（等待后需再次调用）"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def acquire(self):
+        """阻塞直到允许发出下一个请求"""
+        with self._turn:
+            while True:
+                delay = self.try_acquire()
+                if delay <= 0:
+                    return
+                time.sleep(delay)
+
+    def on_success(self):
+        """响应正常，逐步提速"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttle(self, retry_after=None):
+        """服务器限流，降速并在Retry-After期间暂停"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+
+def parse_retry_after(value):
+    """解析Retry-After头（仅支持秒数形式）"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
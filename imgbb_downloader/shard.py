@@ -0,0 +1,203 @@
+import multiprocessing
+import os
+import queue
+import time
+
+from .engine import ImgBBDownloader
+from .events import TotalProgressSink, format_bytes
+from .jobs import JobQueue, JobRunner
+from .metrics import Metrics
+
+QUEUE_FILENAME = '.shard_queue.sqlite3'
+
+
+def shard_queue_path(output_dir):
+    """下载目录中分片队列的位置"""
+    return os.path.join(output_dir, QUEUE_FILENAME)
+
+
+def run_worker(output_dir, engine_options, events, trace_path=None):
+    """工作进程：从下载目录的分片队列中逐个取相册下载，直到队列为空
+
+    其他机器挂载同一个下载目录后也可以调用，与协调进程所在机器上的工作进程一起分担相册。
+    整个进程只创建一个下载引擎，连接池、浏览器池和解析缓存在相册之间复用。
+    """
+    jobs = JobQueue(shard_queue_path(output_dir))
+    metrics = Metrics(trace_path)
+    engine = None
+    try:
+        # 下载目录按本机路径设置，其他机器上共享目录的挂载位置可能不同；增量同步使中断的相册可以续传
+        engine = ImgBBDownloader(events=events, **dict(engine_options, output_dir=output_dir, sync_mode=True,
+                                                       metrics=metrics))
+        runner = JobRunner(jobs, events, workers=1, engine=engine)
+        runner.run()
+    except KeyboardInterrupt:
+        # 运行中的相册已放回队列
+        pass
+    else:
+        lines = metrics.summary()
+        if lines:
+            events.put(("log", f"工作进程 {os.getpid()} 阶段耗时统计:"))
+            for line in lines:
+                events.put(("log", f"  {line}"))
+    finally:
+        if engine is not None:
+            engine.close()
+        metrics.close()
+        jobs.close()
+
+
+class ShardCoordinator:
+    """分片下载：把相册放入下载目录中的共享队列，由多个工作进程各自领取，并汇总进度和结果
+
+    每个工作进程有独立的解释器和一个常驻的下载引擎，领取的相册都由它下载，
+    连接池和浏览器在相册之间复用，页面解析不再受同一个GIL限制。
+    工作进程的日志和字节进度通过进程间队列转发；相册级的进度从共享队列读取，
+    因此也包含其他机器上的工作进程。本机工作进程异常退出时，剩余的相册交给新启动的进程。
+    """
+
+    def __init__(self, output_dir, events, processes=None, engine_options=None, trace_path=None,
+                 poll_interval=0.5, report_interval=10.0):
+        self.output_dir = os.path.abspath(output_dir)
+        self.events = events
+        self.processes = processes or os.cpu_count() or 1  # 本机工作进程数
+        self.engine_options = engine_options or {}  # 传给每个ImgBBDownloader的参数
+        self.trace_path = trace_path  # 每个工作进程写入各自的追踪文件（加上进程序号）
+        self.poll_interval = poll_interval
+        self.report_interval = report_interval  # 输出相册进度汇总的间隔（秒）
+        self._context = multiprocessing.get_context('spawn')
+        self._worker_events = None
+        self._workers = []
+        self._started = 0
+        self._progress = TotalProgressSink(events)  # 合并所有工作进程中任务的字节进度
+        self._last_report = 0.0
+
+    def run(self, albums):
+        """下载相册列表，返回(总成功数, 总失败数)"""
+        jobs = JobQueue(shard_queue_path(self.output_dir))
+        try:
+            # 上次中断留下的同一相册任务会被沿用，不会重复加入
+            job_ids = {jobs.add(album['url'], self.output_dir)[0] for album in albums}
+            self.events.put(("log", f"{len(job_ids)} 个相册已加入分片队列 {jobs.path}"))
+
+            self._worker_events = self._context.Queue()
+            self._start_workers(min(self.processes, len(job_ids)))
+            try:
+                results = self._wait(jobs, job_ids)
+            except KeyboardInterrupt:
+                self._stop_workers()
+                raise
+        finally:
+            jobs.close()
+
+        success = sum(job['success'] for job in results)
+        failed = sum(job['failed'] for job in results)
+        failed_albums = sum(1 for job in results if job['state'] != 'done')
+        self.events.put(("status", f"下载完成! 成功: {success}, 失败: {failed}"))
+        self.events.put(("log", f"分片下载完成: {len(results)} 个相册，{failed_albums} 个未完成；"
+                                f"总计成功: {success}, 失败: {failed}，本机传输 {format_bytes(self._progress.total()['done'])}"))
+        return success, failed
+
+    def work(self):
+        """只启动本机工作进程，处理队列中已有的相册直到队列为空（其他机器加入分片下载时使用）"""
+        self._worker_events = self._context.Queue()
+        self._start_workers(self.processes)
+        try:
+            while any(worker.is_alive() for worker in self._workers):
+                self._forward_events()
+        except KeyboardInterrupt:
+            self._stop_workers()
+            raise
+        for worker in self._workers:
+            worker.join()
+        self._forward_events(block=False)
+
+    def _start_workers(self, count):
+        for _ in range(count):
+            trace_path = None
+            if self.trace_path:
+                root, ext = os.path.splitext(self.trace_path)
+                trace_path = f"{root}.{self._started}{ext}"
+            worker = self._context.Process(target=run_worker, args=(self.output_dir, self.engine_options,
+                                                                    self._worker_events, trace_path))
+            worker.start()
+            self._workers.append(worker)
+            self._started += 1
+        self.events.put(("log", f"已启动 {count} 个工作进程"))
+
+    def _wait(self, jobs, job_ids):
+        """转发工作进程的事件，直到所有相册结束，返回这些相册的任务记录"""
+        waiting_remote = False
+        while True:
+            self._forward_events()
+            records = [job for job in jobs.jobs() if job['id'] in job_ids]
+            self._report(records)
+            for job in records:
+                if job['state'] in ('done', 'failed'):
+                    self._progress.finish(f"job:{job['id']}")
+
+            alive = [worker for worker in self._workers if worker.is_alive()]
+            if all(job['state'] in ('done', 'failed') for job in records):
+                if not alive:
+                    break
+                continue
+
+            if not alive:
+                for worker in self._workers:
+                    worker.join()
+                self._workers = []
+                # 本机工作进程都已退出：接手心跳超时的相册，没有可领取的相册时等待其他机器完成
+                jobs.requeue_stale()
+                queued = sum(1 for job in jobs.jobs() if job['id'] in job_ids and job['state'] == 'queued')
+                if queued:
+                    self.events.put(("log", f"还有 {queued} 个相册未完成，重新启动工作进程"))
+                    self._start_workers(min(self.processes, queued))
+                elif not waiting_remote:
+                    self.events.put(("log", "等待其他机器上的工作进程完成剩余相册"))
+                    waiting_remote = True
+
+        for worker in self._workers:
+            worker.join()
+        self._forward_events(block=False)
+        return records
+
+    def _forward_events(self, block=True):
+        """转发工作进程的事件，字节进度合并为总进度"""
+        timeout = self.poll_interval if block else 0
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                event = self._worker_events.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return
+            message_type, data = event
+            if message_type == "bytes" and data['url'] is None:
+                # 工作进程只合并了自己的任务，由这里合并的总进度代替
+                continue
+            # 只合并每个任务的总进度（job:<ID>，见JobEventSink），相册进度已包含在其中
+            self._progress.put(event)
+
+    def _report(self, records):
+        """按固定间隔输出相册级进度（包含其他机器上的工作进程）"""
+        now = time.monotonic()
+        if now - self._last_report < self.report_interval:
+            return
+        self._last_report = now
+        states = {}
+        for job in records:
+            states[job['state']] = states.get(job['state'], 0) + 1
+        images_done = sum(job['images_done'] for job in records)
+        images_total = sum(job['images_total'] for job in records)
+        self.events.put(("log", f"分片进度: 相册 {states.get('done', 0) + states.get('failed', 0)}/{len(records)} "
+                                f"已结束，{states.get('running', 0)} 个进行中；图片 {images_done}/{images_total}"))
+
+    def _stop_workers(self, timeout=10.0):
+        """中断时等待工作进程把相册放回队列，超时后强制结束"""
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            while worker.is_alive() and time.monotonic() < deadline:
+                self._forward_events(block=False)
+                worker.join(0.2)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
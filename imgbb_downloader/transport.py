@@ -0,0 +1,176 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+
+class HttpTransport:
+    """共享HTTP传输层：按主机复用连接池，统一重试与超时策略，可选HTTP/2"""
+
+    DEFAULT_HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+        'Referer': 'https://imgbb.com/',
+    }
+
+    def __init__(self, pool_size=32, retries=3, backoff_factor=0.5, timeout=(10, 30), http2=False, metrics=None):
+        self.pool_size = pool_size  # 每个主机保持的连接数
+        self.timeout = timeout  # (连接超时, 读取超时)
+        self.metrics = metrics  # 记录请求耗时和状态码
+        self.http2 = False
+        self._client = None
+        self._session = None
+        self._request_count = 0
+        self._connect_count = 0
+        self._lock = threading.Lock()
+
+        if http2:
+            self._client = self._create_http2_client(retries)
+            self.http2 = self._client is not None
+
+        if self._client is None:
+            # 429/503由限速器处理，这里只重试连接错误和其他5xx
+            retry = Retry(total=retries, backoff_factor=backoff_factor,
+                          status_forcelist=(500, 502, 504), allowed_methods=frozenset(['GET', 'HEAD']),
+                          raise_on_status=False)
+            adapter = _CountingAdapter(self._count_connect, pool_connections=16, pool_maxsize=pool_size,
+                                       max_retries=retry)
+            self._session = requests.Session()
+            self._session.headers.update(self.DEFAULT_HEADERS)
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+
+    def _create_http2_client(self, retries):
+        """创建HTTP/2客户端（需要安装httpx[http2]），不可用时返回None"""
+        try:
+            import httpx
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            transport = httpx.HTTPTransport(http2=True, retries=retries, limits=limits)
+            return httpx.Client(transport=transport, headers=self.DEFAULT_HEADERS, follow_redirects=True,
+                                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]))
+        except ImportError:
+            return None
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        """发送GET请求，返回requests风格的响应对象"""
+        return self._send('GET', url, headers, stream, timeout)
+
+    def head(self, url, headers=None, timeout=None):
+        """发送HEAD请求，跟随重定向"""
+        return self._send('HEAD', url, headers, False, timeout)
+
+    def _send(self, method, url, headers, stream, timeout):
+        """通过连接池发送请求"""
+        timeout = timeout or self.timeout
+        with self._lock:
+            self._request_count += 1
+
+        start = time.monotonic()
+        if self._client is not None:
+            import httpx
+            if isinstance(timeout, tuple):
+                timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+            request = self._client.build_request(method, url, headers=headers, timeout=timeout,
+                                                 extensions={'trace': self._trace_http2})
+            response = _HttpxResponse(self._client.send(request, stream=stream))
+        else:
+            response = self._session.request(method, url, headers=headers, stream=stream, timeout=timeout,
+                                             allow_redirects=True)
+
+        # 网络错误由调用方按所在阶段记录
+        if self.metrics is not None:
+            # 流式请求只统计到收到响应头为止
+            self.metrics.observe('http_seconds', time.monotonic() - start, method=method)
+            self.metrics.inc('http_responses_total', status=str(response.status_code))
+        return response
+
+    def _count_connect(self):
+        """记录一次新建的TCP/TLS连接"""
+        with self._lock:
+            self._connect_count += 1
+
+    def _trace_http2(self, event_name, info):
+        """httpcore的trace回调，新建连接时计数"""
+        if event_name == 'connection.connect_tcp.complete':
+            self._count_connect()
+
+    def stats(self):
+        """连接复用统计：请求数、新建连接数、复用次数"""
+        with self._lock:
+            return {
+                'requests': self._request_count,
+                'connections': self._connect_count,
+                'reused': max(0, self._request_count - self._connect_count),
+                'http2': self.http2,
+            }
+
+    def close(self):
+        """关闭所有连接"""
+        if self._client is not None:
+            self._client.close()
+        if self._session is not None:
+            self._session.close()
+
+
+class _HttpxResponse:
+    """把httpx响应包装成requests风格的接口"""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+        self.http_version = response.http_version
+
+    @property
+    def content(self):
+        return self._response.read()
+
+    @property
+    def text(self):
+        self._response.read()
+        return self._response.text
+
+    def iter_content(self, chunk_size=65536):
+        return self._response.iter_bytes(chunk_size)
+
+    def close(self):
+        self._response.close()
+
+
+def _counting_pool_classes(on_connect):
+    """生成在每次建立连接时回调的连接池类"""
+
+    class CountingHTTPConnection(HTTPConnection):
+        def connect(self):
+            on_connect()
+            super().connect()
+
+    class CountingHTTPSConnection(HTTPSConnection):
+        def connect(self):
+            on_connect()
+            super().connect()
+
+    class CountingHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = CountingHTTPConnection
+
+    class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = CountingHTTPSConnection
+
+    return {'http': CountingHTTPConnectionPool, 'https': CountingHTTPSConnectionPool}
+
+
+class _CountingAdapter(HTTPAdapter):
+    """统计实际建立连接次数的HTTPAdapter（包括断开后的重连）"""
+
+    def __init__(self, on_connect, **kwargs):
+        self._on_connect = on_connect
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _counting_pool_classes(self._on_connect)
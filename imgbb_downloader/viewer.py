@@ -0,0 +1,91 @@
+import html
+import re
+
+# 下载按钮：<a class="btn btn-download default" href="...">
+_ANCHOR = re.compile(r'<a\b[^>]*\bbtn-download\b[^>]*>', re.IGNORECASE)
+_OG_IMAGE = re.compile(r'<meta\b[^>]*\bog:image\b[^>]*>', re.IGNORECASE)
+# 页面脚本中的图片信息，例如 "url":"https:\/\/i.ibb.co\/abc\/x.jpg"
+_JSON_URL = re.compile(r'"(?:url|contentUrl|image)"\s*:\s*"(https?:(?:\\?/){2}i\.ibb\.co(?:\\?/)[^"]+)"')
+_CDN_URL = re.compile(r'https://i\.ibb\.co/[A-Za-z0-9]+/[^"\'\s<>]+')
+_CLASS = re.compile(r'\bclass\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.IGNORECASE)
+_HREF = re.compile(r'\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.IGNORECASE)
+_CONTENT = re.compile(r'\bcontent\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.IGNORECASE)
+
+
+def _attribute(pattern, tag):
+    """读取标签中的属性值"""
+    match = pattern.search(tag)
+    if not match:
+        return None
+    return html.unescape(next(value for value in match.groups() if value is not None))
+
+
+class ViewerPageScanner:
+    """增量扫描viewer页HTML，找到下载按钮的链接后即可停止读取
+
+    不构建DOM，只用正则查找下载按钮所在的<a>标签。按钮找不到时依次退回到
+    og:image、页面脚本中的图片JSON和i.ibb.co直链，这些候选在读完整个页面后由result()返回。
+    """
+
+    OVERLAP = 4096  # 保留上一块末尾的字符数，避免标签被分块截断
+
+    def __init__(self, stop_at_og_image=False):
+        self.stop_at_og_image = stop_at_og_image  # og:image是i.ibb.co直链时也立即停止
+        self.url = None
+        self._tail = ''
+        self._og_image = None
+        self._json_url = None
+        self._cdn_url = None
+
+    def feed(self, text):
+        """送入下一段HTML，找到下载按钮时返回其链接"""
+        if self.url:
+            return self.url
+
+        buffer = self._tail + text
+        for match in _ANCHOR.finditer(buffer):
+            tag = match.group(0)
+            classes = (_attribute(_CLASS, tag) or '').split()
+            href = _attribute(_HREF, tag)
+            if 'btn-download' in classes and href:
+                self.url = href
+                return href
+
+        self._scan_fallbacks(buffer)
+        self._tail = buffer[-self.OVERLAP:]
+        if self.stop_at_og_image and self._og_image and _CDN_URL.match(self._og_image):
+            self.url = self._og_image
+            return self.url
+        return None
+
+    def _scan_fallbacks(self, buffer):
+        """记录备用候选，只保留每种的第一个"""
+        if self._og_image is None:
+            match = _OG_IMAGE.search(buffer)
+            if match:
+                self._og_image = _attribute(_CONTENT, match.group(0))
+        if self._json_url is None:
+            match = _JSON_URL.search(buffer)
+            if match:
+                self._json_url = match.group(1).replace('\\/', '/')
+        if self._cdn_url is None:
+            # 直链没有结束标记，到达缓冲区末尾的匹配可能被分块截断，等下一块或页面读完再确认
+            for match in _CDN_URL.finditer(buffer):
+                if match.end() < len(buffer):
+                    self._cdn_url = match.group(0)
+                    break
+
+    def result(self):
+        """页面读完后的最佳结果：下载按钮 > og:image > 图片JSON > 直链"""
+        if self._cdn_url is None:
+            match = _CDN_URL.search(self._tail)
+            if match:
+                self._cdn_url = match.group(0)
+        return self.url or self._og_image or self._json_url or self._cdn_url
+
+
+def extract_download_url(page):
+    """从完整的viewer页中提取下载直链，找不到时返回None"""
+    scanner = ViewerPageScanner()
+    scanner.feed(page)
+    return scanner.result()
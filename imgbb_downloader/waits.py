@@ -0,0 +1,85 @@
+import threading
+import time
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+# 记录页面最后一次DOM变化的时间，用于判断页面是否已经安静下来
+INSTALL_MUTATION_OBSERVER = """
+if (!window.__imgbbObserver && document.body) {
+    window.__imgbbLastMutation = Date.now();
+    window.__imgbbObserver = new MutationObserver(function () {
+        window.__imgbbLastMutation = Date.now();
+    });
+    window.__imgbbObserver.observe(document.body, {childList: true, subtree: true, attributes: true});
+}
+"""
+
+# 列表页当前状态：高度、条目数、距上次DOM变化的毫秒数、未完成的jQuery请求数
+LISTING_STATE = """
+return {
+    height: document.body.scrollHeight,
+    items: document.querySelectorAll('.list-item').length,
+    quietMs: Date.now() - (window.__imgbbLastMutation || 0),
+    pending: window.jQuery ? window.jQuery.active : 0,
+    ready: document.readyState
+};
+"""
+
+
+class WaitStats:
+    """按名称统计每类等待的次数、总耗时、最长耗时和超时次数"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, elapsed, timed_out):
+        """记录一次等待"""
+        with self._lock:
+            count, total, longest, timeouts = self._stats.get(name, (0, 0.0, 0.0, 0))
+            self._stats[name] = (count + 1, total + elapsed, max(longest, elapsed), timeouts + int(timed_out))
+
+    def summary(self):
+        """返回每类等待的统计文本"""
+        with self._lock:
+            items = sorted(self._stats.items())
+        return [f"{name}: {count} 次，平均 {total / count:.2f}s，最长 {longest:.2f}s，超时 {timeouts} 次"
+                for name, (count, total, longest, timeouts) in items]
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self._stats.clear()
+
+
+def wait_for(driver, condition, timeout, name, stats, poll_frequency=0.1):
+    """等待浏览器条件成立，返回条件的值；超时返回None"""
+    start = time.monotonic()
+    try:
+        result = WebDriverWait(driver, timeout, poll_frequency=poll_frequency).until(condition)
+        stats.record(name, time.monotonic() - start, False)
+        return result
+    except TimeoutException:
+        stats.record(name, time.monotonic() - start, True)
+        return None
+
+
+def poll_until(predicate, timeout, name, stats, interval=0.05):
+    """轮询浏览器之外的条件（例如剪贴板），返回条件的值；超时返回None"""
+    start = time.monotonic()
+    deadline = start + timeout
+    while True:
+        result = predicate()
+        if result:
+            stats.record(name, time.monotonic() - start, False)
+            return result
+        if time.monotonic() >= deadline:
+            stats.record(name, time.monotonic() - start, True)
+            return None
+        time.sleep(interval)
+
+
+def document_ready(driver):
+    """document.readyState为complete"""
+    return driver.execute_script("return document.readyState") == "complete"
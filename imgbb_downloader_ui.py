@@ -1,26 +1,19 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
+import os
 import threading
 import queue
-import requests
 import time
-import os
-import json
-import re
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from selenium.webdriver.common.keys import Keys
-from bs4 import BeautifulSoup
-from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor
-import sys
-import pyperclip
+
+from imgbb_downloader import ImgBBDownloader
+from imgbb_downloader.events import format_progress
 
 
 class ImgBBDownloaderUI:
+    TICK_MS = 100  # 界面处理事件的间隔
+    TICK_BUDGET = 0.03  # 每次最多花多少秒处理事件，积压的事件留到下一次
+    LOG_MAX_LINES = 5000  # 日志窗口最多保留的行数，更早的行只写入日志文件
+
     def __init__(self, root):
         self.root = root
         self.root.title("ImgBB 批量下载工具")
@@ -31,10 +24,13 @@ class ImgBBDownloaderUI:
         self.setup_styles()
 
         # 变量
-        self.driver = None
         self.album_data = {}
         self.download_queue = queue.Queue()
         self.is_downloading = False
+        self.log_file = None
+
+        # 下载引擎，通过download_queue上报进度
+        self.engine = ImgBBDownloader(events=self.download_queue)
 
         # 创建界面
         self.create_widgets()
@@ -42,6 +38,18 @@ class ImgBBDownloaderUI:
         # 启动队列监听
         self.check_queue()
 
+        # 关闭窗口时释放常驻的浏览器池
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        """关闭窗口"""
+        try:
+            self.engine.close()
+            if self.log_file:
+                self.log_file.close()
+        finally:
+            self.root.destroy()
+
     def setup_styles(self):
         """设置界面样式"""
         style = ttk.Style()
@@ -77,6 +85,17 @@ class ImgBBDownloaderUI:
                         foreground='white',
                         font=('Arial', 10, 'bold'))
 
+        style.configure('Album.Treeview',
+                        background='#404040',
+                        fieldbackground='#404040',
+                        foreground='white',
+                        font=('Arial', 9))
+
+        style.configure('Album.Treeview.Heading',
+                        background='#2d2d2d',
+                        foreground='white',
+                        font=('Arial', 9, 'bold'))
+
     def create_widgets(self):
         """创建界面组件"""
         # 主框架
@@ -113,6 +132,30 @@ class ImgBBDownloaderUI:
                                     command=self.clear_url, style='Warning.TButton')
         self.clear_btn.pack(side=tk.LEFT)
 
+        self.prune_var = tk.BooleanVar(value=False)
+        self.prune_check = tk.Checkbutton(button_frame, text="删除已移除的图片", variable=self.prune_var,
+                                          bg='#2d2d2d', fg='white', selectcolor='#404040',
+                                          activebackground='#2d2d2d', activeforeground='white')
+        self.prune_check.pack(side=tk.RIGHT)
+
+        self.sync_var = tk.BooleanVar(value=False)
+        self.sync_check = tk.Checkbutton(button_frame, text="增量同步", variable=self.sync_var,
+                                         bg='#2d2d2d', fg='white', selectcolor='#404040',
+                                         activebackground='#2d2d2d', activeforeground='white')
+        self.sync_check.pack(side=tk.RIGHT, padx=(0, 10))
+
+        self.shortest_var = tk.BooleanVar(value=False)
+        self.shortest_check = tk.Checkbutton(button_frame, text="小相册优先", variable=self.shortest_var,
+                                             bg='#2d2d2d', fg='white', selectcolor='#404040',
+                                             activebackground='#2d2d2d', activeforeground='white')
+        self.shortest_check.pack(side=tk.RIGHT, padx=(0, 10))
+
+        self.recrawl_var = tk.BooleanVar(value=False)
+        self.recrawl_check = tk.Checkbutton(button_frame, text="重新抓取", variable=self.recrawl_var,
+                                            bg='#2d2d2d', fg='white', selectcolor='#404040',
+                                            activebackground='#2d2d2d', activeforeground='white')
+        self.recrawl_check.pack(side=tk.RIGHT, padx=(0, 10))
+
         # 相册选择区域
         self.album_frame = tk.Frame(main_frame, bg='#2d2d2d', relief=tk.RAISED, bd=2)
         self.album_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 20))
@@ -163,14 +206,41 @@ class ImgBBDownloaderUI:
         self.progress_label.pack(anchor=tk.W, padx=10, pady=(0, 5))
 
         self.progress_bar = ttk.Progressbar(progress_frame, mode='indeterminate')
-        self.progress_bar.pack(fill=tk.X, padx=10, pady=(0, 10))
+        self.progress_bar.pack(fill=tk.X, padx=10, pady=(0, 5))
+
+        self.bytes_var = tk.StringVar(value="")
+        self.bytes_label = ttk.Label(progress_frame, textvariable=self.bytes_var, style='Subtitle.TLabel')
+        self.bytes_label.pack(anchor=tk.W, padx=10, pady=(0, 10))
+
+        # 每个相册的下载进度
+        self.album_progress = ttk.Treeview(progress_frame, columns=('state', 'progress', 'bytes'), height=5,
+                                           style='Album.Treeview')
+        self.album_progress.heading('#0', text='相册')
+        self.album_progress.heading('state', text='状态')
+        self.album_progress.heading('progress', text='图片')
+        self.album_progress.heading('bytes', text='流量')
+        self.album_progress.column('#0', width=380)
+        self.album_progress.column('state', width=80, anchor=tk.CENTER)
+        self.album_progress.column('progress', width=140, anchor=tk.CENTER)
+        self.album_progress.column('bytes', width=360, anchor=tk.CENTER)
+        self.album_progress.pack(fill=tk.X, padx=10, pady=(0, 10))
 
         # 日志区域
         log_frame = tk.Frame(main_frame, bg='#2d2d2d', relief=tk.RAISED, bd=2)
         log_frame.pack(fill=tk.BOTH, expand=True)
 
-        log_title = ttk.Label(log_frame, text="操作日志", style='Subtitle.TLabel')
-        log_title.pack(anchor=tk.W, padx=10, pady=(10, 5))
+        log_header = tk.Frame(log_frame, bg='#2d2d2d')
+        log_header.pack(fill=tk.X, padx=10, pady=(10, 5))
+
+        log_title = ttk.Label(log_header, text="操作日志", style='Subtitle.TLabel')
+        log_title.pack(side=tk.LEFT)
+
+        self.log_file_var = tk.BooleanVar(value=False)
+        self.log_file_check = tk.Checkbutton(log_header, text="完整日志写入文件", variable=self.log_file_var,
+                                             command=self.toggle_log_file,
+                                             bg='#2d2d2d', fg='white', selectcolor='#404040',
+                                             activebackground='#2d2d2d', activeforeground='white')
+        self.log_file_check.pack(side=tk.RIGHT)
 
         # 日志文本框
         log_text_frame = tk.Frame(log_frame, bg='#2d2d2d')
@@ -187,11 +257,37 @@ class ImgBBDownloaderUI:
 
     def log_message(self, message):
         """添加日志消息"""
+        self._append_log([f"[{time.strftime('%H:%M:%S')}] {message}"])
+
+    def _append_log(self, lines):
+        """批量追加日志行，窗口中只保留最近LOG_MAX_LINES行"""
+        if self.log_file:
+            self.log_file.write("\n".join(lines) + "\n")
+            self.log_file.flush()
+
         self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, f"[{time.strftime('%H:%M:%S')}] {message}\n")
+        self.log_text.insert(tk.END, "\n".join(lines[-self.LOG_MAX_LINES:]) + "\n")
+        line_count = int(self.log_text.index('end-1c').split('.')[0]) - 1
+        if line_count > self.LOG_MAX_LINES:
+            self.log_text.delete('1.0', f"{line_count - self.LOG_MAX_LINES + 1}.0")
         self.log_text.see(tk.END)
         self.log_text.config(state=tk.DISABLED)
-        self.root.update_idletasks()
+
+    def toggle_log_file(self):
+        """开启或关闭完整日志文件"""
+        if self.log_file_var.get():
+            path = os.path.join(self.engine.output_dir, "imgbb_downloader.log")
+            try:
+                os.makedirs(self.engine.output_dir, exist_ok=True)
+                self.log_file = open(path, 'a', encoding='utf-8')
+            except OSError as e:
+                self.log_file_var.set(False)
+                messagebox.showerror("错误", f"无法打开日志文件: {e}")
+                return
+            self.log_message(f"完整日志写入: {os.path.abspath(path)}")
+        elif self.log_file:
+            self.log_file.close()
+            self.log_file = None
 
     def clear_url(self):
         """清空URL输入框"""
@@ -210,9 +306,20 @@ class ImgBBDownloaderUI:
             messagebox.showerror("错误", "请输入有效的URL")
             return
 
+        self._apply_sync_options()
+
         # 在新线程中执行分析
         threading.Thread(target=self._analyze_url_thread, args=(url,), daemon=True).start()
 
+    def _apply_sync_options(self):
+        """在主线程中读取同步和重新抓取选项，供下载线程使用"""
+        self.engine.sync_mode = self.sync_var.get()
+        self.engine.prune_deleted = self.prune_var.get()
+        self.engine.album_order = "shortest" if self.shortest_var.get() else "fair"
+        if self.recrawl_var.get():
+            # 丢弃上次中断留下的检查点，相册和viewer链接全部重新抓取
+            self.engine.discovery.clear()
+
     def _analyze_url_thread(self, url):
         """在线程中分析URL"""
         try:
@@ -223,413 +330,17 @@ class ImgBBDownloaderUI:
             if '/album/' in url:
                 # 单个相册链接
                 self.download_queue.put(("log", f"检测到单个相册链接: {url}"))
-                self._download_single_album(url)
+                self.engine.download_album(url)
             else:
                 # 主页链接，获取所有相册
                 self.download_queue.put(("log", f"检测到主页链接: {url}"))
-                self._get_albums_from_homepage(url)
+                self.engine.get_albums(url)
 
         except Exception as e:
             self.download_queue.put(("error", f"分析链接失败: {str(e)}"))
         finally:
             self.download_queue.put(("progress_stop", None))
 
-    def _get_albums_from_homepage(self, base_url):
-        """从主页获取所有相册"""
-        try:
-            # 设置浏览器
-            self.driver = self.setup_driver()
-            albums_url = base_url.rstrip('/') + "/albums"
-
-            self.download_queue.put(("log", f"访问相册页面: {albums_url}"))
-            self.driver.get(albums_url)
-
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-
-            # 滚动加载所有相册
-            self.download_queue.put(("log", "正在加载所有相册..."))
-            self._load_all_content()
-
-            # 获取相册信息
-            albums = self._extract_album_info()
-
-            if albums:
-                self.download_queue.put(("albums", albums))
-                self.download_queue.put(("log", f"找到 {len(albums)} 个相册"))
-            else:
-                self.download_queue.put(("error", "未找到任何相册"))
-
-        except Exception as e:
-            self.download_queue.put(("error", f"获取相册列表失败: {str(e)}"))
-        finally:
-            if self.driver:
-                self.driver.quit()
-                self.driver = None
-
-    def _extract_album_info(self):
-        """提取相册信息"""
-        albums = []
-        try:
-            # 查找相册链接
-            album_links = self.driver.find_elements(By.CSS_SELECTOR, "a.list-item-desc-title-link")
-
-            for link in album_links:
-                try:
-                    album_name = link.text.strip()
-                    album_url = link.get_attribute('href')
-
-                    if album_name and album_url and 'ibb.co/album/' in album_url:
-                        albums.append({
-                            'name': album_name,
-                            'url': album_url
-                        })
-                        self.download_queue.put(("log", f"找到相册: {album_name} - {album_url}"))
-                except Exception as e:
-                    continue
-
-        except Exception as e:
-            self.download_queue.put(("error", f"提取相册信息失败: {str(e)}"))
-
-        return albums
-
-    def _download_single_album(self, album_url):
-        """下载单个相册"""
-        try:
-            self.driver = self.setup_driver()
-            self.download_queue.put(("log", f"开始下载相册: {album_url}"))
-
-            # 获取相册信息
-            album_info = self._get_album_info(album_url)
-            if album_info:
-                # 直接开始下载
-                self._process_album_download(album_info['name'], album_info['viewer_links'])
-            else:
-                self.download_queue.put(("error", "获取相册信息失败"))
-
-        except Exception as e:
-            self.download_queue.put(("error", f"下载相册失败: {str(e)}"))
-        finally:
-            if self.driver:
-                self.driver.quit()
-                self.driver = None
-
-    def _get_album_info(self, album_url):
-        """获取单个相册的信息"""
-        try:
-            self.driver.get(album_url)
-            time.sleep(3)
-
-            # 获取相册名称
-            album_name = "未知相册"
-            title_selectors = ["h1", ".title", ".album-title", ".content-title"]
-
-            for selector in title_selectors:
-                try:
-                    title_element = self.driver.find_element(By.CSS_SELECTOR, selector)
-                    title_text = title_element.text.strip()
-                    if title_text and len(title_text) < 100:
-                        album_name = title_text
-                        break
-                except:
-                    continue
-
-            if album_name == "未知相册":
-                album_id = album_url.split('/')[-1]
-                album_name = f"相册_{album_id}"
-
-            # 获取viewer链接
-            viewer_links = self._extract_viewer_links_from_album()
-
-            return {
-                'name': album_name,
-                'url': album_url,
-                'viewer_links': viewer_links
-            }
-
-        except Exception as e:
-            self.download_queue.put(("error", f"获取相册信息失败: {str(e)}"))
-            return None
-
-    def _extract_viewer_links_from_album(self):
-        """从相册页面提取viewer链接"""
-        try:
-            # 查找嵌入代码按钮
-            embed_selectors = [
-                "a[data-tab='tab-embeds']",
-                "a#tab-embeds-link",
-                "a[href*='/embeds']"
-            ]
-
-            embed_button = None
-            for selector in embed_selectors:
-                try:
-                    buttons = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    if buttons:
-                        embed_button = buttons[0]
-                        break
-                except:
-                    continue
-
-            if embed_button:
-                self.download_queue.put(("log", "点击嵌入代码按钮..."))
-                self.driver.execute_script("arguments[0].click();", embed_button)
-                time.sleep(3)  # 等待页面加载
-
-                # 方法1：尝试从textarea复制链接
-                viewer_links = self._extract_links_from_textarea()
-
-                # 方法2：如果textarea方法失败，使用HTML解析作为备用
-                if not viewer_links:
-                    self.download_queue.put(("log", "textarea方法未获取到链接，尝试HTML解析方法..."))
-                    viewer_links = self._extract_links_from_html()
-
-                self.download_queue.put(("log", f"提取到 {len(viewer_links)} 个viewer链接"))
-                return viewer_links
-            else:
-                self.download_queue.put(("error", "未找到嵌入代码按钮"))
-                return []
-
-        except Exception as e:
-            self.download_queue.put(("error", f"提取viewer链接失败: {str(e)}"))
-            return []
-
-    def _extract_links_from_textarea(self):
-        """从textarea中提取viewer链接"""
-        try:
-            self.download_queue.put(("log", "尝试从textarea获取链接..."))
-
-            # 查找包含viewer-links的textarea
-            textarea_selectors = [
-                'textarea[name="viewer-links"]',
-                'textarea[data-size="viewer"]',
-                'textarea[id*="album-embed-code"]',
-                'textarea[data-focus="select-all"]'
-            ]
-
-            textarea_element = None
-            for selector in textarea_selectors:
-                try:
-                    textarea_elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    if textarea_elements:
-                        textarea_element = textarea_elements[0]
-                        self.download_queue.put(("log", f"找到textarea元素: {selector}"))
-                        break
-                except:
-                    continue
-
-            if not textarea_element:
-                self.download_queue.put(("log", "未找到包含viewer-links的textarea"))
-
-                # 调试：显示所有textarea元素
-                all_textareas = self.driver.find_elements(By.TAG_NAME, "textarea")
-                self.download_queue.put(("log", f"页面中共有 {len(all_textareas)} 个textarea元素"))
-
-                for i, ta in enumerate(all_textareas):
-                    ta_name = ta.get_attribute('name') or ''
-                    ta_id = ta.get_attribute('id') or ''
-                    ta_class = ta.get_attribute('class') or ''
-                    self.download_queue.put(
-                        ("log", f"textarea {i + 1}: name='{ta_name}', id='{ta_id}', class='{ta_class}'"))
-
-                return []
-
-            # 方法1：直接获取textarea的内容
-            try:
-                self.download_queue.put(("log", "方法1: 直接获取textarea的value属性..."))
-
-                # 使用多种方式获取textarea内容
-                textarea_content = None
-
-                # 尝试1: 获取value属性
-                textarea_content = textarea_element.get_attribute('value')
-                if not textarea_content:
-                    # 尝试2: 获取textContent
-                    textarea_content = textarea_element.get_attribute('textContent')
-                if not textarea_content:
-                    # 尝试3: 获取innerHTML
-                    textarea_content = textarea_element.get_attribute('innerHTML')
-                if not textarea_content:
-                    # 尝试4: 使用JavaScript获取value
-                    textarea_content = self.driver.execute_script("return arguments[0].value;", textarea_element)
-                if not textarea_content:
-                    # 尝试5: 使用JavaScript获取textContent
-                    textarea_content = self.driver.execute_script("return arguments[0].textContent;", textarea_element)
-
-                if textarea_content:
-                    self.download_queue.put(("log", f"成功获取textarea内容，长度: {len(textarea_content)} 字符"))
-                    self.download_queue.put(("log", "=" * 50))
-                    self.download_queue.put(("log", "Textarea内容："))
-                    # 显示内容（限制长度）
-                    content_preview = textarea_content[:800] + "..." if len(
-                        textarea_content) > 800 else textarea_content
-                    self.download_queue.put(("log", content_preview))
-                    self.download_queue.put(("log", "=" * 50))
-
-                    # 解析链接
-                    viewer_links = self._parse_links_from_content(textarea_content)
-                    if viewer_links:
-                        return viewer_links
-                else:
-                    self.download_queue.put(("log", "textarea内容为空，尝试其他方法..."))
-
-            except Exception as e:
-                self.download_queue.put(("log", f"直接获取textarea内容失败: {e}"))
-
-            # 方法2：点击textarea并尝试复制
-            try:
-                self.download_queue.put(("log", "方法2: 点击textarea并复制..."))
-
-                # 滚动到textarea可见
-                self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", textarea_element)
-                time.sleep(1)
-
-                # 点击textarea
-                self.driver.execute_script("arguments[0].click();", textarea_element)
-                time.sleep(0.5)
-
-                # 全选内容
-                # 方法A: 使用Ctrl+A
-                textarea_element.send_keys(Keys.CONTROL + "a")
-                time.sleep(0.5)
-
-                # 复制内容
-                textarea_element.send_keys(Keys.CONTROL + "c")
-                time.sleep(1)
-
-                # 获取剪贴板内容
-                try:
-                    clipboard_content = pyperclip.paste()
-                    if clipboard_content:
-                        self.download_queue.put(("log", f"从剪贴板获取到内容，长度: {len(clipboard_content)} 字符"))
-                        self.download_queue.put(("log", "剪贴板内容预览:"))
-                        content_preview = clipboard_content[:500] + "..." if len(
-                            clipboard_content) > 500 else clipboard_content
-                        self.download_queue.put(("log", content_preview))
-
-                        viewer_links = self._parse_links_from_content(clipboard_content)
-                        if viewer_links:
-                            return viewer_links
-                    else:
-                        self.download_queue.put(("log", "剪贴板内容为空"))
-                except Exception as e:
-                    self.download_queue.put(("log", f"获取剪贴板内容失败: {e}"))
-
-            except Exception as e:
-                self.download_queue.put(("log", f"点击复制方法失败: {e}"))
-
-            # 方法3：使用JavaScript强制获取内容
-            try:
-                self.download_queue.put(("log", "方法3: 使用JavaScript强制获取..."))
-
-                # 尝试多种JavaScript方法获取内容
-                js_methods = [
-                    "return arguments[0].value;",
-                    "return arguments[0].textContent;",
-                    "return arguments[0].innerText;",
-                    "return arguments[0].innerHTML;",
-                    "return arguments[0].defaultValue;",
-                    "arguments[0].select(); return document.getSelection().toString();",
-                ]
-
-                for i, js_code in enumerate(js_methods):
-                    try:
-                        content = self.driver.execute_script(js_code, textarea_element)
-                        if content and len(content.strip()) > 0:
-                            self.download_queue.put(("log", f"JavaScript方法 {i + 1} 成功获取内容"))
-                            viewer_links = self._parse_links_from_content(content)
-                            if viewer_links:
-                                return viewer_links
-                    except Exception as e:
-                        continue
-
-            except Exception as e:
-                self.download_queue.put(("log", f"JavaScript强制获取失败: {e}"))
-
-            self.download_queue.put(("log", "所有textarea获取方法都失败"))
-            return []
-
-        except Exception as e:
-            self.download_queue.put(("log", f"textarea方法整体失败: {e}"))
-            return []
-
-    def _parse_links_from_content(self, content):
-        """从内容中解析viewer链接"""
-        try:
-            viewer_links = []
-
-            if not content:
-                return []
-
-            # 按行分割内容
-            lines = content.split('\n')
-
-            for line in lines:
-                line = line.strip()
-                if line and 'ibb.co/' in line:
-                    # 方法1: 提取完整的https链接
-                    urls = re.findall(r'https://ibb\.co/[A-Za-z0-9]+', line)
-                    for url in urls:
-                        if '/album/' not in url:  # 排除相册链接
-                            viewer_links.append(url)
-
-                    # 方法2: 如果没有https，尝试提取ibb.co部分并补全
-                    if not urls and 'ibb.co/' in line:
-                        partial_urls = re.findall(r'ibb\.co/([A-Za-z0-9]+)', line)
-                        for partial_url in partial_urls:
-                            if len(partial_url) >= 5:  # 确保ID长度合理
-                                full_url = f'https://ibb.co/{partial_url}'
-                                viewer_links.append(full_url)
-
-            # 去重
-            viewer_links = list(set(viewer_links))
-
-            if viewer_links:
-                self.download_queue.put(("log", f"解析到 {len(viewer_links)} 个唯一viewer链接"))
-
-                # 显示前几个链接
-                for i, link in enumerate(viewer_links[:5]):
-                    self.download_queue.put(("log", f"  {i + 1}. {link}"))
-                if len(viewer_links) > 5:
-                    self.download_queue.put(("log", f"  ... 还有 {len(viewer_links) - 5} 个链接"))
-
-            return viewer_links
-
-        except Exception as e:
-            self.download_queue.put(("log", f"解析链接失败: {e}"))
-            return []
-
-    def _extract_links_from_html(self):
-        """从HTML源码提取viewer链接（备用方法）"""
-        try:
-            self.download_queue.put(("log", "使用HTML解析方法提取viewer链接..."))
-
-            # 获取页面源码
-            page_source = self.driver.page_source
-
-            # 使用正则表达式提取viewer链接
-            # 特征：<a href开头，含有https://ibb.co，且其后只有一个/
-            pattern = r'<a href="(https://ibb\.co/[^/"]+)"[^>]*>'
-            matches = re.findall(pattern, page_source)
-
-            # 去重
-            viewer_links = list(set(matches))
-
-            self.download_queue.put(("log", f"HTML方法提取到 {len(viewer_links)} 个viewer链接"))
-
-            # 显示前几个链接
-            for i, link in enumerate(viewer_links[:5]):
-                self.download_queue.put(("log", f"  {i + 1}. {link}"))
-            if len(viewer_links) > 5:
-                self.download_queue.put(("log", f"  ... 还有 {len(viewer_links) - 5} 个链接"))
-
-            return viewer_links
-
-        except Exception as e:
-            self.download_queue.put(("log", f"HTML解析方法失败: {e}"))
-            return []
-
     def select_all_albums(self):
         """全选相册"""
         self.album_listbox.select_set(0, tk.END)
@@ -649,6 +360,8 @@ class ImgBBDownloaderUI:
             messagebox.showwarning("警告", "正在下载中，请稍后...")
             return
 
+        self._apply_sync_options()
+
         # 在新线程中下载
         threading.Thread(target=self._download_selected_albums_thread,
                          args=(selected_indices,), daemon=True).start()
@@ -659,242 +372,77 @@ class ImgBBDownloaderUI:
             self.is_downloading = True
             self.download_queue.put(("progress_start", None))
 
-            # 设置浏览器
-            self.driver = self.setup_driver()
-
-            total_success = 0
-            total_failed = 0
-
-            for i, index in enumerate(selected_indices):
-                album_info = list(self.album_data.values())[index]
-                album_name = album_info['name']
-                album_url = album_info['url']
-
-                self.download_queue.put(("status", f"处理相册 {i + 1}/{len(selected_indices)}: {album_name}"))
-                self.download_queue.put(("log", f"开始处理相册: {album_name}"))
-
-                # 获取相册详细信息
-                detailed_info = self._get_album_info(album_url)
-                if detailed_info and detailed_info['viewer_links']:
-                    success, failed = self._process_album_download(album_name, detailed_info['viewer_links'])
-                    total_success += success
-                    total_failed += failed
-                else:
-                    self.download_queue.put(("log", f"相册 {album_name} 没有找到图片"))
-
-            self.download_queue.put(("status", f"下载完成! 成功: {total_success}, 失败: {total_failed}"))
-            self.download_queue.put(("log", f"所有相册下载完成! 总计成功: {total_success}, 失败: {total_failed}"))
+            albums = [self.album_data[index] for index in selected_indices]
+            self.engine.download_albums(albums)
 
         except Exception as e:
             self.download_queue.put(("error", f"下载过程出错: {str(e)}"))
         finally:
             self.is_downloading = False
             self.download_queue.put(("progress_stop", None))
-            if self.driver:
-                self.driver.quit()
-                self.driver = None
-
-    def _process_album_download(self, album_name, viewer_links):
-        """处理单个相册的下载"""
-        try:
-            self.download_queue.put(("log", f"开始获取相册 '{album_name}' 的下载链接..."))
-
-            # 转换为下载链接
-            download_links = []
-            failed_links = []
-
-            for i, viewer_url in enumerate(viewer_links):
-                self.download_queue.put(("status", f"获取下载链接 {i + 1}/{len(viewer_links)}"))
-                download_url = self._get_download_link(viewer_url)
-                if download_url:
-                    download_links.append(download_url)
-                else:
-                    failed_links.append(viewer_url)
-
-            self.download_queue.put(("log", f"获取到 {len(download_links)} 个下载链接，失败 {len(failed_links)} 个"))
-
-            if download_links:
-                # 下载图片
-                success, failed = self._download_images(download_links, album_name)
-                return success, failed
-            else:
-                return 0, len(viewer_links)
-
-        except Exception as e:
-            self.download_queue.put(("error", f"处理相册下载失败: {str(e)}"))
-            return 0, len(viewer_links) if viewer_links else 0
-
-    def _get_download_link(self, viewer_url, retries=3, timeout=10):
-        """从viewer链接获取下载链接"""
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'application/octet-stream',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Connection': 'keep-alive',
-            'Referer': 'https://imgbb.com/',
-        }
-
-        for attempt in range(retries):
-            try:
-                response = requests.get(viewer_url, headers=headers, timeout=timeout)
-
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-
-                    # 查找下载按钮
-                    download_link = soup.find('a', {'class': 'btn btn-download default'})
-
-                    if download_link and 'href' in download_link.attrs:
-                        return download_link['href']
-                    else:
-                        # 备用方案
-                        pattern = r'https://i\.ibb\.co/[A-Za-z0-9]+/[^"\'\s<>]+'
-                        matches = re.findall(pattern, response.text)
-                        if matches:
-                            return matches[0]
-
-                return None
-
-            except Exception as e:
-                if attempt < retries - 1:
-                    time.sleep(1)
-                    continue
-                return None
-
-    def _download_images(self, download_links, album_name):
-        """下载图片"""
-        try:
-            # 创建文件夹
-            safe_album_name = re.sub(r'[<>:"/\\|?*]', '_', album_name)
-            album_dir = os.path.join("downloads", safe_album_name)
-            os.makedirs(album_dir, exist_ok=True)
-
-            self.download_queue.put(("log", f"开始下载相册 '{album_name}' 的 {len(download_links)} 张图片..."))
-
-            success_count = 0
-            failed_count = 0
-
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                'Referer': 'https://imgbb.com/',
-            }
-
-            for i, url in enumerate(download_links):
-                try:
-                    self.download_queue.put(("status", f"下载图片 {i + 1}/{len(download_links)}"))
-
-                    filename = url.split('/')[-1]
-                    if not filename or '.' not in filename:
-                        filename = f"image_{i + 1}.jpg"
-
-                    file_path = os.path.join(album_dir, filename)
-
-                    # 检查文件是否已存在
-                    if os.path.exists(file_path):
-                        success_count += 1
-                        continue
-
-                    response = requests.get(url, headers=headers, timeout=30)
-                    if response.status_code == 200:
-                        with open(file_path, 'wb') as f:
-                            f.write(response.content)
-                        success_count += 1
-                    else:
-                        failed_count += 1
-
-                except Exception as e:
-                    failed_count += 1
-
-                time.sleep(0.5)  # 控制下载速度
-
-            self.download_queue.put(
-                ("log", f"相册 '{album_name}' 下载完成! 成功: {success_count}, 失败: {failed_count}"))
-            return success_count, failed_count
-
-        except Exception as e:
-            self.download_queue.put(("error", f"下载图片失败: {str(e)}"))
-            return 0, len(download_links)
-
-    def setup_driver(self):
-        """设置Chrome浏览器"""
-        options = webdriver.ChromeOptions()
-        options.add_argument('--headless')  # 无头模式
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--disable-blink-features=AutomationControlled')
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option('useAutomationExtension', False)
-
-        driver = webdriver.Chrome(options=options)
-        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-        return driver
-
-    def _load_all_content(self):
-        """滚动加载所有内容"""
-        last_height = self.driver.execute_script("return document.body.scrollHeight")
-        no_change_count = 0
-
-        while True:
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
-
-            try:
-                load_more_buttons = self.driver.find_elements(By.XPATH,
-                                                              "//button[contains(text(), 'Load more')] | //a[contains(text(), 'Load more')] | //*[contains(@class, 'load-more')]")
-
-                clicked = False
-                for btn in load_more_buttons:
-                    if btn.is_displayed() and btn.is_enabled():
-                        try:
-                            self.driver.execute_script("arguments[0].click();", btn)
-                            self.download_queue.put(("log", "点击了Load more按钮"))
-                            time.sleep(3)
-                            clicked = True
-                            break
-                        except:
-                            continue
-
-                if clicked:
-                    no_change_count = 0
-            except:
-                pass
-
-            new_height = self.driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                no_change_count += 1
-                if no_change_count >= 3:
-                    break
-            else:
-                no_change_count = 0
-
-            last_height = new_height
 
     def check_queue(self):
-        """检查队列中的消息"""
+        """在固定的时间预算内处理队列中的消息
+
+        日志行合并后一次写入，状态、进度和相册进度在一次处理中只保留最新值，
+        所以后台线程产生事件再快，界面每次也只做固定量的工作。
+        """
+        deadline = time.monotonic() + self.TICK_BUDGET
+        stamp = time.strftime('%H:%M:%S')
+        logs = []
+        errors = []
+        status = None
+        progress = None
+        albums = None
+        album_progress = {}
+        byte_progress = {}
+
         try:
-            while True:
+            while time.monotonic() < deadline:
                 message_type, data = self.download_queue.get_nowait()
 
                 if message_type == "log":
-                    self.log_message(data)
+                    logs.append(f"[{stamp}] {data}")
                 elif message_type == "error":
-                    self.log_message(f"错误: {data}")
-                    messagebox.showerror("错误", data)
+                    logs.append(f"[{stamp}] 错误: {data}")
+                    errors.append(data)
                 elif message_type == "status":
-                    self.progress_var.set(data)
-                elif message_type == "progress_start":
-                    self.progress_bar.start()
-                elif message_type == "progress_stop":
-                    self.progress_bar.stop()
+                    status = data
+                elif message_type in ("progress_start", "progress_stop"):
+                    progress = message_type
                 elif message_type == "albums":
-                    self._update_album_list(data)
+                    albums = data
+                elif message_type == "album":
+                    album_progress[data['url']] = data
+                elif message_type == "bytes":
+                    byte_progress[data['url']] = data
 
         except queue.Empty:
             pass
 
-        # 继续检查队列
-        self.root.after(100, self.check_queue)
+        if logs:
+            self._append_log(logs)
+        if status is not None:
+            self.progress_var.set(status)
+        if progress == "progress_start":
+            self.progress_bar.config(mode='indeterminate')
+            self.progress_bar.start()
+        elif progress == "progress_stop" and str(self.progress_bar.cget('mode')) == 'indeterminate':
+            # 确定进度的进度条保留最后的值
+            self.progress_bar.stop()
+        if albums is not None:
+            self._update_album_list(albums)
+        for album in album_progress.values():
+            self._update_album_progress(album)
+        for data in byte_progress.values():
+            self._update_byte_progress(data)
+
+        # 还有积压时尽快进行下一次处理，否则按固定间隔检查
+        self.root.after(10 if not self.download_queue.empty() else self.TICK_MS, self.check_queue)
+
+        if errors:
+            message = errors[0] if len(errors) == 1 else f"{errors[0]}\n\n另有 {len(errors) - 1} 个错误，详见日志"
+            messagebox.showerror("错误", message)
 
     def _update_album_list(self, albums):
         """更新相册列表"""
@@ -905,6 +453,33 @@ class ImgBBDownloaderUI:
             self.album_listbox.insert(tk.END, f"{album['name']} ({album['url']})")
             self.album_data[i] = album
 
+    def _update_album_progress(self, album):
+        """更新相册进度表中的一行"""
+        progress = f"{album['done']}/{album['total']}" if album['total'] else ""
+        if album['failed']:
+            progress += f"（失败 {album['failed']}）"
+
+        if self.album_progress.exists(album['url']):
+            self.album_progress.set(album['url'], 'state', album['state'])
+            self.album_progress.set(album['url'], 'progress', progress)
+        else:
+            self.album_progress.insert('', tk.END, iid=album['url'], text=album['name'],
+                                       values=(album['state'], progress, ''))
+
+    def _update_byte_progress(self, data):
+        """更新字节进度：url为None时是整个任务，显示在进度条上"""
+        if data['url'] is not None:
+            if self.album_progress.exists(data['url']):
+                self.album_progress.set(data['url'], 'bytes', format_progress(data))
+            return
+
+        self.bytes_var.set(format_progress(data))
+        if data['total']:
+            if str(self.progress_bar.cget('mode')) != 'determinate':
+                self.progress_bar.stop()
+                self.progress_bar.config(mode='determinate')
+            self.progress_bar.config(maximum=data['total'], value=data['done'])
+
 
 def main():
     """主函数"""
@@ -0,0 +1,102 @@
+import unittest
+
+from benchmarks.server import FakeImgBB
+from imgbb_downloader.crawler import FallbackCrawler, HttpCrawler
+from imgbb_downloader.events import NullSink
+from imgbb_downloader.transport import HttpTransport
+
+
+class _StubCrawler:
+    """记录调用的备用抓取器，代替SeleniumCrawler"""
+
+    def __init__(self):
+        self.calls = []
+        self.started = False
+
+    def start(self):
+        self.started = True
+
+    def quit(self):
+        pass
+
+    def get_albums(self, base_url):
+        self.calls.append(('get_albums', base_url))
+        return [{'name': '浏览器相册', 'url': base_url + '/album/browser'}]
+
+    def get_album_info(self, album_url):
+        self.calls.append(('get_album_info', album_url))
+        return {'name': '浏览器相册', 'url': album_url, 'viewer_links': [album_url + '/viewer']}
+
+
+class HttpCrawlerTest(unittest.TestCase):
+    """在本地替身服务器上测试纯HTTP抓取：分页、viewer ID提取和退回浏览器"""
+
+    def start_site(self, **kwargs):
+        site = FakeImgBB(**kwargs)
+        site.start()
+        self.addCleanup(site.stop)
+        return site
+
+    def setUp(self):
+        self.transport = HttpTransport(retries=0)
+        self.addCleanup(self.transport.close)
+        self.crawler = HttpCrawler(self.transport, NullSink())
+
+    def test_get_albums_follows_pagination(self):
+        site = self.start_site(albums=30, page_size=12)
+        albums = self.crawler.get_albums(site.profile_url)
+        self.assertEqual([album['url'] for album in albums], site.album_urls())
+        self.assertEqual(albums[29]['name'], '基准相册 29')
+
+    def test_get_album_info_collects_viewer_links_from_all_pages(self):
+        site = self.start_site(albums=2, images_per_album=50, page_size=24)
+        info = self.crawler.get_album_info(site.album_urls()[1])
+        self.assertEqual(info['name'], '基准相册 1')
+        self.assertEqual(info['url'], site.album_urls()[1])
+        # 缩略图直链 /i/<ID>/thumb.jpg 不是viewer链接
+        self.assertEqual(info['viewer_links'], site.viewer_urls(1))
+
+    def test_single_page_album(self):
+        site = self.start_site(albums=1, images_per_album=5, page_size=24)
+        info = self.crawler.get_album_info(site.album_urls()[0])
+        self.assertEqual(info['viewer_links'], site.viewer_urls(0))
+
+    def test_missing_album_raises(self):
+        site = self.start_site(albums=1)
+        with self.assertRaises(IOError):
+            self.crawler.get_album_info(f"{site.base_url}/album/al9")
+
+    def test_fallback_used_when_http_finds_no_albums(self):
+        site = self.start_site(albums=0)
+        fallback = _StubCrawler()
+        crawler = FallbackCrawler(self.crawler, lambda: fallback)
+        albums = crawler.get_albums(site.profile_url)
+        self.assertEqual(albums[0]['name'], '浏览器相册')
+        self.assertEqual(fallback.calls, [('get_albums', site.profile_url)])
+
+    def test_fallback_used_when_album_has_no_viewer_links(self):
+        site = self.start_site(albums=1, images_per_album=0)
+        fallback = _StubCrawler()
+        crawler = FallbackCrawler(self.crawler, lambda: fallback)
+        info = crawler.get_album_info(site.album_urls()[0])
+        self.assertTrue(fallback.started)
+        self.assertEqual(info['viewer_links'], [site.album_urls()[0] + '/viewer'])
+
+    def test_fallback_used_when_http_request_fails(self):
+        site = self.start_site(albums=1)
+        fallback = _StubCrawler()
+        crawler = FallbackCrawler(self.crawler, lambda: fallback)
+        missing = f"{site.base_url}/album/al9"
+        crawler.get_album_info(missing)
+        self.assertEqual(fallback.calls, [('get_album_info', missing)])
+
+    def test_fallback_not_started_when_http_succeeds(self):
+        site = self.start_site(albums=3)
+        crawlers = []
+        crawler = FallbackCrawler(self.crawler, lambda: crawlers.append(_StubCrawler()) or crawlers[-1])
+        self.assertEqual(len(crawler.get_albums(site.profile_url)), 3)
+        self.assertEqual(crawlers, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
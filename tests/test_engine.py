@@ -0,0 +1,186 @@
+import importlib.util
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from benchmarks.server import FakeImgBB
+from imgbb_downloader import ImgBBDownloader
+from imgbb_downloader.events import NullSink
+
+
+class _SiteWithMissingImage(FakeImgBB):
+    """第一个相册的第一张图片的直链返回404"""
+
+    def render_viewer_page(self, image_id, base_url=None):
+        page = super().render_viewer_page(image_id, base_url)
+        if image_id == self.image_id(0, 0):
+            page = page.replace(f"/i/{image_id}/", "/missing/")
+        return page
+
+
+class _SiteWithUnresolvableImage(FakeImgBB):
+    """第一个相册的第一张图片的viewer页中没有任何直链"""
+
+    def render_viewer_page(self, image_id, base_url=None):
+        if image_id == self.image_id(0, 0):
+            return "<html><body>图片已删除</body></html>"
+        return super().render_viewer_page(image_id, base_url)
+
+
+class _SharedImagesSite(FakeImgBB):
+    """所有相册包含同样的图片"""
+
+    @staticmethod
+    def image_id(album_index, image_index):
+        return f"im{image_index}"
+
+
+class _ThrottlingSite(FakeImgBB):
+    """每个viewer页的第一次请求返回429"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.throttled = set()
+
+    def _handler_class(self):
+        site = self
+        handler = super()._handler_class()
+
+        class Handler(handler):
+            def do_GET(self):
+                if re.match(r'^/im\d+x\d+$', self.path) and self.path not in site.throttled:
+                    site.throttled.add(self.path)
+                    self._send(429, b"slow down", 'text/plain', False, {'Retry-After': '0'})
+                    return
+                super().do_GET()
+
+        return Handler
+
+
+class EngineTest(unittest.TestCase):
+    """在本地替身服务器上测试下载引擎"""
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir, True)
+
+    def start_site(self, site_class=FakeImgBB, **kwargs):
+        site = site_class(**kwargs)
+        site.start()
+        self.addCleanup(site.stop)
+        return site
+
+    def engine(self, **kwargs):
+        options = dict({'output_dir': self.output_dir, 'crawler_backend': 'http'}, **kwargs)
+        engine = ImgBBDownloader(events=NullSink(), **options)
+        self.addCleanup(engine.close)
+        return engine
+
+    def test_concurrent_engines_share_album_dir(self):
+        # 限速让两个引擎的下载在时间上重叠
+        site = self.start_site(albums=1, images_per_album=6, image_size=100000, bandwidth=500000)
+        album_url = site.album_urls()[0]
+        results = []
+
+        def download():
+            results.append(self.engine(sync_mode=True).download_album(album_url))
+
+        threads = [threading.Thread(target=download) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # 后开始的引擎等待前者完成，再按清单跳过已下载的图片
+        self.assertEqual(sorted(results), [(6, 0), (6, 0)])
+        with open(os.path.join(self.output_dir, '基准相册 0', 'manifest.json'), encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)['images']), 6)
+
+    def test_dedup_shared_images_downloaded_once_across_parallel_albums(self):
+        for backend in ('threads', 'asyncio'):
+            with self.subTest(backend=backend):
+                # 限速让两个相册的下载在时间上重叠
+                site = self.start_site(_SharedImagesSite, albums=2, images_per_album=5, image_size=100000,
+                                       bandwidth=500000)
+                output_dir = tempfile.mkdtemp()
+                self.addCleanup(shutil.rmtree, output_dir, True)
+                engine = self.engine(download_backend=backend, dedup_store=True, output_dir=output_dir)
+                albums = [{'name': f"基准相册 {i}", 'url': url} for i, url in enumerate(site.album_urls())]
+                self.assertEqual(engine.download_albums(albums), (10, 0))
+                self.assertEqual(engine.metrics.value('dedup_total', result='stored'), 5)
+                self.assertEqual(engine.metrics.value('dedup_total', result='linked'), 5)
+                self.assertEqual(engine.metrics.value('dedup_total', result='duplicate'), 0)
+
+    def test_get_albums_recrawls_by_default(self):
+        site = self.start_site(albums=2)
+        engine = self.engine()
+        self.assertEqual(len(engine.get_albums(site.profile_url)), 2)
+        site.albums = 5
+        self.assertEqual(len(engine.get_albums(site.profile_url)), 5)
+
+    def test_get_albums_resumes_interrupted_run(self):
+        site = self.start_site(albums=2)
+        self.engine().get_albums(site.profile_url, resume=True)
+        site.albums = 5
+        # 上次运行没有结束，继续时使用检查点中的相册列表
+        self.assertEqual(len(self.engine().get_albums(site.profile_url, resume=True)), 2)
+
+    def test_finished_sync_with_failures_drops_checkpoint(self):
+        site = self.start_site(_SiteWithMissingImage, albums=1, images_per_album=5, image_size=1000)
+        engine = self.engine(sync_mode=True)
+        albums = engine.get_albums(site.profile_url, resume=True)
+        self.assertEqual(engine.download_albums(albums), (4, 1))
+
+        site.images_per_album = 15
+        engine = self.engine(sync_mode=True)
+        albums = engine.get_albums(site.profile_url, resume=True)
+        self.assertEqual(engine.download_albums(albums), (14, 1))
+
+    def test_resolve_and_discovery_failures_are_counted(self):
+        site = self.start_site(_SiteWithUnresolvableImage, albums=1, images_per_album=5, image_size=1000)
+        albums = [{'name': '基准相册 0', 'url': site.album_urls()[0]},
+                  {'name': '不存在的相册', 'url': f"{site.base_url}/album/al9"}]
+        # 解析不出直链的图片和获取信息失败的相册都计入失败数
+        self.assertEqual(self.engine().download_albums(albums), (4, 2))
+
+    def test_cancelled_run_keeps_checkpoint(self):
+        site = self.start_site(albums=1, images_per_album=3, image_size=1000)
+        album_url = site.album_urls()[0]
+        engine = self.engine()
+        engine.cancel()
+        engine.download_album(album_url)
+        self.assertIsNotNone(engine.discovery.get_album(album_url))
+
+        engine = self.engine()
+        self.assertEqual(engine.download_album(album_url), (3, 0))
+        self.assertIsNone(engine.discovery.get_album(album_url))
+
+    def test_throttled_viewer_pages_are_retried(self):
+        for backend in ('threads', 'asyncio'):
+            with self.subTest(backend=backend):
+                site = self.start_site(_ThrottlingSite, albums=1, images_per_album=5, image_size=1000)
+                # 每次429都会减半速率，初始速率较高时重试不必等待太久
+                engine = self.engine(download_backend=backend, cache_path=':memory:', initial_rate=1000.0,
+                                     max_rate=1000.0)
+                self.assertEqual(engine.download_album(site.album_urls()[0]), (5, 0))
+                self.assertEqual(len(site.throttled), 5)
+
+    @unittest.skipUnless(importlib.util.find_spec('httpx'), "需要httpx")
+    def test_asyncio_throughput_not_capped_at_initial_rate(self):
+        site = self.start_site(albums=1, images_per_album=100, image_size=1000, latency=0.05)
+        engine = self.engine(download_backend='asyncio', initial_rate=2.0, max_rate=500.0, global_connections=100,
+                             per_album_connections=100, download_workers=100, per_host_limit=100)
+        engine.rate_limiter.increase_step = 5.0
+        start = time.monotonic()
+        self.assertEqual(engine.download_album(site.album_urls()[0]), (100, 0))
+        # 一直按初始速率放行需要50秒；提速后已在等待的下载也应按新速率放行
+        self.assertLess(time.monotonic() - start, 15)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks.server import FakeImgBB
+from imgbb_downloader import ImgBBDownloader
+from imgbb_downloader.events import NullSink
+from imgbb_downloader.jobs import JobQueue, JobRunner
+
+
+class _RecordingEngine(ImgBBDownloader):
+    """记录关闭调用的下载引擎"""
+
+    closed = False
+
+    def close(self):
+        self.closed = True
+        super().close()
+
+
+class _ListSink:
+    """记录所有事件"""
+
+    def __init__(self):
+        self.events = []
+
+    def put(self, event):
+        self.events.append(event)
+
+
+class JobRunnerTest(unittest.TestCase):
+    """在本地替身服务器上测试任务队列的执行"""
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir, True)
+        self.site = FakeImgBB(albums=2, images_per_album=3, image_size=1000)
+        self.site.start()
+        self.addCleanup(self.site.stop)
+        self.queue = JobQueue(os.path.join(self.output_dir, 'jobs.sqlite3'))
+        self.addCleanup(self.queue.close)
+        for url in self.site.album_urls():
+            self.queue.add(url, self.output_dir)
+
+    def test_jobs_share_engine(self):
+        engine = _RecordingEngine(output_dir=self.output_dir, sync_mode=True, crawler_backend='http')
+        self.addCleanup(engine.close)
+        results = JobRunner(self.queue, NullSink(), workers=1, engine=engine).run()
+
+        self.assertEqual(sorted(results.values()), ['done', 'done'])
+        self.assertEqual([job['success'] for job in self.queue.jobs()], [3, 3])
+        # 引擎在任务之间复用，由创建者关闭
+        self.assertFalse(engine.closed)
+
+    def test_job_byte_progress_combined_into_total(self):
+        sink = _ListSink()
+        JobRunner(self.queue, sink, workers=2, engine_options={'crawler_backend': 'http'}).run()
+
+        jobs = {data['url']: data for message_type, data in sink.events
+                if message_type == 'bytes' and data['url'] is not None and data['url'].startswith('job:')}
+        totals = [data for message_type, data in sink.events if message_type == 'bytes' and data['url'] is None]
+        self.assertEqual(set(jobs), {'job:1', 'job:2'})
+        # 无界面运行时LogSink只输出url为None的总进度
+        self.assertEqual(totals[-1]['done'], sum(data['done'] for data in jobs.values()))
+        self.assertEqual(totals[-1]['done'], 6 * self.site.image_size)
+
+    def test_shared_engine_requires_single_worker(self):
+        engine = ImgBBDownloader(output_dir=self.output_dir, crawler_backend='http')
+        self.addCleanup(engine.close)
+        with self.assertRaises(ValueError):
+            JobRunner(self.queue, NullSink(), workers=2, engine=engine)
+
+
+if __name__ == '__main__':
+    unittest.main()
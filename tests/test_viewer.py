@@ -0,0 +1,35 @@
+import unittest
+
+from imgbb_downloader.viewer import ViewerPageScanner, extract_download_url
+
+DIRECT_LINK = 'https://i.ibb.co/abc123/photo-name.jpg'
+PAGE_WITHOUT_BUTTON = f'<html><body><div><img src="{DIRECT_LINK}" alt=""></div></body></html>'
+
+
+def scan_in_chunks(page, cut):
+    scanner = ViewerPageScanner()
+    scanner.feed(page[:cut])
+    scanner.feed(page[cut:])
+    return scanner.result()
+
+
+class ViewerPageScannerTest(unittest.TestCase):
+    """viewer页分块扫描：备用直链不能因分块边界被截断"""
+
+    def test_direct_link_split_across_chunks(self):
+        start = PAGE_WITHOUT_BUTTON.index(DIRECT_LINK)
+        for cut in range(start, start + len(DIRECT_LINK) + 1):
+            self.assertEqual(scan_in_chunks(PAGE_WITHOUT_BUTTON, cut), DIRECT_LINK, cut)
+
+    def test_direct_link_at_end_of_page(self):
+        self.assertEqual(extract_download_url('<p>' + DIRECT_LINK), DIRECT_LINK)
+
+    def test_download_button_preferred(self):
+        page = PAGE_WITHOUT_BUTTON.replace(
+            '<div>', '<div><a class="btn btn-download default" href="https://i.ibb.co/xyz/full.png">下载</a>')
+        for cut in range(len(page)):
+            self.assertEqual(scan_in_chunks(page, cut), 'https://i.ibb.co/xyz/full.png', cut)
+
+
+if __name__ == '__main__':
+    unittest.main()